@@ -0,0 +1,39 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+# Асинхронный ORM Django 4.2 выполняет запросы через sync_to_async в
+# потоке запроса, поэтому asyncio.gather над ним всё равно идёт по
+# очереди. Независимые запросы одного ответа выполняются в отдельном пуле
+# потоков, у каждого из которых своё соединение.
+
+_executor = None
+_executor_pid = None
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(settings.ASYNC_DB_WORKERS)
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def _run(func, args):
+    # Соединения потоков пула живут по CONN_MAX_AGE, как и у запросов.
+    close_old_connections()
+    return func(*args)
+
+
+async def run_query(func, *args):
+    if not settings.ASYNC_DB_WORKERS:
+        return await sync_to_async(func)(*args)
+    # Контекст копируется, чтобы запросы попали в Server-Timing ответа.
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_executor(), contextvars.copy_context().run, _run, func, args
+    )
@@ -0,0 +1,166 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import Http404
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from api.async_db import run_query
+from api.ingredient_index import get_ingredient_index
+from api.shopping_list import aget_shopping_list_etag, astream_shopping_list
+from api.views import IngredientViewSet, RecipeViewSet, parse_pk
+from recipes.models import Recipe
+
+
+class AsyncViewSetMixin:
+    # Действия из async_actions выполняются корутинами и под ASGI не
+    # занимают поток на время запросов к БД. Остальные действия вызываются
+    # обычным синхронным представлением через sync_to_async, как Django
+    # и так поступает с синхронными представлениями.
+    async_actions = {}
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        sync_view = sync_to_async(super().as_view(actions, **initkwargs))
+
+        async def view(request, *args, **kwargs):
+            handler = cls.async_actions.get(
+                actions.get(request.method.lower())
+            )
+            if handler is None:
+                return await sync_view(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.action_map = actions
+            return await self.adispatch(request, getattr(self, handler),
+                                        *args, **kwargs)
+
+        view.cls = cls
+        view.initkwargs = initkwargs
+        view.actions = actions
+        view.csrf_exempt = True
+        return view
+
+    async def adispatch(self, request, handler, *args, **kwargs):
+        # Повторяет APIView.dispatch; права и выбор формата проверяются
+        # без запросов к БД, поэтому initial() выполняется в event loop.
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await self.aperform_authentication(request)
+            self.initial(request, *args, **kwargs)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response,
+                                               *args, **kwargs)
+        return self.response
+
+    async def aperform_authentication(self, request):
+        # Повторяет Request._authenticate с aauthenticate вместо
+        # authenticate.
+        if not all(hasattr(authenticator, 'aauthenticate')
+                   for authenticator in request.authenticators):
+            await sync_to_async(lambda: request.user)()
+            return
+        for authenticator in request.authenticators:
+            try:
+                user_auth_tuple = await authenticator.aauthenticate(request)
+            except APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def aget_object(self):
+        queryset = await sync_to_async(self.filter_queryset)(
+            self.get_queryset()
+        )
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (ObjectDoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+class AsyncIngredientViewSet(AsyncViewSetMixin, IngredientViewSet):
+    async_actions = {'list': 'alist'}
+
+    async def alist(self, request, *args, **kwargs):
+        index = await sync_to_async(get_ingredient_index)()
+        return self.conditional_response(
+            request, self.get_list_validators(index), self.list_from_index,
+            index
+        )
+
+
+class AsyncRecipeViewSet(AsyncViewSetMixin, RecipeViewSet):
+    async_actions = {
+        'list': 'alist',
+        'retrieve': 'aretrieve',
+        'download_shopping_cart': 'adownload_shopping_cart',
+        'get_link': 'aget_link',
+    }
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(request, self.alist_page)
+
+    async def alist_page(self, request):
+        # Валидаторы, страница и фасеты не зависят друг от друга и
+        # запрашиваются параллельно. При совпадении ETag страница
+        # оказывается лишней, зато обычный ответ обходится без лишнего
+        # круга к БД.
+        queryset = await sync_to_async(self.filter_queryset)(
+            self.get_queryset()
+        )
+        queries = [
+            run_query(self.get_list_validators, queryset),
+            self.paginator.apaginate_queryset(queryset, request, self),
+        ]
+        if request.query_params.get('facets'):
+            queries.append(run_query(self.get_facets, queryset))
+        validators, page, *facets = await asyncio.gather(*queries)
+        self.facets = facets and facets[0]
+        return self.conditional_response(request, validators,
+                                         self.page_response, page)
+
+    def page_response(self, request, page):
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(request, self.aretrieve_object)
+
+    async def aretrieve_object(self, request):
+        obj = await self.aget_object()
+        return self.conditional_response(
+            request, self.get_object_validators(obj),
+            self.object_response, obj
+        )
+
+    def object_response(self, request, obj):
+        return Response(self.get_serializer(obj).data)
+
+    async def adownload_shopping_cart(self, request):
+        return self.shopping_list_response(
+            request,
+            await aget_shopping_list_etag(request.user,
+                                          request.accepted_renderer.format),
+            astream_shopping_list
+        )
+
+    async def aget_link(self, request, pk=None):
+        recipe_id = parse_pk(pk)
+        if not await Recipe.objects.filter(pk=recipe_id).aexists():
+            raise Http404
+        return self.link_response(request, recipe_id)
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.constants import (AUTH_TOKEN_CACHE_KEY, AUTH_TOKEN_CACHE_SIZE,
+                           AUTH_TOKEN_CACHE_TIMEOUT,
+                           AUTH_TOKEN_SHARED_CACHE_TIMEOUT)
+from users.models import User
+
+# Пароль и last_login нужны редко, а счётчики и версия списка покупок
+# меняются без сохранения пользователя: в снимок они не попадают и при
+# обращении загружаются из БД как отложенные поля.
+SNAPSHOT_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname not in ('password', 'last_login', 'recipes_count',
+                             'subscribers_count', 'shopping_list_version')
+)
+
+
+class LRUCache:
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.timeout, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.items.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+local_tokens = LRUCache(AUTH_TOKEN_CACHE_SIZE, AUTH_TOKEN_CACHE_TIMEOUT)
+
+
+def get_snapshot(key):
+    snapshot = local_tokens.get(key)
+    if snapshot is not None:
+        return snapshot
+    if settings.AUTH_TOKEN_SHARED_CACHE:
+        snapshot = cache.get(AUTH_TOKEN_CACHE_KEY.format(key))
+    if snapshot is None:
+        snapshot = Token.objects.filter(key=key).values_list(
+            *(f'user__{name}' for name in SNAPSHOT_FIELDS)
+        ).first()
+        if snapshot is None:
+            return None
+        if settings.AUTH_TOKEN_SHARED_CACHE:
+            cache.set(AUTH_TOKEN_CACHE_KEY.format(key), snapshot,
+                      AUTH_TOKEN_SHARED_CACHE_TIMEOUT)
+    local_tokens.set(key, snapshot)
+    return snapshot
+
+
+def forget_tokens(keys):
+    # Как и версии кэша, сброс — после фиксации транзакции: иначе
+    # параллельный запрос успеет снова закэшировать удаляемый токен.
+    keys = list(keys)
+
+    def forget():
+        local_tokens.delete_many(keys)
+        if settings.AUTH_TOKEN_SHARED_CACHE:
+            cache.delete_many([AUTH_TOKEN_CACHE_KEY.format(key)
+                               for key in keys])
+
+    transaction.on_commit(forget)
+
+
+def forget_user_tokens(user_id):
+    forget_tokens(
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # Пользователь по токену берётся из кэша процесса (и, если включён
+    # AUTH_TOKEN_SHARED_CACHE, из общего кэша) без запроса к БД. Записи
+    # сбрасываются при удалении токена и при сохранении пользователя;
+    # в других процессах устаревшая запись живёт не дольше
+    # AUTH_TOKEN_CACHE_TIMEOUT секунд.
+
+    def authenticate_credentials(self, key):
+        return self.get_credentials(key, get_snapshot(key))
+
+    async def aauthenticate(self, request):
+        # Для асинхронных представлений: токен из памяти процесса
+        # проверяется прямо в event loop, остальные — в потоке.
+        key = TokenKeyParser().authenticate(request)
+        if key is None:
+            return None
+        snapshot = local_tokens.get(key)
+        if snapshot is None:
+            snapshot = await sync_to_async(get_snapshot)(key)
+        return self.get_credentials(key, snapshot)
+
+    def get_credentials(self, key, snapshot):
+        if snapshot is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        user = User.from_db('default', SNAPSHOT_FIELDS, snapshot)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return user, Token(key=key, user=user)
+
+
+class TokenKeyParser(TokenAuthentication):
+    # Только разбор заголовка Authorization: ключ вместо пользователя.
+
+    def authenticate_credentials(self, key):
+        return key
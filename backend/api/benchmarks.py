@@ -0,0 +1,25 @@
+import statistics
+import time
+
+
+def measure(func, iterations, warmup=1):
+    # Медиана времени вызова в миллисекундах.
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def write_table(stdout, header, rows):
+    rows = [header, *([str(value) for value in row] for row in rows)]
+    widths = [max(len(row[column]) for row in rows)
+              for column in range(len(header))]
+    for row in rows:
+        stdout.write('  '.join(
+            value.ljust(width) if column == 0 else value.rjust(width)
+            for column, (value, width) in enumerate(zip(row, widths))
+        ))
@@ -0,0 +1,177 @@
+import hashlib
+
+from django.db.models import Count, Max, Subquery
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from recipes.catalog import get_ingredients_version, stored_version
+from recipes.constants import INGREDIENTS_VERSION
+from recipes.counters import get_counter
+from recipes.models import (Favorite, Recipe, RecipeCounterShard,
+                            ShoppingCart)
+from users.models import Subscription, User, UserCounterShard
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(repr(parts).encode(),
+                         usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _latest(model):
+    return Max(Subquery(
+        model.objects.order_by('-updated_at').values('updated_at')[:1]
+    ))
+
+
+def _relation_state(model, user, field='user'):
+    # Количество и последний id связей пользователя меняются при каждом
+    # добавлении и удалении, поэтому отражают его флаги is_favorited и т.п.
+    rows = model.objects.filter(**{field: user}).order_by().values(field)
+    return (
+        Max(Subquery(rows.annotate(total=Count('pk')).values('total'))),
+        Max(Subquery(rows.annotate(last=Max('pk')).values('last'))),
+    )
+
+
+def _user_state(user, models):
+    if not user.is_authenticated:
+        return {}
+    state = {}
+    for model in models:
+        name = model._meta.model_name
+        state[f'{name}_count'], state[f'{name}_last'] = _relation_state(
+            model, user
+        )
+    return state
+
+
+class ConditionalGetMixin:
+    # ETag учитывает всё, что попадает в ответ, включая счётчики и флаги
+    # текущего пользователя. Last-Modified отдаётся только анонимам и
+    # строится по updated_at, поэтому для деталей не учитывает счётчики —
+    # их точность обеспечивает ETag. Спискам Last-Modified не отдаётся:
+    # после удаления записи максимум updated_at не меняется, и клиент с
+    # одним If-Modified-Since получил бы устаревший 304.
+
+    def get_list_validators(self, queryset):
+        return None, None
+
+    def get_object_validators(self, obj):
+        return None, None
+
+    def get_object(self):
+        if not hasattr(self, '_conditional_object'):
+            self._conditional_object = super().get_object()
+        return self._conditional_object
+
+    def conditional_response(self, request, validators, handler,
+                             *args, **kwargs):
+        etag, last_modified = validators
+        if request.user.is_authenticated:
+            last_modified = None
+        timestamp = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            if etag:
+                response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        validators = self.get_list_validators(
+            self.filter_queryset(self.get_queryset())
+        )
+        return self.conditional_response(request, validators, super().list,
+                                         *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_object_validators(self.get_object())
+        return self.conditional_response(request, validators,
+                                         super().retrieve, *args, **kwargs)
+
+
+class RecipeConditionalMixin(ConditionalGetMixin):
+
+    def get_list_validators(self, queryset):
+        stats = Recipe.objects.filter(
+            pk__in=queryset.values('pk')
+        ).aggregate(
+            count=Count('pk'),
+            recipes=Max('updated_at'),
+            authors=Max('author__updated_at'),
+            recipe_counters=_latest(RecipeCounterShard),
+            user_counters=_latest(UserCounterShard),
+            # Переименование ингредиента меняет состав в ответе.
+            ingredients=Max(stored_version(INGREDIENTS_VERSION)),
+            **_user_state(self.request.user,
+                          (Favorite, ShoppingCart, Subscription))
+        )
+        return (
+            make_etag(self.request.query_params.urlencode(),
+                      sorted(stats.items())),
+            None
+        )
+
+    def get_object_validators(self, obj):
+        author = obj.author
+        return (
+            make_etag(
+                obj.pk, obj.updated_at, author.updated_at,
+                # Аннотация из RecipeViewSet.get_queryset.
+                getattr(obj, 'ingredients_version', None),
+                getattr(obj, 'is_favorited', None),
+                getattr(obj, 'is_in_shopping_cart', None),
+                getattr(author, 'is_subscribed', None),
+                get_counter(obj, 'favorites_count'),
+                get_counter(obj, 'in_carts_count'),
+                get_counter(author, 'recipes_count'),
+                get_counter(author, 'subscribers_count'),
+            ),
+            max(obj.updated_at, author.updated_at)
+        )
+
+
+class UserConditionalMixin(ConditionalGetMixin):
+
+    def get_list_validators(self, queryset):
+        stats = User.objects.filter(
+            pk__in=queryset.values('pk')
+        ).aggregate(
+            count=Count('pk'),
+            users=Max('updated_at'),
+            user_counters=_latest(UserCounterShard),
+            **_user_state(self.request.user, (Subscription,))
+        )
+        return (
+            make_etag(self.request.query_params.urlencode(),
+                      sorted(stats.items())),
+            None
+        )
+
+    def get_object_validators(self, obj):
+        return (
+            make_etag(
+                obj.pk, obj.updated_at,
+                getattr(obj, 'is_subscribed', None),
+                get_counter(obj, 'recipes_count'),
+                get_counter(obj, 'subscribers_count'),
+            ),
+            obj.updated_at
+        )
+
+
+class IngredientConditionalMixin(ConditionalGetMixin):
+
+    def get_list_validators(self, index):
+        # Список отдаётся из индекса ингредиентов, ETag — его версия.
+        return make_etag(index.version), None
+
+    def get_object_validators(self, obj):
+        return make_etag(get_ingredients_version(), obj.pk), None
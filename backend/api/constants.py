@@ -1,9 +1,26 @@
-from foodgram.constants import (DEFAULT_PAGE_SIZE, MAX_INGREDIENT_AMOUNT,
-                                MIN_INGREDIENT_AMOUNT, PAGE_SIZE_QUERY_PARAM)
+from foodgram.constants import (AUTH_TOKEN_CACHE_KEY, AUTH_TOKEN_CACHE_SIZE,
+                                AUTH_TOKEN_CACHE_TIMEOUT,
+                                AUTH_TOKEN_SHARED_CACHE_TIMEOUT,
+                                DEFAULT_PAGE_SIZE, MAX_BULK_RECIPES,
+                                MAX_INGREDIENT_AMOUNT,
+                                METRICS_DURATION_BUCKETS,
+                                METRICS_FLUSH_INTERVAL, METRICS_QUERY_BUCKETS,
+                                MIN_INGREDIENT_AMOUNT, PAGE_SIZE_QUERY_PARAM,
+                                RESPONSE_CACHE_TIMEOUT, UPLOAD_CHUNK_SIZE)
 
 __all__ = [
     'DEFAULT_PAGE_SIZE',
     'PAGE_SIZE_QUERY_PARAM',
     'MIN_INGREDIENT_AMOUNT',
-    'MAX_INGREDIENT_AMOUNT'
+    'MAX_INGREDIENT_AMOUNT',
+    'RESPONSE_CACHE_TIMEOUT',
+    'MAX_BULK_RECIPES',
+    'UPLOAD_CHUNK_SIZE',
+    'METRICS_DURATION_BUCKETS',
+    'METRICS_QUERY_BUCKETS',
+    'METRICS_FLUSH_INTERVAL',
+    'AUTH_TOKEN_CACHE_KEY',
+    'AUTH_TOKEN_CACHE_SIZE',
+    'AUTH_TOKEN_CACHE_TIMEOUT',
+    'AUTH_TOKEN_SHARED_CACHE_TIMEOUT',
 ]
@@ -1,7 +1,11 @@
+from django import forms
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe
-from users.models import User
+from recipes.constants import INGREDIENT_MATCH_MODES, RECIPE_FACETS
+from recipes.inverted_index import filter_by_ingredients
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from recipes.search import search_recipes
 
 
 class IngredientFilter(FilterSet):
@@ -12,25 +16,74 @@ class IngredientFilter(FilterSet):
         fields = ('name',)
 
 
+class IntegerInFilter(filters.BaseInFilter):
+    field_class = forms.IntegerField
+
+
+class ChoiceInFilter(filters.BaseInFilter, filters.ChoiceFilter):
+    pass
+
+
 class RecipeFilter(FilterSet):
     is_favorited = filters.NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.NumberFilter(
         method='filter_is_in_shopping_cart'
     )
-    author = filters.ModelChoiceFilter(queryset=User.objects.all())
+    author = IntegerInFilter(field_name='author_id')
+    cooking_time_min = filters.NumberFilter(field_name='cooking_time',
+                                            lookup_expr='gte')
+    cooking_time_max = filters.NumberFilter(field_name='cooking_time',
+                                            lookup_expr='lte')
+    ingredient = filters.NumberFilter(method='filter_ingredient')
+    search = filters.CharFilter(method='filter_search')
+    # Три параметра ниже применяются вместе в filter_queryset.
+    ingredients = IntegerInFilter(method='skip_filter')
+    exclude_ingredients = IntegerInFilter(method='skip_filter')
+    match = filters.ChoiceFilter(
+        choices=[(mode, mode) for mode in INGREDIENT_MATCH_MODES],
+        method='skip_filter'
+    )
+    # Фасеты считает RecipeViewSet по отфильтрованному queryset.
+    facets = ChoiceInFilter(
+        choices=[(name, name) for name in RECIPE_FACETS],
+        method='skip_filter'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'cooking_time_min', 'cooking_time_max',
+                  'ingredient', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'ingredients', 'exclude_ingredients', 'match',
+                  'facets')
+
+    def filter_queryset(self, queryset):
+        data = self.form.cleaned_data
+        return filter_by_ingredients(
+            super().filter_queryset(queryset),
+            data.get('ingredients'),
+            data.get('exclude_ingredients'),
+            data.get('match') or INGREDIENT_MATCH_MODES[0]
+        )
+
+    def skip_filter(self, queryset, name, value):
+        return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(favorites__user=user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(shopping_carts__user=user)
+            return queryset.filter(is_in_shopping_cart=True)
         return queryset
+
+    def filter_ingredient(self, queryset, name, value):
+        return queryset.filter(Exists(IngredientInRecipe.objects.filter(
+            recipe=OuterRef('pk'), ingredient_id=value
+        )))
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
@@ -0,0 +1,56 @@
+import json
+import sys
+from bisect import bisect_left, bisect_right
+
+from recipes.catalog import get_ingredients_version
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    # Ингредиенты хранятся уже сериализованными в JSON и отсортированными
+    # по casefold-имени: поиск по префиксу — это два bisect и срез.
+
+    def __init__(self, ingredients, version=None):
+        rows = sorted(
+            (name.casefold(), name, pk, measurement_unit)
+            for pk, name, measurement_unit in ingredients
+        )
+        self.version = version
+        self.keys = [row[0] for row in rows]
+        self.fragments = [
+            json.dumps(
+                {'id': pk, 'name': name, 'measurement_unit': unit},
+                ensure_ascii=False
+            )
+            for _, name, pk, unit in rows
+        ]
+
+    def search(self, prefix=''):
+        if not prefix:
+            return self.fragments
+        prefix = prefix.casefold()
+        start = bisect_left(self.keys, prefix)
+        end = bisect_right(self.keys, prefix + chr(sys.maxunicode), start)
+        return self.fragments[start:end]
+
+    def render(self, prefix=''):
+        return '[' + ','.join(self.search(prefix)) + ']'
+
+
+_index = None
+
+
+def get_ingredient_index():
+    # Версия читается из базы при каждом вызове (один запрос по ключу):
+    # load_ingredients и правки в админке из других процессов меняют её
+    # в той же транзакции, что и ингредиенты.
+    global _index
+    version = get_ingredients_version()
+    if _index is None or _index.version != version:
+        _index = IngredientIndex(
+            Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator(),
+            version=version
+        )
+    return _index
@@ -0,0 +1,292 @@
+import base64
+import io
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.constants import BENCHMARK_PASSWORD, BENCHMARK_USERNAME_PREFIX
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+
+RELATIONS = {'favorite': Favorite, 'shopping_cart': ShoppingCart}
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (90, 160, 90)).save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+def percentile(values, percent):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[
+        percent - 1
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогон всех эндпоинтов API через тестовый клиент на данных '
+        'seed_benchmark_data. Выводит JSON с пропускной способностью, '
+        'p50/p95/p99 и числом запросов к БД по каждому эндпоинту.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Повторов каждого сценария')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Повторов без замера')
+        parser.add_argument('--only', action='append', default=[],
+                            help='Запускать только эндпоинты с этой '
+                                 'подстрокой в имени')
+        parser.add_argument('--output', help='Файл для результата в JSON')
+        parser.add_argument('--compare',
+                            help='JSON предыдущего прогона для сравнения')
+
+    def handle(self, *args, **options):
+        self.prepare()
+        self.only = options['only']
+        self.samples = {}
+        for _ in range(options['warmup']):
+            self.run_scenarios(measure=False)
+        for _ in range(options['iterations']):
+            self.run_scenarios(measure=True)
+        report = {
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'endpoints': {
+                name: self.summarize(samples)
+                for name, samples in self.samples.items()
+            },
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        else:
+            self.stdout.write(json.dumps(report, ensure_ascii=False,
+                                         indent=2))
+        if options['compare']:
+            self.compare(options['compare'], report)
+
+    def prepare(self):
+        users = list(User.objects.filter(
+            username__startswith=BENCHMARK_USERNAME_PREFIX
+        ).order_by('-subscribers_count', 'pk')[:3])
+        if len(users) < 3:
+            raise CommandError('Сначала выполните seed_benchmark_data.')
+        self.author, self.user, self.guest = users
+        self.recipe = Recipe.objects.filter(author=self.author).first()
+        self.recipes = list(Recipe.objects.exclude(
+            author=self.user
+        ).order_by('-favorites_count').values_list('pk', flat=True)[:20])
+        self.ingredients = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)[:5]
+        )
+        self.ingredient_name = Ingredient.objects.order_by('pk').first().name
+        self.image = make_image()
+        host = next(
+            (host for host in settings.ALLOWED_HOSTS if '*' not in host),
+            'localhost'
+        )
+        self.anonymous = APIClient(HTTP_HOST=host)
+        self.client = self.authorized(self.user, host)
+        self.author_client = self.authorized(self.author, host)
+        self.login_client = APIClient(HTTP_HOST=host)
+
+    def authorized(self, user, host):
+        client = APIClient(HTTP_HOST=host)
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def request(self, name, client, method, path, data=None, measure=True):
+        if self.only and not any(part in name for part in self.only):
+            return None
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, data, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        if measure:
+            self.samples.setdefault(name, []).append(
+                (elapsed, len(queries), response.status_code)
+            )
+        return response
+
+    def toggle(self, name, path, exists, measure):
+        # POST и DELETE парой в таком порядке, чтобы оба запроса были
+        # успешными и состояние после пары не изменилось.
+        methods = ('delete', 'post') if exists else ('post', 'delete')
+        for method in methods:
+            self.request(f'{name}.{method}', self.client, method, path,
+                         measure=measure)
+
+    def run_scenarios(self, measure):
+        for scenario in (self.users_scenario, self.ingredients_scenario,
+                         self.recipes_scenario, self.relations_scenario,
+                         self.write_scenario):
+            scenario(measure)
+
+    def users_scenario(self, measure):
+        request = self.request
+        author = self.author.pk
+        request('users.list', self.anonymous, 'get', '/api/users/',
+                measure=measure)
+        request('users.list.auth', self.client, 'get', '/api/users/',
+                measure=measure)
+        request('users.retrieve', self.client, 'get',
+                f'/api/users/{author}/', measure=measure)
+        request('users.me', self.client, 'get', '/api/users/me/',
+                measure=measure)
+        request('users.subscriptions', self.client, 'get',
+                '/api/users/subscriptions/?recipes_limit=3', measure=measure)
+        self.toggle('users.subscribe', f'/api/users/{author}/subscribe/',
+                    Subscription.objects.filter(
+                        user=self.user, author=self.author
+                    ).exists(), measure)
+        request('users.avatar.put', self.client, 'put',
+                '/api/users/me/avatar/', {'avatar': self.image},
+                measure=measure)
+        request('users.avatar.delete', self.client, 'delete',
+                '/api/users/me/avatar/', measure=measure)
+        request('users.set_password', self.client, 'post',
+                '/api/users/set_password/',
+                {'current_password': BENCHMARK_PASSWORD,
+                 'new_password': BENCHMARK_PASSWORD}, measure=measure)
+        username = f'{BENCHMARK_USERNAME_PREFIX}signup_{time.time_ns()}'
+        request('users.create', self.anonymous, 'post', '/api/users/', {
+            'email': f'{username}@example.com', 'username': username,
+            'first_name': 'Новый', 'last_name': 'Пользователь',
+            'password': BENCHMARK_PASSWORD,
+        }, measure=measure)
+        response = request('auth.token.login', self.login_client, 'post',
+                           '/api/auth/token/login/',
+                           {'email': self.guest.email,
+                            'password': BENCHMARK_PASSWORD},
+                           measure=measure)
+        if response is not None and response.status_code == 200:
+            self.login_client.credentials(
+                HTTP_AUTHORIZATION=f"Token {response.data['auth_token']}"
+            )
+            request('auth.token.logout', self.login_client, 'post',
+                    '/api/auth/token/logout/', measure=measure)
+            self.login_client.credentials()
+
+    def ingredients_scenario(self, measure):
+        self.request('ingredients.list', self.anonymous, 'get',
+                     '/api/ingredients/', measure=measure)
+        self.request('ingredients.search', self.anonymous, 'get',
+                     f'/api/ingredients/?name={self.ingredient_name[:3]}',
+                     measure=measure)
+        self.request('ingredients.retrieve', self.anonymous, 'get',
+                     f'/api/ingredients/{self.ingredients[0]}/',
+                     measure=measure)
+
+    def recipes_scenario(self, measure):
+        request = self.request
+        recipe = self.recipe.pk
+        request('recipes.list', self.anonymous, 'get', '/api/recipes/',
+                measure=measure)
+        request('recipes.list.auth', self.client, 'get', '/api/recipes/',
+                measure=measure)
+        request('recipes.list.author', self.client, 'get',
+                f'/api/recipes/?author={self.author.pk}', measure=measure)
+        request('recipes.list.is_favorited', self.client, 'get',
+                '/api/recipes/?is_favorited=1', measure=measure)
+        request('recipes.list.is_in_shopping_cart', self.client, 'get',
+                '/api/recipes/?is_in_shopping_cart=1', measure=measure)
+        request('recipes.list.cursor', self.client, 'get',
+                '/api/recipes/?cursor=', measure=measure)
+        request('recipes.retrieve', self.anonymous, 'get',
+                f'/api/recipes/{recipe}/', measure=measure)
+        request('recipes.retrieve.auth', self.client, 'get',
+                f'/api/recipes/{recipe}/', measure=measure)
+        request('recipes.get_link', self.anonymous, 'get',
+                f'/api/recipes/{recipe}/get-link/', measure=measure)
+        request('recipes.download_shopping_cart', self.client, 'get',
+                '/api/recipes/download_shopping_cart/', measure=measure)
+
+    def relations_scenario(self, measure):
+        recipe = self.recipes[-1]
+        for relation in ('favorite', 'shopping_cart'):
+            self.toggle(f'recipes.{relation}',
+                        f'/api/recipes/{recipe}/{relation}/',
+                        RELATIONS[relation].objects.filter(
+                            user=self.user, recipe_id=recipe
+                        ).exists(), measure)
+            # Массовые операции только над рецептами, которых ещё нет
+            # в списке, чтобы после прогона данные остались прежними.
+            present = set(RELATIONS[relation].objects.filter(
+                user=self.user, recipe_id__in=self.recipes
+            ).values_list('recipe_id', flat=True))
+            ids = [pk for pk in self.recipes if pk not in present]
+            if not ids:
+                continue
+            path = f'/api/recipes/{relation}/bulk/'
+            self.request(f'recipes.{relation}.bulk.post', self.client,
+                         'post', path, {'recipes': ids}, measure=measure)
+            self.request(f'recipes.{relation}.bulk.delete', self.client,
+                         'delete', path, {'recipes': ids}, measure=measure)
+
+    def write_scenario(self, measure):
+        author = self.author_client
+        payload = {
+            'name': 'Рецепт для замера', 'text': 'Описание',
+            'cooking_time': 10, 'image': self.image,
+            'ingredients': [{'id': pk, 'amount': 10}
+                            for pk in self.ingredients],
+        }
+        response = self.request('recipes.create', author, 'post',
+                                '/api/recipes/', payload, measure=measure)
+        if response is None or response.status_code != 201:
+            return
+        recipe = response.data['id']
+        payload['ingredients'] = payload['ingredients'][1:] + [
+            {'id': self.ingredients[0], 'amount': 20}
+        ]
+        self.request('recipes.partial_update', author, 'patch',
+                     f'/api/recipes/{recipe}/', payload, measure=measure)
+        if self.request('recipes.destroy', author, 'delete',
+                        f'/api/recipes/{recipe}/', measure=measure) is None:
+            author.delete(f'/api/recipes/{recipe}/')
+
+    def summarize(self, samples):
+        latencies = sorted(elapsed * 1000 for elapsed, _, _ in samples)
+        total = sum(latencies) / 1000
+        return {
+            'requests': len(samples),
+            'errors': sum(status >= 400 for _, _, status in samples),
+            'rps': round(len(samples) / total, 1) if total else None,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'queries': round(statistics.mean(
+                queries for _, queries, _ in samples
+            ), 1),
+        }
+
+    def compare(self, path, report):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)['endpoints']
+        self.stderr.write(f'{"эндпоинт":40} {"p95, мс":>18} {"запросы":>14}')
+        for name, current in report['endpoints'].items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            self.stderr.write(
+                f'{name:40} '
+                f'{previous["p95_ms"]:>8} → {current["p95_ms"]:<8} '
+                f'{previous["queries"]:>5} → {current["queries"]:<5}'
+            )
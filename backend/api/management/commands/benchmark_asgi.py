@@ -0,0 +1,157 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from api.benchmarks import write_table
+from recipes.constants import BENCHMARK_USERNAME_PREFIX
+from recipes.models import Recipe
+from users.models import User
+
+
+def get_servers(workers, port):
+    # gunicorn — синхронные представления, uvicorn — foodgram/asgi.py с
+    # асинхронными (ASYNC_VIEWS включается там же).
+    return {
+        'wsgi': ([
+            sys.executable, '-m', 'gunicorn', 'foodgram.wsgi:application',
+            '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+            '--log-level', 'error',
+        ], {'ASYNC_VIEWS': '0'}),
+        'asgi': ([
+            sys.executable, '-m', 'uvicorn', 'foodgram.asgi:application',
+            '--workers', str(workers), '--host', '127.0.0.1',
+            '--port', str(port), '--log-level', 'error', '--no-access-log',
+        ], {'ASYNC_VIEWS': '1'}),
+    }
+
+
+async def fetch(port, path, token):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(
+        f'GET {path} HTTP/1.1\r\nHost: localhost\r\n'
+        f'Authorization: Token {token}\r\nConnection: close\r\n\r\n'.encode()
+    )
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return data[:4] == b'HTTP' and data[9:12] == b'200'
+
+
+async def run_load(port, paths, token, concurrency, duration):
+    latencies = []
+    errors = 0
+
+    async def client(number):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            path = paths[number % len(paths)]
+            number += 1
+            started = time.perf_counter()
+            try:
+                ok = await fetch(port, path, token)
+            except OSError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(client(number) for number in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def wait_for_port(port, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f'Сервер завершился с кодом '
+                               f'{process.returncode}.')
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f'Сервер не начал слушать порт {port}.')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузка на чтение рецептов под gunicorn (WSGI) и uvicorn (ASGI) '
+        'с одинаковым числом воркеров. Выводит пропускную способность и '
+        'p50/p95/p99 времени ответа в миллисекундах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('servers', nargs='*',
+                            help='wsgi и/или asgi, по умолчанию оба')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='Одновременных клиентов')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Длительность замера, секунды')
+        parser.add_argument('--warmup', type=float, default=2,
+                            help='Прогрев перед замером, секунды')
+        parser.add_argument('--port', type=int, default=8100)
+        parser.add_argument('--startup-timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(
+            username__startswith=BENCHMARK_USERNAME_PREFIX
+        ).order_by('pk').first()
+        recipe = Recipe.objects.order_by('-pub_date', '-id').first()
+        if user is None or recipe is None:
+            raise CommandError('Сначала выполните seed_benchmark_data.')
+        token, _ = Token.objects.get_or_create(user=user)
+        # Запросы с токеном минуют кэш анонимных ответов.
+        paths = [
+            '/api/recipes/?limit=6',
+            f'/api/recipes/{recipe.pk}/',
+            '/api/recipes/?limit=6&facets=cooking_time,author,ingredient',
+        ]
+        port = options['port']
+        servers = get_servers(options['workers'], port)
+        names = options['servers'] or list(servers)
+        unknown = set(names) - set(servers)
+        if unknown:
+            raise CommandError(f'Неизвестные серверы: {", ".join(unknown)}')
+        rows = []
+        for name in names:
+            command, env = servers[name]
+            process = subprocess.Popen(
+                command, cwd=settings.BASE_DIR, env={**os.environ, **env}
+            )
+            try:
+                wait_for_port(port, process, options['startup_timeout'])
+                asyncio.run(run_load(port, paths, token.key,
+                                     options['concurrency'],
+                                     options['warmup']))
+                latencies, errors, elapsed = asyncio.run(run_load(
+                    port, paths, token.key, options['concurrency'],
+                    options['duration']
+                ))
+            finally:
+                process.terminate()
+                process.wait()
+            percentiles = statistics.quantiles(latencies, n=100,
+                                               method='inclusive')
+            rows.append((
+                name, f'{len(latencies) / elapsed:.1f}',
+                *(f'{percentiles[percent - 1] * 1000:.1f}'
+                  for percent in (50, 95, 99)),
+                errors,
+            ))
+        self.stdout.write(
+            f'Воркеров: {options["workers"]}, '
+            f'клиентов: {options["concurrency"]}, '
+            f'замер: {options["duration"]} с'
+        )
+        write_table(self.stdout, ('server', 'rps', 'p50_ms', 'p95_ms',
+                                  'p99_ms', 'errors'), rows)
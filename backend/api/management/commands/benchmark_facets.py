@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from api.benchmarks import measure, write_table
+from recipes.constants import (COOKING_TIME_FACET_BUCKETS, FACET_SIZE,
+                               RECIPE_FACETS)
+from recipes.facets import get_recipe_facets
+from recipes.inverted_index import filter_by_ingredients
+from recipes.models import IngredientInRecipe, Recipe
+from recipes.search import search_recipes
+
+
+def count_separately(queryset):
+    # Как считали бы фасеты без get_recipe_facets: запрос на каждую
+    # корзину времени и по группировке на авторов и ингредиенты.
+    for low, high in COOKING_TIME_FACET_BUCKETS:
+        buckets = queryset.filter(cooking_time__gte=low)
+        if high is not None:
+            buckets = buckets.filter(cooking_time__lte=high)
+        buckets.count()
+    list(queryset.order_by().values('author_id', 'author__username').annotate(
+        total=Count('pk')
+    ).order_by('-total', 'author_id')[:FACET_SIZE])
+    list(IngredientInRecipe.objects.filter(
+        recipe__in=queryset.values('pk')
+    ).order_by().values('ingredient_id', 'ingredient__name').annotate(
+        total=Count('pk')
+    ).order_by('-total', 'ingredient_id')[:FACET_SIZE])
+
+
+class Command(BaseCommand):
+    help = (
+        'Фасеты списка рецептов: один запрос get_recipe_facets против '
+        'отдельных запросов на каждый фасет при разных фильтрах. Выводит '
+        'медиану времени в миллисекундах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--search', default='лосось',
+                            help='Поисковый запрос для одного из фильтров')
+        parser.add_argument('--iterations', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if not IngredientInRecipe.objects.exists():
+            raise CommandError('Сначала сгенерируйте данные: '
+                               'python manage.py seed_benchmark_data')
+        iterations = options['iterations']
+        # Самый частый ингредиент и сотый по частоте.
+        popular = IngredientInRecipe.objects.values('ingredient_id').annotate(
+            total=Count('pk')
+        ).order_by('-total').values_list('ingredient_id', flat=True)[:101]
+        recipes = Recipe.objects.all()
+        cases = {
+            'all': recipes,
+            'cooking_time<=30': recipes.filter(cooking_time__lte=30),
+            'popular ingredient': filter_by_ingredients(
+                recipes, [popular[0]], None, 'all'
+            ),
+            'ingredient #100': filter_by_ingredients(
+                recipes, [popular[len(popular) - 1]], None, 'all'
+            ),
+            f'search {options["search"]}': search_recipes(
+                recipes, options['search']
+            ),
+        }
+        rows = []
+        for label, queryset in cases.items():
+            def one_query():
+                return get_recipe_facets(queryset, RECIPE_FACETS)
+
+            def separate():
+                return count_separately(queryset)
+
+            rows.append((
+                label, queryset.count(),
+                f'{measure(one_query, iterations):.3f}',
+                f'{measure(separate, iterations):.3f}',
+            ))
+        self.stdout.write(
+            f'Рецептов: {recipes.count()}, повторов: {iterations}'
+        )
+        write_table(self.stdout, ('filter', 'recipes', 'one_query_ms',
+                                  'separate_ms'), rows)
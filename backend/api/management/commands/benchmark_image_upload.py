@@ -0,0 +1,106 @@
+import base64
+import io
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.benchmarks import measure, write_table
+from recipes.constants import BENCHMARK_USERNAME_PREFIX
+from recipes.models import Ingredient, Recipe
+from recipes.thumbnails import iter_variants
+from users.models import User
+
+
+def make_noise_image(side):
+    # Шум почти не сжимается: сторона 1300 даёт PNG около 5 МБ.
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (side, side), os.urandom(side * side * 3)).save(
+        buffer, 'PNG'
+    )
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        'Создание рецепта с большим изображением: нарезка вариантов в '
+        'запросе (IMAGE_WORKERS=0) против пула процессов. Выводит медиану '
+        'времени ответа в миллисекундах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--side', type=int, default=1300,
+                            help='Сторона изображения в пикселях')
+        parser.add_argument('--workers', type=int,
+                            default=settings.IMAGE_WORKERS or 2,
+                            help='Размер пула для второго замера')
+        parser.add_argument('--iterations', type=int, default=10)
+        parser.add_argument('--timeout', type=int, default=120,
+                            help='Ожидание нарезки перед очисткой, секунды')
+
+    def handle(self, *args, **options):
+        author = User.objects.filter(
+            username__startswith=BENCHMARK_USERNAME_PREFIX
+        ).order_by('pk').first()
+        ingredient = Ingredient.objects.order_by('pk').first()
+        if author is None or ingredient is None:
+            raise CommandError('Сначала выполните seed_benchmark_data.')
+        content = make_noise_image(options['side'])
+        payload = {
+            'name': 'Замер загрузки изображения',
+            'text': 'Создан benchmark_image_upload.',
+            'cooking_time': 1,
+            'ingredients': [{'id': ingredient.pk, 'amount': 1}],
+            'image': ('data:image/png;base64,'
+                      + base64.b64encode(content).decode()),
+        }
+        client = APIClient()
+        client.force_authenticate(author)
+        created = []
+
+        def create():
+            response = client.post('/api/recipes/', payload, format='json')
+            if response.status_code != 201:
+                raise CommandError(response.content.decode())
+            created.append(response.json()['id'])
+
+        rows = []
+        try:
+            for workers in (0, options['workers']):
+                with override_settings(IMAGE_WORKERS=workers):
+                    rows.append((
+                        workers,
+                        f'{measure(create, options["iterations"]):.0f}'
+                    ))
+        finally:
+            self.cleanup(client, created, options['timeout'])
+        self.stdout.write(
+            f'Изображение: {len(content) / 2 ** 20:.1f} МБ, '
+            f'повторов: {options["iterations"]}'
+        )
+        write_table(self.stdout, ('image_workers', 'create_ms'), rows)
+
+    def cleanup(self, client, ids, timeout):
+        # Варианты из пула дописываются после ответа: рецепты удаляются,
+        # когда нарезка закончена, иначе её файлы останутся без владельца.
+        deadline = time.monotonic() + timeout
+        recipes = Recipe.objects.filter(pk__in=ids)
+        while time.monotonic() < deadline and any(
+            recipe.image_variants.get('source') != recipe.image.name
+            for recipe in recipes.only('image', 'image_variants')
+        ):
+            time.sleep(0.5)
+        for recipe in recipes.only('image', 'image_variants'):
+            names = [recipe.image.name] + [
+                name
+                for variant, formats in iter_variants(recipe.image_variants)
+                for name in formats.values()
+            ]
+            client.delete(f'/api/recipes/{recipe.pk}/')
+            for name in names:
+                default_storage.delete(name)
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.benchmarks import measure, write_table
+from api.ingredient_index import get_ingredient_index
+from api.serializers import IngredientSerializer
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Поиск ингредиентов по префиксу: ORM и сериализатор против индекса '
+        'в памяти процесса. Выводит медиану времени в миллисекундах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('prefixes', nargs='*', default=['а', 'сах'],
+                            help='Префиксы для поиска')
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if not Ingredient.objects.exists():
+            raise CommandError('Сначала загрузите ингредиенты: '
+                               'python manage.py load_ingredients')
+        iterations = options['iterations']
+        rows = []
+        for prefix in options['prefixes']:
+            def orm():
+                return JSONRenderer().render(IngredientSerializer(
+                    Ingredient.objects.filter(name__istartswith=prefix),
+                    many=True
+                ).data)
+
+            index = get_ingredient_index()
+            hits = len(json.loads(index.render(prefix)))
+            rows.append((
+                prefix, hits,
+                f'{measure(orm, iterations):.3f}',
+                f'{measure(lambda: index.render(prefix), iterations):.3f}',
+                # С проверкой версии каталога, как в запросе к API.
+                f'{measure(lambda: get_ingredient_index().render(prefix), iterations):.3f}',
+            ))
+        self.stdout.write(
+            f'Ингредиентов: {Ingredient.objects.count()}, '
+            f'повторов: {iterations}'
+        )
+        write_table(self.stdout, ('prefix', 'hits', 'orm_ms', 'index_ms',
+                                  'index_version_ms'), rows)
@@ -0,0 +1,61 @@
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.benchmarks import measure, write_table
+from api.paginations import RecipePagination
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Первая и предпоследняя страница списка рецептов: OFFSET с COUNT(*) '
+        'против курсора. Выводит медиану времени в миллисекундах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def paginate(self, params):
+        pagination = RecipePagination()
+        request = Request(APIRequestFactory().get('/api/recipes/', params))
+        results = pagination.paginate_queryset(self.queryset, request)
+        return [recipe.pk for recipe in results], pagination
+
+    def handle(self, *args, **options):
+        limit, iterations = options['limit'], options['iterations']
+        self.queryset = Recipe.objects.select_related('author').order_by(
+            *RecipePagination.ordering
+        )
+        total = self.queryset.count()
+        if total < limit * 3:
+            raise CommandError('Слишком мало рецептов: '
+                               'python manage.py seed_benchmark_data')
+        deep = (total - 1) // limit
+        # Курсор предпоследней страницы указывает на последний рецепт
+        # страницы перед ней.
+        _, pagination = self.paginate({'cursor': '', 'limit': limit})
+        link = pagination.encode_cursor(
+            self.queryset[(deep - 1) * limit - 1], reverse=False
+        )
+        cursor = parse_qs(urlsplit(link).query)['cursor'][0]
+        pages = (
+            ('1', {'page': 1, 'limit': limit}, {'cursor': '', 'limit': limit}),
+            (str(deep), {'page': deep, 'limit': limit},
+             {'cursor': cursor, 'limit': limit}),
+        )
+        rows = []
+        for label, offset, keyset in pages:
+            if self.paginate(offset)[0] != self.paginate(keyset)[0]:
+                raise CommandError(f'Страница {label} расходится.')
+            rows.append((
+                label,
+                f'{measure(lambda: self.paginate(offset), iterations):.2f}',
+                f'{measure(lambda: self.paginate(keyset), iterations):.2f}',
+            ))
+        self.stdout.write(f'Рецептов: {total}, limit: {limit}, '
+                          f'повторов: {iterations}')
+        write_table(self.stdout, ('page', 'offset_ms', 'cursor_ms'), rows)
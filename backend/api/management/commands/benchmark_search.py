@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from api.benchmarks import measure, write_table
+from recipes.models import Recipe
+from recipes.search import search_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        'Полнотекстовый поиск рецептов против icontains по name и text: '
+        'первая страница результатов. Выводит медиану времени в '
+        'миллисекундах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'queries', nargs='*',
+            default=['говядина запечённый', 'лосось', 'борщ'],
+            help='Поисковые запросы'
+        )
+        parser.add_argument('--limit', type=int, default=6)
+        parser.add_argument('--iterations', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if not Recipe.objects.exists():
+            raise CommandError('Сначала сгенерируйте данные: '
+                               'python manage.py seed_benchmark_data')
+        limit, iterations = options['limit'], options['iterations']
+        rows = []
+        for query in options['queries']:
+            found = search_recipes(Recipe.objects.all(), query)
+            # Без полнотекстового индекса: так искал бы запасной путь
+            # search_recipes на других СУБД.
+            scanned = Recipe.objects.filter(
+                Q(name__icontains=query) | Q(text__icontains=query)
+            ).order_by('-pub_date', '-id')
+
+            def first_page(queryset):
+                return lambda: list(
+                    queryset.values_list('pk', flat=True)[:limit]
+                )
+
+            rows.append((
+                query, found.count(),
+                f'{measure(first_page(found), iterations):.3f}',
+                f'{measure(first_page(scanned), iterations):.3f}',
+            ))
+        self.stdout.write(
+            f'Рецептов: {Recipe.objects.count()}, '
+            f'СУБД: {connection.vendor}, повторов: {iterations}'
+        )
+        write_table(self.stdout, ('query', 'hits', 'search_ms',
+                                  'icontains_ms'), rows)
@@ -0,0 +1,222 @@
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from api.constants import (METRICS_DURATION_BUCKETS, METRICS_FLUSH_INTERVAL,
+                           METRICS_QUERY_BUCKETS)
+
+# Гистограмма: имя метрики -> (описание, границы корзин).
+HISTOGRAMS = {
+    'foodgram_request_duration_seconds': (
+        'Полное время обработки запроса', METRICS_DURATION_BUCKETS),
+    'foodgram_view_duration_seconds': (
+        'Время работы представления', METRICS_DURATION_BUCKETS),
+    'foodgram_db_duration_seconds': (
+        'Время запросов к БД за запрос', METRICS_DURATION_BUCKETS),
+    'foodgram_serializer_duration_seconds': (
+        'Время сериализации ответа', METRICS_DURATION_BUCKETS),
+    'foodgram_db_queries': (
+        'Число запросов к БД за запрос', METRICS_QUERY_BUCKETS),
+}
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.serializer = 0.0
+        self.view_started = None
+        self.view = None
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # Запросы асинхронного представления идут из нескольких потоков.
+            with self.lock:
+                self.db += time.perf_counter() - started
+                self.queries += 1
+
+    def server_timing(self, total):
+        parts = [f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+                 f'serializer;dur={self.serializer * 1000:.1f}']
+        if self.view is not None:
+            parts.append(f'view;dur={self.view * 1000:.1f}')
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def record_query(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings.execute_wrapper(execute, sql, params, many, context)
+
+
+def install_query_timing(sender, connection, **kwargs):
+    # Обёртка ставится на каждое соединение при подключении, а тайминги
+    # запроса находятся через contextvar: так учитываются и запросы из
+    # потоков sync_to_async и пула асинхронных представлений.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsRegistry:
+    # Гистограммы текущего процесса. Если задан METRICS_DIR, каждый
+    # процесс (воркер gunicorn) периодически сбрасывает свои значения в
+    # файл <pid>.json, а /api/metrics/ суммирует все файлы каталога.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+        self.flushed = 0.0
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        key = json.dumps([name, sorted(labels.items())])
+        with self.lock:
+            series = self.series.setdefault(
+                key, {'counts': [0] * (len(buckets) + 1), 'sum': 0.0}
+            )
+            series['counts'][bisect_left(buckets, value)] += 1
+            series['sum'] += value
+
+    def observe_request(self, view, status, timings, total):
+        labels = {'view': view, 'status': f'{status // 100}xx'}
+        self.observe('foodgram_request_duration_seconds', labels, total)
+        self.observe('foodgram_db_duration_seconds', labels, timings.db)
+        self.observe('foodgram_db_queries', labels, timings.queries)
+        self.observe('foodgram_serializer_duration_seconds', labels,
+                     timings.serializer)
+        if timings.view is not None:
+            self.observe('foodgram_view_duration_seconds', labels,
+                         timings.view)
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.series))
+
+    def maybe_flush(self):
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or now - self.flushed < METRICS_FLUSH_INTERVAL:
+            return
+        self.flushed = now
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(f'{path}.tmp', path)
+
+    def collect(self):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return self.snapshot()
+        self.flushed = 0.0
+        self.maybe_flush()
+        merged = {}
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path) as file:
+                    series = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for key, values in series.items():
+                total = merged.setdefault(key, {
+                    'counts': [0] * len(values['counts']), 'sum': 0.0
+                })
+                total['counts'] = [
+                    a + b for a, b in zip(total['counts'], values['counts'])
+                ]
+                total['sum'] += values['sum']
+        return merged
+
+
+registry = MetricsRegistry()
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+
+def render_prometheus(series, extra=None):
+    lines = []
+    by_name = {}
+    for key, values in sorted(series.items()):
+        name, labels = json.loads(key)
+        by_name.setdefault(name, []).append((labels, values))
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for labels, values in by_name.get(name, ()):
+            cumulative = 0
+            for bound, count in zip(
+                [*map(str, buckets), '+Inf'], values['counts']
+            ):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{format_labels(labels)},'
+                             f'le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{format_labels(labels)}}} '
+                         f'{values["sum"]}')
+            lines.append(f'{name}_count{{{format_labels(labels)}}} '
+                         f'{cumulative}')
+    for name, (description, value) in (extra or {}).items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+_timed_classes = {}
+
+
+def timed_property(data):
+
+    def timed_data(serializer):
+        timings = current_timings.get()
+        if timings is None:
+            return data.fget(serializer)
+        started = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            timings.serializer += time.perf_counter() - started
+
+    return property(timed_data)
+
+
+def timed_serializer(serializer):
+    # Сериализатор получает подкласс, в котором замеряется .data; сам
+    # класс сериализатора не меняется. Вложенные сериализаторы вызывают
+    # to_representation напрямую, так что время не задваивается.
+    cls = type(serializer)
+    timed = _timed_classes.get(cls)
+    if timed is None:
+        timed = type(cls.__name__, (cls,), {
+            '__module__': cls.__module__, 'data': timed_property(cls.data)
+        })
+        # Повторная обёртка того же сериализатора ничего не меняет.
+        _timed_classes[cls] = _timed_classes[timed] = timed
+    serializer.__class__ = timed
+    return serializer
+
+
+class SerializerTimingMixin:
+    # Время сериализации для представлений API: сериализаторы из
+    # get_serializer замеряются автоматически, созданные вручную
+    # оборачиваются в timed_serializer.
+
+    def get_serializer(self, *args, **kwargs):
+        return timed_serializer(super().get_serializer(*args, **kwargs))
@@ -0,0 +1,89 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from api.metrics import RequestTimings, current_timings, registry
+
+
+def get_view_name(request, view_func):
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', 'unknown')
+    action = (getattr(view_func, 'actions', None) or {}).get(
+        request.method.lower()
+    )
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+class ServerTimingMiddleware:
+    # Время запросов к БД, сериализации и представления для каждого
+    # запроса: заголовок Server-Timing и гистограммы для /api/metrics/.
+    # Умеет работать и асинхронно: синхронный middleware под ASGI
+    # заставил бы Django выполнять асинхронные представления в потоке.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Синхронные process_* Django под ASGI вызывал бы в потоке.
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        request.view_name = 'unresolved'
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, timings, response)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        request.view_name = 'unresolved'
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, timings, response)
+
+    def finish(self, request, timings, response):
+        if timings.view_started is not None and timings.view is None:
+            timings.view = time.perf_counter() - timings.view_started
+        total = time.perf_counter() - timings.started
+        response['Server-Timing'] = timings.server_timing(total)
+        registry.observe_request(request.view_name, response.status_code,
+                                 timings, total)
+        return response
+
+    def start_view(self, request, view_func):
+        request.view_name = get_view_name(request, view_func)
+        current_timings.get().view_started = time.perf_counter()
+
+    def stop_view(self):
+        # Для отложенного рендеринга время представления заканчивается
+        # до рендеринга шаблона.
+        timings = current_timings.get()
+        if timings.view_started is not None:
+            timings.view = time.perf_counter() - timings.view_started
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.start_view(request, view_func)
+
+    def process_template_response(self, request, response):
+        self.stop_view()
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args,
+                            view_kwargs):
+        self.start_view(request, view_func)
+
+    async def aprocess_template_response(self, request, response):
+        self.stop_view()
+        return response
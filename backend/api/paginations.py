@@ -1,8 +1,219 @@
+import asyncio
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.feed import get_feed_sources
 
+from .async_db import run_query
 from .constants import DEFAULT_PAGE_SIZE, PAGE_SIZE_QUERY_PARAM
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = DEFAULT_PAGE_SIZE
     page_size_query_param = PAGE_SIZE_QUERY_PARAM
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # COUNT(*) и строки страницы запрашиваются параллельно, поэтому
+        # номер страницы проверяется уже по готовому количеству.
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        # 'last' и некорректные номера обрабатывает paginate_queryset.
+        page_number = request.query_params.get(self.page_query_param, 1)
+        try:
+            number = int(page_number)
+        except (TypeError, ValueError):
+            number = 0
+        if number < 1:
+            return await run_query(self.paginate_queryset, queryset,
+                                   request, view)
+        self.request = request
+        paginator = self.django_paginator_class(queryset, page_size)
+        bottom = (number - 1) * page_size
+        paginator.count, results = await asyncio.gather(
+            run_query(queryset.count),
+            run_query(list, queryset[bottom:bottom + page_size])
+        )
+        try:
+            self.page = Page(results, paginator.validate_number(number),
+                             paginator)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return results
+
+
+class KeysetPagination(LimitPageNumberPagination):
+    # Без параметра cursor работает как обычная постраничная пагинация.
+    # С ним (в том числе пустым) страница выбирается по составному ключу
+    # ordering, без OFFSET и без COUNT(*).
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор.'
+    ordering = ('-id',)
+
+    def use_keyset(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in self.ordering
+        ]
+        position, reverse = self.decode_cursor(queryset.model, request)
+        results = self.get_results(queryset, position, reverse)
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.results = results
+        return results
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        if not self.use_keyset(request):
+            self.keyset = False
+            return await super().apaginate_queryset(queryset, request, view)
+        return await run_query(self.paginate_queryset, queryset, request,
+                               view)
+
+    def get_ordering(self, reverse, fields=None):
+        return [
+            f'{"-" if descending != reverse else ""}{name}'
+            for name, descending in fields or self.fields
+        ]
+
+    def get_results(self, queryset, position, reverse):
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position,
+                                                                reverse))
+        return list(
+            queryset.order_by(*self.get_ordering(reverse))[:self.page_size + 1]
+        )
+
+    def get_position_filter(self, position, reverse, fields=None):
+        # fields позволяет применить позицию к полям другой модели с тем
+        # же порядком (например, к ленте подписок).
+        fields = fields or self.fields
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(fields, position):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        # Нестрогое условие по первому полю даёт индексу границу диапазона.
+        (name, descending), value = fields[0], position[0]
+        lookup = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{name}__{lookup}': value}) & condition
+
+    def decode_cursor(self, model, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor.encode()))
+            position = [
+                model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields,
+                                            payload['position'],
+                                            strict=True)
+            ]
+            return position, bool(payload['reverse'])
+        except (BinasciiError, ValueError, TypeError, KeyError,
+                ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        payload = {
+            'position': [
+                obj._meta.get_field(name).value_to_string(obj)
+                for name, _ in self.fields
+            ],
+            'reverse': reverse,
+        }
+        cursor = urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(),
+                                   self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.results:
+            return None
+        return self.encode_cursor(self.results[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.results:
+            return None
+        return self.encode_cursor(self.results[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class RecipePagination(KeysetPagination):
+    ordering = ('-pub_date', '-id')
+
+
+class UserPagination(KeysetPagination):
+    ordering = ('username', 'id')
+
+
+class FeedPagination(RecipePagination):
+    # Лента всегда листается курсором. Страница собирается из записей
+    # TimelineEntry и рецептов авторов без рассылки: из каждого источника
+    # берётся не больше страницы, затем они сливаются по ключу.
+    timeline_fields = (('pub_date', True), ('recipe_id', True))
+
+    def use_keyset(self, request):
+        return True
+
+    def get_results(self, queryset, position, reverse):
+        limit = self.page_size + 1
+        timeline, pulled = get_feed_sources(self.request.user)
+        if position is not None:
+            timeline = timeline.filter(self.get_position_filter(
+                position, reverse, self.timeline_fields
+            ))
+        keys = set(timeline.order_by(
+            *self.get_ordering(reverse, self.timeline_fields)
+        ).values_list('pub_date', 'recipe_id')[:limit])
+        for recipes in pulled:
+            if position is not None:
+                recipes = recipes.filter(self.get_position_filter(position,
+                                                                  reverse))
+            keys.update(recipes.order_by(
+                *self.get_ordering(reverse)
+            ).values_list('pub_date', 'id')[:limit])
+        ids = [pk for _, pk in sorted(
+            keys, reverse=self.fields[0][1] != reverse
+        )[:limit]]
+        recipes = queryset.in_bulk(ids)
+        return [recipes[pk] for pk in ids if pk in recipes]
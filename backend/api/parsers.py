@@ -0,0 +1,213 @@
+import base64
+import binascii
+import json
+import re
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import json as drf_json
+
+from api.constants import UPLOAD_CHUNK_SIZE
+
+DATA_URI_PREFIX = b'data:'
+DATA_URI_MARKER = b';base64,'
+MAX_DATA_URI_HEADER = 128
+# Только значения этих ключей могут быть файлами; остальные строки,
+# даже похожие на data URI, остаются текстом.
+IMAGE_FIELDS = (b'image', b'avatar')
+SPECIAL_CHARS = re.compile(rb'["\\]')
+
+# Состояния разбора: вне строки, в обычной строке, в начале строки
+# (ещё неизвестно, data URI ли это), внутри base64 из data URI.
+OUTSIDE, STRING, HEADER, PAYLOAD = range(4)
+
+
+class DataURIExtractor:
+    # Вырезает из потока JSON строки вида "data:<mime>;base64,<...>",
+    # декодируя base64 по частям во временные файлы. В тексте JSON на их
+    # месте остаются короткие метки, поэтому в памяти не оказывается ни
+    # исходная строка, ни декодированный файл целиком. Вырезаются только
+    # значения ключей из IMAGE_FIELDS.
+
+    def __init__(self):
+        self.text = []
+        self.files = {}
+        self.buffer = b''
+        self.header = b''
+        self.carry = b''
+        self.file = None
+        self.key = None
+        self.gap = b''
+        self.image = False
+        self.state = OUTSIDE
+        self.token = f'upload:{uuid.uuid4().hex}:'
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        while self.buffer and self.step():
+            pass
+
+    def step(self):
+        if self.state == OUTSIDE:
+            index = self.buffer.find(b'"')
+            if index == -1:
+                self.gap = (self.gap + self.buffer)[:MAX_DATA_URI_HEADER]
+                self.emit(len(self.buffer))
+                return False
+            # Строка — значение поля с картинкой, если перед ней стоят
+            # ключ из IMAGE_FIELDS и двоеточие.
+            gap = self.gap + self.buffer[:index]
+            self.image = self.key in IMAGE_FIELDS and gap.strip() == b':'
+            self.emit(index + 1)
+            self.state = HEADER
+            return True
+        if self.state == HEADER:
+            return self.read_header()
+        if self.state == PAYLOAD:
+            return self.read_payload()
+        return self.read_string()
+
+    def read_string(self):
+        match = SPECIAL_CHARS.search(self.buffer)
+        if match is None:
+            self.emit(len(self.buffer))
+            return False
+        end = match.start()
+        if match.group() == b'"':
+            self.emit(end + 1)
+            self.close_string()
+            return True
+        if len(self.buffer) < end + 2:
+            # Экранированный символ разорван между частями потока.
+            self.emit(end)
+            return False
+        self.emit(end + 2)
+        return True
+
+    def read_payload(self):
+        match = SPECIAL_CHARS.search(self.buffer)
+        end = match.start() if match else len(self.buffer)
+        self.decode(self.buffer[:end])
+        self.buffer = self.buffer[end:]
+        if match is None:
+            return False
+        if match.group() == b'"':
+            self.close_file()
+            self.emit(1)
+            self.close_string()
+            return True
+        if len(self.buffer) < 2:
+            return False
+        escaped = self.buffer[1:2]
+        if escaped == b'/':
+            self.decode(b'/')
+        elif escaped not in (b'n', b'r'):
+            raise ParseError('Некорректная строка base64.')
+        self.buffer = self.buffer[2:]
+        return True
+
+    def read_header(self):
+        match = SPECIAL_CHARS.search(self.buffer)
+        limit = min(
+            match.start() if match else len(self.buffer),
+            MAX_DATA_URI_HEADER - len(self.header)
+        )
+        header = self.header + self.buffer[:limit]
+        position = header.find(DATA_URI_MARKER)
+        if (self.image and header.startswith(DATA_URI_PREFIX)
+                and position != -1):
+            self.buffer = self.buffer[
+                position + len(DATA_URI_MARKER) - len(self.header):
+            ]
+            self.open_file(header[len(DATA_URI_PREFIX):position])
+            return True
+        if match is not None or len(header) >= MAX_DATA_URI_HEADER:
+            # Короткая строка без экранирования целиком в header:
+            # она может оказаться ключом следующего значения.
+            complete = match is not None and match.group() == b'"'
+            self.key = header if complete else None
+            self.text.append(self.header)
+            self.header = b''
+            self.state = STRING
+            return True
+        self.header = header
+        self.buffer = self.buffer[limit:]
+        return False
+
+    def close_string(self):
+        self.state = OUTSIDE
+        self.gap = b''
+
+    def emit(self, end):
+        self.text.append(self.buffer[:end])
+        self.buffer = self.buffer[end:]
+
+    def open_file(self, content_type):
+        self.header = b''
+        self.carry = b''
+        self.state = PAYLOAD
+        self.file = UploadedFile(
+            SpooledTemporaryFile(
+                max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+            ),
+            name='upload',
+            content_type=content_type.decode('ascii', 'replace'),
+            size=0
+        )
+
+    def decode(self, data):
+        data = self.carry + data
+        size = len(data) // 4 * 4
+        self.carry = data[size:]
+        try:
+            decoded = base64.b64decode(data[:size], validate=True)
+        except binascii.Error:
+            raise ParseError('Некорректная строка base64.')
+        self.file.write(decoded)
+        self.file.size += len(decoded)
+
+    def close_file(self):
+        if self.carry:
+            raise ParseError('Некорректная строка base64.')
+        self.file.seek(0)
+        name = f'{self.token}{len(self.files)}'
+        self.files[name] = self.file
+        self.text.append(name.encode())
+        self.file = None
+
+    def finish(self):
+        if self.state == PAYLOAD:
+            raise ParseError('Поток JSON оборвался внутри base64.')
+        return b''.join(self.text + [self.header, self.buffer])
+
+    def restore(self, data):
+        if isinstance(data, dict):
+            return {key: self.restore(value) for key, value in data.items()}
+        if isinstance(data, list):
+            return [self.restore(value) for value in data]
+        if isinstance(data, str) and data.startswith(self.token):
+            return self.files.get(data, data)
+        return data
+
+
+class StreamingJSONParser(JSONParser):
+    # Картинки из data URI приходят в сериализатор уже файлами
+    # (UploadedFile поверх SpooledTemporaryFile).
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        extractor = DataURIExtractor()
+        for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b''):
+            extractor.feed(chunk)
+        try:
+            parse_constant = drf_json.strict_constant if self.strict else None
+            data = json.loads(extractor.finish().decode(encoding),
+                              parse_constant=parse_constant)
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+        return extractor.restore(data)
@@ -0,0 +1,111 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from recipes.catalog import get_recipe_version_keys, get_versions
+
+from .constants import RESPONSE_CACHE_TIMEOUT
+
+HITS_CACHE_KEY = 'recipes:response:hits'
+MISSES_CACHE_KEY = 'recipes:response:misses'
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Vary')
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def get_response_cache_stats():
+    stats = cache.get_many((HITS_CACHE_KEY, MISSES_CACHE_KEY))
+    return {
+        'hits': stats.get(HITS_CACHE_KEY, 0),
+        'misses': stats.get(MISSES_CACHE_KEY, 0),
+    }
+
+
+class AnonymousResponseCacheMixin:
+    # Ответы анонимам на list/retrieve кэшируются под ключом из URL,
+    # формата ответа и версий рецептов. Любая запись меняет версию, так
+    # что старые записи просто перестают читаться и вытесняются по TTL.
+    # Изменения счётчиков (избранное, подписчики) тоже меняют версию, см.
+    # recipes.counters.
+    response_cache_timeout = RESPONSE_CACHE_TIMEOUT
+
+    def get_response_cache_key(self, request):
+        versions = get_versions(*get_recipe_version_keys(
+            self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        ))
+        digest = hashlib.md5(
+            f'{request.accepted_media_type}:{request.get_full_path()}'
+            .encode(),
+            usedforsecurity=False
+        ).hexdigest()
+        return f'recipes:response:{":".join(versions)}:{digest}'
+
+    def find_cached_response(self, request):
+        key = self.get_response_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            _count(MISSES_CACHE_KEY)
+            return key, None
+        _count(HITS_CACHE_KEY)
+        content, headers = cached
+        response = get_conditional_response(
+            request,
+            etag=headers.get('ETag'),
+            last_modified=parse_http_date_safe(
+                headers.get('Last-Modified', '')
+            )
+        ) or HttpResponse(content)
+        for header, value in headers.items():
+            response[header] = value
+        response['X-Cache'] = 'HIT'
+        return key, response
+
+    def store_response(self, key, response):
+        response['X-Cache'] = 'MISS'
+        if response.status_code == 200:
+            response.add_post_render_callback(lambda rendered: cache.set(
+                key,
+                (rendered.content, {
+                    header: rendered[header] for header in CACHED_HEADERS
+                    if rendered.has_header(header)
+                }),
+                self.response_cache_timeout
+            ))
+        return response
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key, response = self.find_cached_response(request)
+        if response is not None:
+            return response
+        return self.store_response(key, handler(request, *args, **kwargs))
+
+    async def acached_response(self, request, handler, *args, **kwargs):
+        if request.user.is_authenticated:
+            return await handler(request, *args, **kwargs)
+        key, response = await sync_to_async(self.find_cached_response)(
+            request
+        )
+        if response is not None:
+            return response
+        return self.store_response(
+            key, await handler(request, *args, **kwargs)
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve,
+                                    *args, **kwargs)
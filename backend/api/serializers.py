@@ -1,32 +1,117 @@
 from django.core.validators import MaxValueValidator, MinValueValidator
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
 from rest_framework import serializers
 
+from api.constants import MAX_BULK_RECIPES
 from recipes.constants import MAX_INGREDIENT_AMOUNT, MIN_INGREDIENT_AMOUNT
+from recipes.counters import get_counter, increment_user_counter
+from recipes.feed import publish_recipe
+from recipes.inverted_index import record_recipe_ingredients
 from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from recipes.shopping_lists import update_recipe_in_shopping_lists
+from recipes.thumbnails import get_sha256, iter_variants
 from users.models import User
 
 
+class ImageVariantsField(serializers.Field):
+    # Ссылки на превью вида {'thumbnail': {'webp': url, 'jpeg': url}, ...};
+    # None, пока варианты текущего изображения не готовы.
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, obj):
+        image = getattr(obj, self.image_field)
+        variants = getattr(obj, f'{self.image_field}_variants')
+        if not image or variants.get('source') != image.name:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for variant, names in iter_variants(variants):
+            urls[variant] = {}
+            for image_format, name in names.items():
+                url = image.storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls[variant][image_format] = url
+        return urls
+
+
+def is_same_file(field_file, variants, upload):
+    # При редактировании клиент обычно присылает прежнее изображение
+    # заново: тогда файл не сохраняется, а превью не перестраиваются.
+    # Загрузка сравнивается с размером и хешем, записанными при нарезке
+    # превью, — сам файл из хранилища не читается. Пока превью не готовы,
+    # изображение просто сохраняется заново.
+    if (not field_file or variants.get('source') != field_file.name
+            or variants.get('size') != upload.size):
+        return False
+    same = get_sha256(upload.chunks()) == variants.get('sha256')
+    upload.seek(0)
+    return same
+
+
+class StreamedImageField(Base64ImageField):
+    # Принимает и строку base64, и уже готовый файл (multipart или
+    # StreamingJSONParser). Для файла проверяется только заголовок
+    # изображения, без декодирования всего растра в память.
+
+    def to_internal_value(self, data):
+        if not isinstance(data, UploadedFile):
+            return super().to_internal_value(data)
+        try:
+            with Image.open(data) as image:
+                extension = image.format.lower()
+        except (OSError, Image.DecompressionBombError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        extension = 'jpg' if extension == 'jpeg' else extension
+        if extension not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        data.seek(0)
+        data.name = f'{self.get_file_name(data)}.{extension}'
+        return data
+
+
 class UserSerializer(DjoserUserSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = serializers.ImageField(read_only=True)
+    avatar_images = ImageVariantsField('avatar')
+    recipes_count = serializers.SerializerMethodField()
+    subscribers_count = serializers.SerializerMethodField()
 
     class Meta(DjoserUserSerializer.Meta):
         model = User
-        fields = DjoserUserSerializer.Meta.fields + ('username',
-                                                     'is_subscribed', 'avatar')
+        fields = DjoserUserSerializer.Meta.fields + (
+            'username', 'is_subscribed', 'avatar', 'avatar_images',
+            'recipes_count', 'subscribers_count'
+        )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         return (
             user.is_authenticated
             and obj.subscribing.filter(user=user).exists()
         )
 
+    def get_recipes_count(self, obj):
+        return get_counter(obj, 'recipes_count')
+
+    def get_subscribers_count(self, obj):
+        return get_counter(obj, 'subscribers_count')
+
 
 class AvatarSerializer(serializers.ModelSerializer):
-    avatar = Base64ImageField()
+    avatar = StreamedImageField()
 
     class Meta:
         model = User
@@ -50,11 +135,32 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class IngredientAmountListSerializer(serializers.ListSerializer):
+    # Ингредиенты всего рецепта загружаются одним запросом, а в ответе
+    # перечисляются сразу все несуществующие id.
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        ingredients = Ingredient.objects.in_bulk(
+            {item['ingredient'] for item in items}
+        )
+        message = serializers.PrimaryKeyRelatedField.default_error_messages[
+            'does_not_exist'
+        ]
+        errors = [
+            {} if item['ingredient'] in ingredients
+            else {'id': [message.format(pk_value=item['ingredient'])]}
+            for item in items
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors, code='does_not_exist')
+        for item in items:
+            item['ingredient'] = ingredients[item['ingredient']]
+        return items
+
+
 class CreateIngredientInRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient'
-    )
+    id = serializers.IntegerField(source='ingredient')
 
     amount = serializers.IntegerField(
         validators=[
@@ -66,14 +172,27 @@ class CreateIngredientInRecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = IngredientInRecipe
         fields = ('id', 'amount')
+        list_serializer_class = IngredientAmountListSerializer
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
     image = serializers.ImageField()
+    images = ImageVariantsField('image')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
+
+
+class BulkRecipesSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_RECIPES
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
 
 
 class RecipeListSerializer(serializers.ModelSerializer):
@@ -83,32 +202,44 @@ class RecipeListSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = serializers.ImageField()
+    images = ImageVariantsField('image')
+    favorites_count = serializers.SerializerMethodField()
+    in_carts_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'author', 'ingredients', 'is_favorited',
             'is_in_shopping_cart',
-            'name', 'image', 'text', 'cooking_time',
+            'name', 'image', 'images', 'text', 'cooking_time',
+            'favorites_count', 'in_carts_count',
         )
 
-    def _check_relation(self, obj, related_manager_name):
+    def _check_relation(self, obj, annotation, related_manager_name):
         user = self.context.get('request').user
-        return (
-            user.is_authenticated
-            and getattr(obj, related_manager_name).filter(user=user).exists()
-        )
+        if not user.is_authenticated:
+            return False
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
+        return getattr(obj, related_manager_name).filter(user=user).exists()
 
     def get_is_favorited(self, obj):
-        return self._check_relation(obj, 'favorites')
+        return self._check_relation(obj, 'is_favorited', 'favorites')
 
     def get_is_in_shopping_cart(self, obj):
-        return self._check_relation(obj, 'shopping_carts')
+        return self._check_relation(obj, 'is_in_shopping_cart',
+                                    'shopping_carts')
+
+    def get_favorites_count(self, obj):
+        return get_counter(obj, 'favorites_count')
+
+    def get_in_carts_count(self, obj):
+        return get_counter(obj, 'in_carts_count')
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     ingredients = CreateIngredientInRecipeSerializer(many=True)
-    image = Base64ImageField()
+    image = StreamedImageField()
     author = UserSerializer(read_only=True)
 
     class Meta:
@@ -125,6 +256,8 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         ingredients = data.get('ingredients')
+        if ingredients is None and self.partial:
+            return data
 
         if not ingredients:
             raise serializers.ValidationError(
@@ -148,42 +281,84 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             ) for ingredient in ingredients
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         author = self.context.get('request').user
         recipe = Recipe.objects.create(author=author, **validated_data)
         self.create_ingredients(ingredients_data, recipe)
+        record_recipe_ingredients(
+            recipe.pk, (),
+            [item['ingredient'].id for item in ingredients_data]
+        )
+        increment_user_counter(author.pk, 'recipes_count')
+        publish_recipe(recipe)
         return recipe
 
+    def update_ingredients(self, recipe, ingredients):
+        # Применяется только разница с текущим составом: неизменённые
+        # строки не трогаются, количества обновляются одним bulk_update.
+        rows = {
+            row.ingredient_id: row
+            for row in IngredientInRecipe.objects.filter(recipe=recipe).only(
+                'id', 'ingredient_id', 'amount'
+            )
+        }
+        old_amounts = {pk: row.amount for pk, row in rows.items()}
+        new_amounts = {item['ingredient'].id: item['amount']
+                       for item in ingredients}
+        removed = [row.pk for pk, row in rows.items()
+                   if pk not in new_amounts]
+        changed = []
+        for pk, amount in new_amounts.items():
+            row = rows.get(pk)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if removed:
+            IngredientInRecipe.objects.filter(pk__in=removed).delete()
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ('amount',))
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe, ingredient_id=pk, amount=amount)
+            for pk, amount in new_amounts.items() if pk not in rows
+        )
+        return old_amounts, new_amounts
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients', None)
-        instance.ingredients.clear()
-        self.create_ingredients(ingredients_data, instance)
-        return super().update(instance, validated_data)
+        image = validated_data.get('image')
+        if image is not None and is_same_file(
+            instance.image, instance.image_variants, image
+        ):
+            del validated_data['image']
+        if ingredients_data is not None:
+            old_amounts, new_amounts = self.update_ingredients(
+                instance, ingredients_data
+            )
+            update_recipe_in_shopping_lists(instance, old_amounts,
+                                            new_amounts)
+            record_recipe_ingredients(instance.pk, old_amounts, new_amounts)
+        for name, value in validated_data.items():
+            setattr(instance, name, value)
+        # updated_at сохраняется всегда: от него зависят ETag списков,
+        # в том числе когда изменился только состав.
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
 
     def to_representation(self, instance):
+        # После изменения состава DRF сбрасывает предзагрузку instance.
+        prefetch_related_objects([instance], Prefetch(
+            'ingredient_list',
+            queryset=IngredientInRecipe.objects.select_related('ingredient')
+        ))
         return RecipeListSerializer(instance, context=self.context).data
 
 
 class SubscriptionSerializer(UserSerializer):
-    recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(source='recipes.count',
-                                             read_only=True)
+    recipes = RecipeMinifiedSerializer(source='limited_recipes', many=True,
+                                       read_only=True)
 
     class Meta(UserSerializer.Meta):
-        fields = (
-            UserSerializer.Meta.fields
-            + ('recipes', 'recipes_count')
-        )
-
-    def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes = obj.recipes.all()
-        if request and (limit := request.query_params.get('recipes_limit')):
-            try:
-                recipes = recipes[:int(limit)]
-            except (ValueError, TypeError):
-                pass
-        return RecipeMinifiedSerializer(
-            recipes, many=True, read_only=True, context=self.context
-        ).data
+        fields = UserSerializer.Meta.fields + ('recipes',)
@@ -0,0 +1,135 @@
+import abc
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.db.models import F
+
+from recipes.catalog import get_ingredients_version
+from recipes.models import ShoppingListLine
+from users.models import User
+
+ITERATOR_CHUNK_SIZE = 2000
+
+
+def get_shopping_list(user):
+    return ShoppingListLine.objects.filter(user=user).values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        amount=F('total_amount')
+    ).order_by('ingredient__name')
+
+
+def get_shopping_list_etag(user, list_format):
+    # Версию списка поднимает apply_shopping_list_deltas в той же
+    # транзакции, что меняет строки, поэтому для ответа 304 сами строки
+    # читать не нужно. Названия и единицы измерения отражает версия
+    # ингредиентов.
+    version = User.objects.filter(pk=user.pk).values_list(
+        'shopping_list_version', flat=True
+    ).get()
+    return (f'W/"{user.pk}-{version}-{get_ingredients_version()}-'
+            f'{list_format}"')
+
+
+async def aget_shopping_list_etag(user, list_format):
+    # Два запроса подряд: одним переходом в поток вместо двух.
+    return await sync_to_async(get_shopping_list_etag)(user, list_format)
+
+
+class ShoppingListFormat(abc.ABC):
+
+    def start(self):
+        return ''
+
+    @abc.abstractmethod
+    def line(self, item):
+        pass
+
+    def end(self):
+        return ''
+
+
+class TxtFormat(ShoppingListFormat):
+
+    def start(self):
+        return 'Список покупок:\n\n'
+
+    def line(self, item):
+        return (
+            f"• {item['ingredient__name']} "
+            f"({item['ingredient__measurement_unit']}) — "
+            f"{item['amount']}\n"
+        )
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+class CSVFormat(ShoppingListFormat):
+
+    def __init__(self):
+        self.writer = csv.writer(_Echo())
+
+    def start(self):
+        return self.writer.writerow(('name', 'measurement_unit', 'amount'))
+
+    def line(self, item):
+        return self.writer.writerow((
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            item['amount']
+        ))
+
+
+class JSONFormat(ShoppingListFormat):
+
+    def __init__(self):
+        self.separator = '['
+
+    def line(self, item):
+        line = self.separator + json.dumps({
+            'name': item['ingredient__name'],
+            'measurement_unit': item['ingredient__measurement_unit'],
+            'amount': item['amount']
+        }, ensure_ascii=False)
+        self.separator = ','
+        return line
+
+    def end(self):
+        return '[]' if self.separator == '[' else ']'
+
+
+FORMATS = {
+    'txt': TxtFormat,
+    'csv': CSVFormat,
+    'json': JSONFormat,
+}
+
+
+def stream_shopping_list(user, list_format):
+    formatter = FORMATS[list_format]()
+    yield formatter.start()
+    for item in get_shopping_list(user).iterator(
+        chunk_size=ITERATOR_CHUNK_SIZE
+    ):
+        yield formatter.line(item)
+    yield formatter.end()
+
+
+async def astream_shopping_list(user, list_format):
+    # Под ASGI каждая часть ответа — отдельная отправка, поэтому строки
+    # отдаются пачками по ITERATOR_CHUNK_SIZE, а не по одной.
+    formatter = FORMATS[list_format]()
+    lines = [formatter.start()]
+    async for item in get_shopping_list(user).aiterator(
+        chunk_size=ITERATOR_CHUNK_SIZE
+    ):
+        lines.append(formatter.line(item))
+        if len(lines) >= ITERATOR_CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+    lines.append(formatter.end())
+    yield ''.join(lines)
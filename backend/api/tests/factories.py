@@ -0,0 +1,38 @@
+from itertools import count
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from users.models import User
+
+_numbers = count(1)
+
+
+def make_user(**fields):
+    number = next(_numbers)
+    fields.setdefault('username', f'user{number}')
+    fields.setdefault('email', f'user{number}@example.com')
+    fields.setdefault('first_name', 'Имя')
+    fields.setdefault('last_name', 'Фамилия')
+    return User.objects.create_user(password='password-123', **fields)
+
+
+def make_ingredients(size, unit='г'):
+    number = next(_numbers)
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}-{index}',
+                   measurement_unit=unit)
+        for index in range(size)
+    )
+
+
+def make_recipe(author, ingredients=(), amount=10, **fields):
+    fields.setdefault('name', f'Рецепт {next(_numbers)}')
+    fields.setdefault('text', 'Описание')
+    fields.setdefault('cooking_time', 10)
+    fields.setdefault('image', 'recipes/images/test.png')
+    recipe = Recipe.objects.create(author=author, **fields)
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient,
+                           amount=amount)
+        for ingredient in ingredients
+    )
+    return recipe
@@ -0,0 +1,94 @@
+import asyncio
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import async_db, paginations
+from api.async_views import AsyncRecipeViewSet
+from api.paginations import LimitPageNumberPagination, RecipePagination
+from api.tests.factories import make_ingredients, make_recipe, make_user
+from api.views import RecipeViewSet
+from recipes.models import Recipe
+
+RECIPES = 5
+
+
+# Пул потоков открыл бы свои соединения, которые не видят транзакцию
+# теста: запросы выполняются в потоке теста.
+@override_settings(ASYNC_DB_WORKERS=0)
+class AsyncPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user()
+        cls.recipes = [make_recipe(cls.author) for _ in range(RECIPES)]
+
+    def paginate(self, paginator, params):
+        request = Request(APIRequestFactory().get('/api/recipes/', params))
+        queryset = Recipe.objects.order_by('-pub_date', '-id')
+        if asyncio.iscoroutinefunction(paginator):
+            return async_to_sync(paginator)(queryset, request)
+        return paginator(queryset, request)
+
+    def test_pages_match_sync_pagination(self):
+        for params in ({'limit': 2}, {'limit': 2, 'page': 3},
+                       {'limit': 2, 'page': 'last'},
+                       {'limit': 2, 'cursor': ''}):
+            with self.subTest(**params):
+                sync, parallel = RecipePagination(), RecipePagination()
+                self.assertEqual(
+                    self.paginate(parallel.apaginate_queryset, params),
+                    self.paginate(sync.paginate_queryset, params)
+                )
+                self.assertEqual(parallel.get_paginated_response([]).data,
+                                 sync.get_paginated_response([]).data)
+
+    def test_page_out_of_range(self):
+        with self.assertRaises(NotFound):
+            self.paginate(LimitPageNumberPagination().apaginate_queryset,
+                          {'limit': 2, 'page': 4})
+
+    def test_count_and_page_are_requested_together(self):
+        running = []
+        overlapped = []
+
+        async def run_query(func, *args):
+            running.append(func)
+            # Уступаем циклу: второй запрос должен начаться до конца
+            # первого.
+            await asyncio.sleep(0)
+            overlapped.append(len(running))
+            result = await async_db.run_query(func, *args)
+            running.remove(func)
+            return result
+
+        paginator = LimitPageNumberPagination()
+        with mock.patch.object(paginations, 'run_query', run_query):
+            page = self.paginate(paginator.apaginate_queryset,
+                                 {'limit': 2, 'page': 2})
+        self.assertEqual(page, self.recipes[::-1][2:4])
+        self.assertEqual(paginator.page.paginator.count, RECIPES)
+        self.assertEqual(overlapped, [2, 2])
+
+    def test_async_list_matches_sync_list(self):
+        ingredient, = make_ingredients(1)
+        make_recipe(self.author, [ingredient])
+        params = {'limit': 2, 'page': 2, 'facets': 'author,ingredient'}
+        responses = []
+        for view in (RecipeViewSet.as_view({'get': 'list'}),
+                     AsyncRecipeViewSet.as_view({'get': 'list'})):
+            request = APIRequestFactory().get('/api/recipes/', params)
+            force_authenticate(request, self.author)
+            if asyncio.iscoroutinefunction(view):
+                response = async_to_sync(view)(request)
+            else:
+                response = view(request)
+            self.assertEqual(response.status_code, 200)
+            responses.append(response)
+        sync, parallel = responses
+        self.assertEqual(parallel.data, sync.data)
+        self.assertEqual(parallel['ETag'], sync['ETag'])
@@ -0,0 +1,179 @@
+import threading
+from collections import Counter
+
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.testcases import skipUnlessDBFeature
+from rest_framework.test import APIClient
+
+from api.tests.factories import make_ingredients, make_recipe, make_user
+from recipes.counters import get_counter
+from recipes.models import Favorite, Recipe, ShoppingCart, ShoppingListLine
+from users.models import Subscription, User
+
+THREADS = 8
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+@override_settings(IMAGE_WORKERS=0, FEED_WORKERS=0)
+class ConcurrentWriteTests(TransactionTestCase):
+
+    def setUp(self):
+        self.author = make_user()
+        # Без изображения: после фиксации не запускается нарезка превью.
+        self.recipe = make_recipe(self.author, make_ingredients(3), image='')
+
+    def hammer(self, requests):
+        # Запросы стартуют одновременно, каждый поток — со своим
+        # соединением с базой. Возвращает коды ответов.
+        barrier = threading.Barrier(len(requests))
+        statuses = Counter()
+        lock = threading.Lock()
+
+        def run(user, method, url, data=None):
+            client = APIClient()
+            client.raise_request_exception = False
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                status = getattr(client, method)(url, data,
+                                                 format='json').status_code
+            finally:
+                connections.close_all()
+            with lock:
+                statuses[status] += 1
+
+        threads = [threading.Thread(target=run, args=request)
+                   for request in requests]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(statuses.values()), len(requests))
+        return statuses
+
+    def recipe_counter(self, field):
+        return get_counter(Recipe.objects.get(pk=self.recipe.pk), field)
+
+    def test_double_click_favorite(self):
+        user = make_user()
+        url = f'/api/recipes/{self.recipe.pk}/favorite/'
+        statuses = self.hammer([(user, 'post', url)] * THREADS)
+        self.assertEqual(statuses, {201: 1, 400: THREADS - 1})
+        self.assertEqual(Favorite.objects.filter(user=user).count(), 1)
+        self.assertEqual(self.recipe_counter('favorites_count'), 1)
+
+    def test_double_click_shopping_cart(self):
+        user = make_user()
+        url = f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+        statuses = self.hammer([(user, 'post', url)] * THREADS)
+        self.assertEqual(statuses, {201: 1, 400: THREADS - 1})
+        self.assertEqual(self.recipe_counter('in_carts_count'), 1)
+        self.assertEqual(
+            sorted(ShoppingListLine.objects.filter(user=user).values_list(
+                'total_amount', flat=True
+            )),
+            [10, 10, 10]
+        )
+
+    def test_many_users_add_at_once(self):
+        users = [make_user() for _ in range(THREADS)]
+        statuses = self.hammer(
+            [(user, 'post', f'/api/recipes/{self.recipe.pk}/favorite/')
+             for user in users]
+            + [(user, 'post', f'/api/recipes/{self.recipe.pk}/shopping_cart/')
+               for user in users]
+        )
+        self.assertEqual(statuses, {201: 2 * THREADS})
+        self.assertEqual(self.recipe_counter('favorites_count'), THREADS)
+        self.assertEqual(self.recipe_counter('in_carts_count'), THREADS)
+        self.assertEqual(ShoppingCart.objects.count(), THREADS)
+
+    def test_add_and_remove_at_once(self):
+        users = [make_user() for _ in range(THREADS)]
+        Favorite.objects.bulk_create(Favorite(user=user, recipe=self.recipe)
+                                     for user in users[::2])
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            favorites_count=len(users[::2])
+        )
+        url = f'/api/recipes/{self.recipe.pk}/favorite/'
+        statuses = self.hammer([
+            (user, 'delete' if index % 2 == 0 else 'post', url)
+            for index, user in enumerate(users)
+        ])
+        self.assertEqual(statuses, {204: THREADS // 2, 201: THREADS // 2})
+        self.assertEqual(
+            set(Favorite.objects.values_list('user_id', flat=True)),
+            {user.pk for user in users[1::2]}
+        )
+        self.assertEqual(self.recipe_counter('favorites_count'),
+                         THREADS // 2)
+
+    def test_bulk_and_single_add_at_once(self):
+        user = make_user()
+        other = make_recipe(self.author, make_ingredients(2), image='')
+        single = f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+        bulk = ('/api/recipes/shopping_cart/bulk/',
+                {'recipes': [self.recipe.pk, other.pk]})
+        statuses = self.hammer([(user, 'post', single)] * (THREADS // 2)
+                               + [(user, 'post', *bulk)] * (THREADS // 2))
+        self.assertEqual(statuses[200], THREADS // 2)
+        self.assertEqual(statuses[201] + statuses[400], THREADS // 2)
+        self.assertEqual(ShoppingCart.objects.filter(user=user).count(), 2)
+        self.assertEqual(self.recipe_counter('in_carts_count'), 1)
+        self.assertEqual(
+            get_counter(Recipe.objects.get(pk=other.pk), 'in_carts_count'), 1
+        )
+        self.assertEqual(
+            sorted(ShoppingListLine.objects.filter(user=user).values_list(
+                'total_amount', flat=True
+            )),
+            [10] * 5
+        )
+
+    def test_bulk_and_single_remove_at_once(self):
+        user = make_user()
+        client = APIClient()
+        client.force_authenticate(user)
+        client.post(f'/api/recipes/{self.recipe.pk}/shopping_cart/')
+        single = f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+        bulk = ('/api/recipes/shopping_cart/bulk/',
+                {'recipes': [self.recipe.pk]})
+        statuses = self.hammer([(user, 'delete', single)] * (THREADS // 2)
+                               + [(user, 'delete', *bulk)] * (THREADS // 2))
+        self.assertEqual(statuses[200], THREADS // 2)
+        self.assertEqual(statuses[204] + statuses[400], THREADS // 2)
+        self.assertEqual(self.recipe_counter('in_carts_count'), 0)
+        self.assertFalse(ShoppingListLine.objects.filter(
+            user=user, total_amount__gt=0
+        ).exists())
+
+    def test_double_click_subscribe(self):
+        user = make_user()
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        statuses = self.hammer([(user, 'post', url)] * THREADS)
+        self.assertEqual(statuses, {201: 1, 400: THREADS - 1})
+        self.assertEqual(Subscription.objects.filter(user=user).count(), 1)
+        self.assertEqual(
+            get_counter(User.objects.get(pk=self.author.pk),
+                        'subscribers_count'),
+            1
+        )
+
+    def test_many_users_subscribe_at_once(self):
+        users = [make_user() for _ in range(THREADS)]
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        statuses = self.hammer([(user, 'post', url) for user in users])
+        self.assertEqual(statuses, {201: THREADS})
+        self.assertEqual(
+            get_counter(User.objects.get(pk=self.author.pk),
+                        'subscribers_count'),
+            THREADS
+        )
+
+    def test_missing_target_is_not_found(self):
+        user = make_user()
+        statuses = self.hammer(
+            [(user, 'post', '/api/recipes/999999/favorite/')] * THREADS
+        )
+        self.assertEqual(statuses, {404: THREADS})
@@ -0,0 +1,57 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from api.tests.factories import make_ingredients, make_recipe, make_user
+from recipes.models import Recipe
+
+
+class RecipeConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user()
+        cls.ingredient, = make_ingredients(1)
+        cls.recipe, cls.other = (make_recipe(cls.author, [cls.ingredient])
+                                 for _ in range(2))
+        cls.detail = f'/api/recipes/{cls.recipe.pk}/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, url, status_code=200, **headers):
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, status_code)
+        return response
+
+    def test_detail_not_modified(self):
+        response = self.get(self.detail)
+        self.get(self.detail, 304, if_none_match=response['ETag'])
+        self.get(self.detail, 304,
+                 if_modified_since=response['Last-Modified'])
+
+    def test_list_has_no_last_modified(self):
+        response = self.get('/api/recipes/')
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.get('/api/recipes/', 304, if_none_match=response['ETag'])
+
+    def test_deleted_recipe_changes_list(self):
+        self.get('/api/recipes/')
+        Recipe.objects.filter(pk=self.other.pk).delete()
+        cache.clear()
+        # Максимум updated_at после удаления остался прежним.
+        response = self.get('/api/recipes/', if_modified_since=http_date())
+        self.assertEqual([recipe['id'] for recipe in response.json()[
+            'results']], [self.recipe.pk])
+
+    def test_ingredient_rename_changes_etags(self):
+        etags = [self.get(url)['ETag'] for url in ('/api/recipes/',
+                                                   self.detail)]
+        self.ingredient.name = 'соль'
+        self.ingredient.save()
+        cache.clear()
+        for url, etag in zip(('/api/recipes/', self.detail), etags):
+            response = self.get(url, if_none_match=etag)
+            self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,133 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import make_ingredients, make_recipe, make_user
+from recipes.counters import get_counter, increment_user_counter
+from recipes.models import Favorite, Recipe
+from users.models import Subscription, User
+
+
+def counter(obj, field):
+    return get_counter(type(obj).objects.get(pk=obj.pk), field)
+
+
+class AdminCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user(is_staff=True, is_superuser=True)
+        cls.author = make_user()
+        cls.ingredients = make_ingredients(1)
+        cls.recipe = make_recipe(cls.author, cls.ingredients)
+        # Рецепт из фабрики создан в обход счётчика.
+        increment_user_counter(cls.author.pk, 'recipes_count')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def delete_selected(self, model, *objects):
+        response = self.client.post(
+            f'/admin/{model._meta.app_label}/{model._meta.model_name}/', {
+                'action': 'delete_selected', 'post': 'yes',
+                '_selected_action': [obj.pk for obj in objects]
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_favorite_admin(self):
+        self.client.post('/admin/recipes/favorite/add/', {
+            'user': self.admin.pk, 'recipe': self.recipe.pk
+        })
+        self.assertEqual(counter(self.recipe, 'favorites_count'), 1)
+        self.delete_selected(Favorite, *Favorite.objects.all())
+        self.assertEqual(counter(self.recipe, 'favorites_count'), 0)
+
+    def test_shopping_cart_admin(self):
+        self.client.post('/admin/recipes/shoppingcart/add/', {
+            'user': self.admin.pk, 'recipe': self.recipe.pk
+        })
+        self.assertEqual(counter(self.recipe, 'in_carts_count'), 1)
+
+    def test_subscription_admin(self):
+        self.client.post('/admin/users/subscription/add/', {
+            'user': self.admin.pk, 'author': self.author.pk
+        })
+        self.assertEqual(counter(self.author, 'subscribers_count'), 1)
+        subscription = Subscription.objects.get()
+        self.client.post(
+            f'/admin/users/subscription/{subscription.pk}/delete/',
+            {'post': 'yes'}
+        )
+        self.assertEqual(counter(self.author, 'subscribers_count'), 0)
+
+    def test_recipe_author_change(self):
+        line = self.recipe.ingredient_list.get()
+        response = self.client.post(
+            f'/admin/recipes/recipe/{self.recipe.pk}/change/', {
+                'author': self.admin.pk,
+                'name': self.recipe.name,
+                'text': self.recipe.text,
+                'cooking_time': self.recipe.cooking_time,
+                'ingredient_list-TOTAL_FORMS': 1,
+                'ingredient_list-INITIAL_FORMS': 1,
+                'ingredient_list-MIN_NUM_FORMS': 1,
+                'ingredient_list-MAX_NUM_FORMS': 1000,
+                'ingredient_list-0-id': line.pk,
+                'ingredient_list-0-recipe': self.recipe.pk,
+                'ingredient_list-0-ingredient': line.ingredient_id,
+                'ingredient_list-0-amount': line.amount,
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(counter(self.author, 'recipes_count'), 0)
+        self.assertEqual(counter(self.admin, 'recipes_count'), 1)
+
+    def test_recipe_deletion(self):
+        self.delete_selected(Recipe, self.recipe)
+        # Без сдвига шарды в сумме дали бы -1, а не 0.
+        author = User.objects.get(pk=self.author.pk)
+        self.assertEqual(author.recipes_count + sum(
+            author.counter_shards.values_list('recipes_count', flat=True)
+        ), 0)
+
+
+class CounterResponseCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.author = make_user()
+        cls.recipe = make_recipe(cls.author, make_ingredients(1))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def anonymous_get(self, url, cache_status):
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], cache_status)
+        return response.json()
+
+    def test_favorite_invalidates_cached_list_and_detail(self):
+        detail = f'/api/recipes/{self.recipe.pk}/'
+        for url in ('/api/recipes/', detail):
+            self.anonymous_get(url, 'MISS')
+            self.anonymous_get(url, 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/recipes/{self.recipe.pk}/favorite/')
+        data = self.anonymous_get('/api/recipes/', 'MISS')
+        self.assertEqual(data['results'][0]['favorites_count'], 1)
+        self.assertEqual(
+            self.anonymous_get(detail, 'MISS')['favorites_count'], 1
+        )
+
+    def test_subscribe_invalidates_cached_detail(self):
+        detail = f'/api/recipes/{self.recipe.pk}/'
+        self.anonymous_get(detail, 'MISS')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/users/{self.author.pk}/subscribe/')
+        data = self.anonymous_get(detail, 'MISS')
+        self.assertEqual(data['author']['subscribers_count'], 1)
@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.tests.factories import make_ingredients, make_recipe, make_user
+from recipes.constants import COOKING_TIME_FACET_BUCKETS, FACET_SIZE
+from recipes.facets import get_recipe_facets
+from recipes.models import Recipe
+
+AUTHORS = FACET_SIZE + 2
+
+
+class RecipeFacetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # У автора номер index (index % 5 + 1) рецептов, и в каждом из них
+        # свой ингредиент. Граница FACET_SIZE проходит по трём равным
+        # счётчикам: в фасет попадает тот, у кого меньше id.
+        cls.authors = [make_user() for _ in range(AUTHORS)]
+        cls.ingredients = make_ingredients(AUTHORS)
+        cls.counts = {}
+        for index, author in enumerate(cls.authors):
+            cls.counts[index] = index % 5 + 1
+            for _ in range(cls.counts[index]):
+                make_recipe(author, [cls.ingredients[index]],
+                            cooking_time=10)
+
+    def setUp(self):
+        cache.clear()
+
+    def expected(self, objects, label):
+        ranked = sorted(
+            range(AUTHORS), key=lambda index: (-self.counts[index],
+                                               objects[index].pk)
+        )
+        return [
+            {'id': objects[index].pk, 'name': getattr(objects[index], label),
+             'count': self.counts[index]}
+            for index in ranked[:FACET_SIZE]
+        ]
+
+    def test_top_values_per_facet(self):
+        response = APIClient().get('/api/recipes/', {
+            'facets': 'cooking_time,author,ingredient'
+        })
+        self.assertEqual(response.status_code, 200)
+        facets = response.json()['facets']
+        self.assertEqual(facets['author'],
+                         self.expected(self.authors, 'username'))
+        self.assertEqual(facets['ingredient'],
+                         self.expected(self.ingredients, 'name'))
+        self.assertEqual(facets['cooking_time'][0]['count'],
+                         sum(self.counts.values()))
+
+    def test_limit_is_applied_in_database(self):
+        with CaptureQueriesContext(connection) as context:
+            facets = get_recipe_facets(Recipe.objects.all(),
+                                       ['author', 'ingredient'])
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(
+            context.captured_queries[0]['sql'].count(f'LIMIT {FACET_SIZE}'),
+            2
+        )
+        self.assertEqual(len(facets['author']), FACET_SIZE)
+        self.assertEqual(len(facets['ingredient']), FACET_SIZE)
+
+    def test_facets_follow_filters(self):
+        author = self.authors[0]
+        facets = get_recipe_facets(Recipe.objects.filter(author=author),
+                                   ['cooking_time', 'author'])
+        self.assertEqual(facets['author'], [
+            {'id': author.pk, 'name': author.username, 'count': 1}
+        ])
+        self.assertEqual(len(facets['cooking_time']),
+                         len(COOKING_TIME_FACET_BUCKETS))
@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.tests.factories import make_recipe, make_user
+from recipes import feed
+from recipes.feed import fan_out
+from recipes.models import TimelineEntry
+from users.models import Subscription
+
+
+@override_settings(FEED_WORKERS=0)
+class FeedFanOutTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = make_user()
+        cls.pushed = make_user()
+        cls.pulled = make_user(feed_pulled=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def subscribe(self, author):
+        response = self.client.post(f'/api/users/{author.pk}/subscribe/')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def timeline(self):
+        return list(TimelineEntry.objects.filter(
+            user=self.reader
+        ).order_by('-pub_date').values_list('recipe_id', flat=True))
+
+    def get_feed(self, **params):
+        ids = []
+        url = '/api/recipes/feed/'
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [recipe['id'] for recipe in response.json()['results']]
+            url, params = response.json()['next'], None
+        return ids
+
+    def test_subscription_backfills_pushed_author_only(self):
+        pushed = [make_recipe(self.pushed) for _ in range(2)]
+        make_recipe(self.pulled)
+        self.subscribe(self.pushed)
+        self.subscribe(self.pulled)
+        self.assertEqual(self.timeline(),
+                         [recipe.pk for recipe in reversed(pushed)])
+
+    def test_feed_merges_pushed_and_pulled_recipes(self):
+        self.subscribe(self.pushed)
+        self.subscribe(self.pulled)
+        recipes = []
+        for author in (self.pushed, self.pulled) * 3:
+            recipes.append(make_recipe(author))
+            fan_out(recipes[-1].pk)
+        # В ленту разосланы только рецепты обычного автора.
+        self.assertEqual(self.timeline(), [
+            recipe.pk for recipe in reversed(recipes)
+            if recipe.author_id == self.pushed.pk
+        ])
+        self.assertEqual(self.get_feed(limit=2),
+                         [recipe.pk for recipe in reversed(recipes)])
+
+    def test_popular_author_switches_to_pull(self):
+        self.subscribe(self.pushed)
+        recipe = make_recipe(self.pushed)
+        with mock.patch.object(feed, 'FEED_FANOUT_MAX_SUBSCRIBERS', 1):
+            fan_out(recipe.pk)
+        self.pushed.refresh_from_db()
+        self.assertTrue(self.pushed.feed_pulled)
+        self.assertEqual(self.timeline(), [])
+        self.assertEqual(self.get_feed(), [recipe.pk])
+
+    def test_unsubscribe_trims_timeline(self):
+        self.subscribe(self.pushed)
+        recipe = make_recipe(self.pushed)
+        fan_out(recipe.pk)
+        self.assertEqual(self.timeline(), [recipe.pk])
+        response = self.client.delete(
+            f'/api/users/{self.pushed.pk}/subscribe/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.timeline(), [])
+
+    def test_late_fan_out_after_unsubscribe_is_hidden(self):
+        Subscription.objects.create(user=self.reader, author=self.pushed)
+        recipe = make_recipe(self.pushed)
+        # Рассылка застала подписку, а записи дошли уже после отписки.
+        fan_out(recipe.pk)
+        Subscription.objects.filter(user=self.reader).delete()
+        self.assertEqual(self.timeline(), [recipe.pk])
+        self.assertEqual(self.get_feed(), [])
@@ -0,0 +1,89 @@
+import shutil
+import tempfile
+from concurrent.futures import Future
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.tests.factories import make_ingredients, make_recipe, make_user
+from api.tests.test_parsers import make_data_uri, make_png
+from recipes.models import Recipe
+from recipes.thumbnails import _variants_done, get_sha256
+
+
+def make_image_file(name):
+    content = BytesIO()
+    Image.new('RGB', (600, 400), 'red').save(content, 'PNG')
+    return ContentFile(content.getvalue(), name=name)
+
+
+@override_settings(IMAGE_WORKERS=0, FEED_WORKERS=0)
+class ImageVariantsTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.author = make_user()
+
+    def create_recipe(self):
+        recipe = make_recipe(self.author, image='')
+        recipe.image.save('dish.png', make_image_file('dish.png'))
+        return recipe
+
+    def test_variants_are_rendered_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.create_recipe()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants['source'], recipe.image.name)
+        for variant in ('thumbnail', 'card', 'full'):
+            for name in recipe.image_variants[variant].values():
+                self.assertTrue(recipe.image.storage.exists(name))
+
+    def test_image_deleted_before_inline_render(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.create_recipe()
+            recipe.image.storage.delete(recipe.image.name)
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).image_variants, {})
+
+    def test_image_deleted_before_pool_render(self):
+        recipe = self.create_recipe()
+        future = Future()
+        future.set_exception(FileNotFoundError(recipe.image.name))
+        with self.assertNoLogs('recipes.thumbnails'):
+            _variants_done(Recipe, recipe.pk, future)
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).image_variants, {})
+
+    def test_same_image_is_compared_by_stored_hash(self):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        image = make_data_uri(make_png())
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/recipes/', {
+                'name': 'плов', 'text': 'рис', 'cooking_time': 30,
+                'image': image,
+                'ingredients': [{'id': make_ingredients(1)[0].pk,
+                                 'amount': 5}],
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        self.assertEqual(recipe.image_variants['sha256'],
+                         get_sha256([recipe.image.read()]))
+        # Оригинала в хранилище больше нет: сравнение его не читает.
+        recipe.image.storage.delete(recipe.image.name)
+        url = f'/api/recipes/{recipe.pk}/'
+        response = client.patch(url, {'image': image}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).image.name,
+                         recipe.image.name)
+        response = client.patch(url, {'image': make_data_uri(
+            make_png(noise=True)
+        )}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertNotEqual(Recipe.objects.get(pk=recipe.pk).image.name,
+                            recipe.image.name)
@@ -0,0 +1,67 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api import ingredient_index
+from recipes.constants import INGREDIENTS_VERSION
+from recipes.models import CatalogVersion, Ingredient
+
+
+class IngredientIndexTests(TestCase):
+
+    def setUp(self):
+        # Откат транзакции теста возвращает и версию в базе, поэтому
+        # индекс прошлого теста мог бы совпасть с ней по номеру.
+        ingredient_index._index = None
+        self.client = APIClient()
+
+    def search(self, prefix):
+        response = self.client.get('/api/ingredients/', {'name': prefix})
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.json()]
+
+    def test_load_reaches_index_built_on_empty_table(self):
+        self.assertEqual(self.search('абр'), [])
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', encoding='utf-8', delete=False
+        ) as file:
+            file.write('абрикос,г\nабрикосовый джем,г\nбазилик,г\n')
+        self.addCleanup(os.remove, file.name)
+        call_command('load_ingredients', file.name, stdout=StringIO())
+        self.assertEqual(self.search('абр'), ['абрикос', 'абрикосовый джем'])
+
+    def test_version_bumped_by_another_process(self):
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        self.assertEqual(self.search('с'), ['соль'])
+        # Так выглядят для этого процесса изменения из другого: строки
+        # и версия в базе, без сигналов и без общего кэша.
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='сахар', measurement_unit='г')]
+        )
+        CatalogVersion.objects.filter(name=INGREDIENTS_VERSION).update(
+            version=F('version') + 1
+        )
+        self.assertEqual(self.search('с'), ['сахар', 'соль'])
+
+    def test_current_index_costs_one_query(self):
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        self.search('с')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.search('с'), ['соль'])
+
+    def test_rename_changes_etag(self):
+        ingredient = Ingredient.objects.create(name='соль',
+                                               measurement_unit='г')
+        etag = self.client.get('/api/ingredients/')['ETag']
+        ingredient.name = 'соль морская'
+        ingredient.save()
+        response = self.client.get('/api/ingredients/',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], 'соль морская')
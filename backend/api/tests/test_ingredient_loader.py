@@ -0,0 +1,50 @@
+from django.test import TestCase
+
+from recipes.ingredient_loader import load_ingredients
+from recipes.models import Ingredient
+
+
+class IngredientLoaderTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Как после правки в админке: регистр и пробелы не нормализованы.
+        cls.salt = Ingredient.objects.create(name='Соль  Морская',
+                                             measurement_unit='Г')
+        cls.rice = Ingredient.objects.create(name='рис',
+                                             measurement_unit='г')
+
+    def load(self, rows, **options):
+        # На PostgreSQL это путь через COPY, на остальных базах — пачки.
+        return load_ingredients(rows, **options)
+
+    def rows(self):
+        return sorted(Ingredient.objects.values_list('name',
+                                                     'measurement_unit'))
+
+    def test_normalized_rows_match_existing(self):
+        stats = self.load([(' соль морская ', 'г'), ('РИС', ' г'),
+                           ('Перец', 'щепотка')])
+        self.assertEqual(stats, {'read': 3, 'skipped': 0, 'inserted': 1,
+                                 'updated': 0, 'unchanged': 2})
+        self.assertEqual(self.rows(), [('Соль  Морская', 'Г'),
+                                       ('перец', 'щепотка'), ('рис', 'г')])
+
+    def test_upsert_changes_only_unit(self):
+        before = self.rows()
+        stats = self.load([('соль морская', 'г'), ('рис', 'кг')],
+                          upsert=True)
+        self.assertEqual((stats['updated'], stats['unchanged'],
+                          stats['inserted']), (1, 1, 0))
+        self.assertEqual(self.rows(), [before[0], ('рис', 'кг')])
+
+    def test_new_unit_without_upsert_is_added(self):
+        stats = self.load([('рис', 'кг')])
+        self.assertEqual((stats['updated'], stats['inserted']), (0, 1))
+        self.assertEqual(Ingredient.objects.filter(name='рис').count(), 2)
+
+    def test_dry_run(self):
+        stats = self.load([('рис', 'кг'), ('перец', 'г')], upsert=True,
+                          dry_run=True)
+        self.assertEqual((stats['updated'], stats['inserted']), (1, 1))
+        self.assertEqual(self.rows(), [('Соль  Морская', 'Г'), ('рис', 'г')])
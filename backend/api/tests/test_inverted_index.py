@@ -0,0 +1,170 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+
+from api.tests.factories import make_ingredients, make_recipe, make_user
+from recipes import inverted_index
+from recipes.catalog import bump_recipe_ingredients_version
+from recipes.constants import RECIPE_INGREDIENTS_LOG_VERSION
+from recipes.inverted_index import (RecipeIngredientIndex,
+                                    filter_by_ingredients,
+                                    get_recipe_ingredient_index,
+                                    record_recipe_ingredients)
+from recipes.models import (CatalogVersion, IngredientInRecipe, Recipe,
+                            RecipeIngredientChange)
+
+
+class RecipeIngredientIndexTests(TestCase):
+
+    def test_matching(self):
+        index = RecipeIngredientIndex(
+            [(1, 10), (1, 20), (2, 10), (3, 20), (3, 30), (4, 30)],
+            version=None, sequence=0
+        )
+        self.assertEqual(index.match_all([10, 20]), [1])
+        self.assertEqual(index.match_any([10, 30]), [1, 2, 3, 4])
+        self.assertEqual(index.coverage([10, 20]), {1: 2, 2: 1, 3: 1})
+        self.assertEqual(index.exclude([1, 2, 3, 4], [30]), [1, 2])
+        index.apply(4, [10], [30])
+        self.assertEqual(index.match_any([10]), [1, 2, 4])
+        self.assertEqual(index.match_any([30]), [3])
+
+    def test_changes_do_not_touch_published_index(self):
+        index = RecipeIngredientIndex([(1, 10), (2, 20)], version=None,
+                                      sequence=0)
+        updated = index.with_changes([(3, [10], [])], sequence=1)
+        self.assertEqual(updated.match_any([10]), [1, 3])
+        self.assertEqual(updated.sequence, 1)
+        self.assertEqual(index.match_any([10]), [1])
+        self.assertEqual(index.sequence, 0)
+        self.assertIs(updated.get(20), index.get(20))
+
+
+class RecipeIngredientIndexSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user()
+        cls.salt, cls.pepper, cls.rice = make_ingredients(3)
+        cls.pilaf = make_recipe(cls.author, [cls.rice, cls.salt])
+        cls.soup = make_recipe(cls.author, [cls.salt])
+
+    def setUp(self):
+        # Откат транзакции теста возвращает и номер журнала в базе.
+        inverted_index._index = None
+        cache.clear()
+
+    def recipes_with(self, *ingredients):
+        return get_recipe_ingredient_index().match_all(
+            [ingredient.pk for ingredient in ingredients]
+        )
+
+    def add_ingredient(self, recipe, ingredient):
+        IngredientInRecipe.objects.create(recipe=recipe,
+                                          ingredient=ingredient, amount=1)
+        record_recipe_ingredients(recipe.pk, (), [ingredient.pk])
+
+    def test_api_filters_use_index(self):
+        response = self.client.get('/api/recipes/', {
+            'ingredients': f'{self.salt.pk},{self.rice.pk}', 'match': 'any',
+            'exclude_ingredients': self.rice.pk
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([recipe['id'] for recipe in response.json()[
+            'results']], [self.soup.pk])
+
+    def test_recorded_change_is_applied_without_rebuild(self):
+        index = get_recipe_ingredient_index()
+        self.assertEqual(self.recipes_with(self.pepper), [])
+        self.add_ingredient(self.soup, self.pepper)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.recipes_with(self.pepper), [self.soup.pk])
+        # Полученный ранее индекс остаётся прежним.
+        self.assertEqual(index.match_all([self.pepper.pk]), [])
+        self.assertIs(get_recipe_ingredient_index().get(self.salt.pk),
+                      index.get(self.salt.pk))
+
+    def get_ids(self, params):
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_repeated_ids_are_counted_once(self):
+        recipes = filter_by_ingredients(
+            Recipe.objects.all(), [self.salt.pk, self.salt.pk, self.rice.pk],
+            None, 'best'
+        )
+        self.assertEqual(
+            list(recipes.values_list('pk', 'ingredients_coverage')),
+            [(self.pilaf.pk, 2), (self.soup.pk, 1)]
+        )
+        self.assertEqual(self.get_ids({
+            'ingredients': f'{self.salt.pk},{self.salt.pk}', 'match': 'all'
+        }), [self.soup.pk, self.pilaf.pk])
+
+    def test_large_results_are_filtered_in_database(self):
+        cases = [
+            {'ingredients': f'{self.salt.pk},{self.rice.pk}', 'match': 'all'},
+            {'ingredients': f'{self.rice.pk},{self.pepper.pk}',
+             'match': 'any'},
+            {'ingredients': f'{self.salt.pk},{self.salt.pk},{self.rice.pk}',
+             'match': 'best'},
+            {'ingredients': self.salt.pk, 'exclude_ingredients': self.rice.pk},
+        ]
+        for params in cases:
+            with self.subTest(**params):
+                expected = self.get_ids(params)
+                with mock.patch.object(inverted_index,
+                                       'INGREDIENT_INDEX_MAX_IDS', 0):
+                    self.assertEqual(self.get_ids(params), expected)
+
+    def test_change_from_another_process(self):
+        self.assertEqual(self.recipes_with(self.pepper), [])
+        # Так выглядит для этого процесса изменение из другого: строки
+        # и журнал в базе, без общего кэша.
+        IngredientInRecipe.objects.create(recipe=self.pilaf,
+                                          ingredient=self.pepper, amount=1)
+        CatalogVersion.objects.create(name=RECIPE_INGREDIENTS_LOG_VERSION,
+                                      version=1)
+        RecipeIngredientChange.objects.create(
+            number=1, recipe_id=self.pilaf.pk, added=[self.pepper.pk]
+        )
+        self.assertEqual(self.recipes_with(self.pepper), [self.pilaf.pk])
+
+    def test_bulk_change_rebuilds_index(self):
+        index = get_recipe_ingredient_index()
+        # Как seed_benchmark_data: строки в обход журнала и общая версия.
+        IngredientInRecipe.objects.create(recipe=self.soup,
+                                          ingredient=self.rice, amount=1)
+        bump_recipe_ingredients_version()
+        self.assertEqual(self.recipes_with(self.rice),
+                         [self.pilaf.pk, self.soup.pk])
+        self.assertIsNot(get_recipe_ingredient_index(), index)
+
+    def test_pruned_log_rebuilds_index(self):
+        get_recipe_ingredient_index()
+        with mock.patch.object(inverted_index,
+                               'RECIPE_INGREDIENTS_LOG_SIZE', 1):
+            self.add_ingredient(self.soup, self.pepper)
+            self.add_ingredient(self.pilaf, self.pepper)
+        self.assertEqual(RecipeIngredientChange.objects.count(), 1)
+        self.assertEqual(self.recipes_with(self.pepper),
+                         [self.pilaf.pk, self.soup.pk])
+
+    def test_rolled_back_change_is_not_logged(self):
+        get_recipe_ingredient_index()
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.add_ingredient(self.soup, self.pepper)
+            raise ValueError
+        self.assertFalse(RecipeIngredientChange.objects.exists())
+        self.assertEqual(self.recipes_with(self.pepper), [])
+        self.add_ingredient(self.soup, self.pepper)
+        self.assertEqual(
+            CatalogVersion.objects.filter(
+                name=RECIPE_INGREDIENTS_LOG_VERSION
+            ).values_list('version', flat=True).get(),
+            1
+        )
+        self.assertEqual(self.recipes_with(self.pepper), [self.soup.pk])
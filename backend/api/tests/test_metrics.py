@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from api.metrics import (RequestTimings, current_timings, registry,
+                         timed_serializer)
+from api.serializers import RecipeMinifiedSerializer
+from api.tests.factories import make_ingredients, make_recipe, make_user
+from recipes.models import Recipe
+
+
+class SerializerTimingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user()
+        ingredients = make_ingredients(3)
+        for _ in range(5):
+            make_recipe(cls.author, ingredients)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def observed_timings(self, method, url):
+        with mock.patch.object(registry, 'observe_request',
+                               wraps=registry.observe_request) as observe:
+            response = getattr(self.client, method)(url)
+        return response, observe.call_args.args[2]
+
+    def test_api_views_time_serialization(self):
+        self.client.force_authenticate(make_user())
+        recipe = Recipe.objects.first()
+        for method, url in (
+            ('get', '/api/recipes/'),
+            ('get', f'/api/recipes/{recipe.pk}/'),
+            ('post', f'/api/recipes/{recipe.pk}/favorite/'),
+            ('get', '/api/users/subscriptions/'),
+        ):
+            with self.subTest(url=url):
+                response, timings = self.observed_timings(method, url)
+                self.assertLess(response.status_code, 300)
+                self.assertGreater(timings.serializer, 0)
+                self.assertIn('serializer;dur=', response['Server-Timing'])
+
+    def test_serializers_outside_views_are_not_patched(self):
+        self.assertEqual(serializers.BaseSerializer.data.fget.__module__,
+                         'rest_framework.serializers')
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            RecipeMinifiedSerializer(Recipe.objects.all(), many=True).data
+        finally:
+            current_timings.reset(token)
+        self.assertEqual(timings.serializer, 0)
+
+    def test_timed_serializer_is_counted_once(self):
+        serializer = RecipeMinifiedSerializer(Recipe.objects.all(), many=True)
+        timed = timed_serializer(timed_serializer(serializer))
+        self.assertIsInstance(timed, serializers.ListSerializer)
+        self.assertIs(type(timed).__mro__[1], serializers.ListSerializer)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            self.assertEqual(len(timed.data), 5)
+        finally:
+            current_timings.reset(token)
+        self.assertGreater(timings.serializer, 0)
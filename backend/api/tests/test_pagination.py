@@ -0,0 +1,83 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.tests.factories import make_recipe, make_user
+from recipes.models import Recipe
+
+LIMIT = 3
+
+
+class RecipeKeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.recipes = [make_recipe(cls.user) for _ in range(8)]
+        # Две группы рецептов с одинаковой датой публикации: внутри группы
+        # порядок задаёт только id.
+        now = timezone.now()
+        Recipe.objects.filter(pk__in=[recipe.pk for recipe in cls.recipes[:5]]
+                              ).update(pub_date=now - datetime.timedelta(1))
+        Recipe.objects.filter(pk__in=[recipe.pk for recipe in cls.recipes[5:]]
+                              ).update(pub_date=now)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, page):
+        return [recipe['id'] for recipe in page['results']]
+
+    def walk(self):
+        ids = []
+        url, params = '/api/recipes/', {'cursor': '', 'limit': LIMIT}
+        while url:
+            page = self.get(url, params)
+            self.assertNotIn('count', page)
+            ids += self.ids(page)
+            url, params = page['next'], None
+        return ids
+
+    def test_ties_are_broken_by_id(self):
+        expected = [recipe.pk for recipe in reversed(self.recipes[5:])] + [
+            recipe.pk for recipe in reversed(self.recipes[:5])
+        ]
+        self.assertEqual(self.walk(), expected)
+
+    def test_cursor_is_stable_across_inserts(self):
+        first = self.get('/api/recipes/', {'cursor': '', 'limit': LIMIT})
+        offset = self.get('/api/recipes/', {'page': 1, 'limit': LIMIT})
+        self.assertEqual(self.ids(first), self.ids(offset))
+        make_recipe(self.user)
+        # Новый рецепт сдвигает страницы OFFSET, но не курсор.
+        self.assertEqual(
+            self.ids(self.get(first['next'])),
+            [recipe.pk for recipe in reversed(self.recipes[2:5])]
+        )
+        self.assertEqual(
+            self.ids(self.get('/api/recipes/', {'page': 2, 'limit': LIMIT})),
+            [self.recipes[5].pk] + [
+                recipe.pk for recipe in reversed(self.recipes[3:5])
+            ]
+        )
+
+    def test_previous_link_returns_same_page(self):
+        first = self.get('/api/recipes/', {'cursor': '', 'limit': LIMIT})
+        self.assertIsNone(first['previous'])
+        second = self.get(first['next'])
+        self.assertEqual(self.ids(self.get(second['previous'])),
+                         self.ids(first))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,130 @@
+import base64
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
+from io import BytesIO
+
+from django.core.files.uploadedfile import UploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.parsers import DataURIExtractor, StreamingJSONParser
+from api.serializers import StreamedImageField
+from api.tests.factories import make_ingredients, make_user
+from recipes.models import Recipe
+
+
+def make_png(size=(60, 40), noise=False):
+    if noise:
+        image = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3))
+    else:
+        image = Image.new('RGB', size, 'red')
+    content = BytesIO()
+    image.save(content, 'PNG')
+    return content.getvalue()
+
+
+def make_data_uri(content, content_type='image/png'):
+    return f'data:{content_type};base64,{base64.b64encode(content).decode()}'
+
+
+def parse_in_chunks(body, size):
+    extractor = DataURIExtractor()
+    for start in range(0, len(body), size):
+        extractor.feed(body[start:start + size])
+    return extractor.restore(json.loads(extractor.finish()))
+
+
+class DataURIExtractorTests(SimpleTestCase):
+
+    def test_only_image_fields_become_files(self):
+        png = make_png()
+        body = json.dumps({
+            'image': make_data_uri(png),
+            'text': make_data_uri(png),
+            'items': [make_data_uri(png), {'avatar': make_data_uri(png)}],
+        }).encode()
+        # Части разного размера режут ключи, маркер и base64 в разных
+        # местах.
+        for size in (1, 3, 7, 64, len(body)):
+            with self.subTest(size=size):
+                data = parse_in_chunks(body, size)
+                self.assertIsInstance(data['image'], UploadedFile)
+                self.assertEqual(data['image'].read(), png)
+                self.assertEqual(data['text'], make_data_uri(png))
+                self.assertEqual(data['items'][0], make_data_uri(png))
+                self.assertIsInstance(data['items'][1]['avatar'],
+                                      UploadedFile)
+
+    def test_key_with_image_value_is_text(self):
+        data = parse_in_chunks(
+            json.dumps(['image', make_data_uri(b'png')]).encode(), 4
+        )
+        self.assertEqual(data, ['image', make_data_uri(b'png')])
+
+    def test_escaped_strings_stay_intact(self):
+        body = json.dumps({'im\\"age': 'data:x;base64,"\\/',
+                           'image': 'плов "домашний"'}).encode()
+        for size in (1, 2, len(body)):
+            with self.subTest(size=size):
+                self.assertEqual(parse_in_chunks(body, size),
+                                 json.loads(body))
+
+    def test_large_image_peak_memory(self):
+        # Картинка ~10 МБ приходит строкой base64 ~13 МБ; в памяти не
+        # должно оказаться ни той, ни другой.
+        png = make_png((2000, 1800), noise=True)
+        body = json.dumps({'name': 'плов', 'image': make_data_uri(png)})
+        stream = BytesIO(body.encode())
+        del body
+        self.assertGreater(len(png), 10 * 1024 * 1024)
+        tracemalloc.start()
+        try:
+            data = StreamingJSONParser().parse(stream)
+            image = StreamedImageField().to_internal_value(data['image'])
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(image.size, len(png))
+        self.assertLess(peak, len(png) // 2)
+
+
+@override_settings(IMAGE_WORKERS=0)
+class RecipeTextTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.ingredients = make_ingredients(1)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, text):
+        return self.client.post('/api/recipes/', {
+            'name': 'плов',
+            'text': text,
+            'cooking_time': 10,
+            'image': make_data_uri(make_png()),
+            'ingredients': [{'id': self.ingredients[0].pk, 'amount': 5}],
+        }, format='json')
+
+    def test_data_uri_like_text_is_saved_as_text(self):
+        for text in ('data:x;base64,hello world',
+                     'data:text/plain;base64,aGVsbG8='):
+            with self.subTest(text=text):
+                response = self.create_recipe(text)
+                self.assertEqual(response.status_code, 201,
+                                 response.content)
+                recipe = Recipe.objects.get(pk=response.json()['id'])
+                self.assertEqual(recipe.text, text)
+                self.assertTrue(recipe.image.name.endswith('.png'))
@@ -0,0 +1,141 @@
+import json
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.tests.factories import make_ingredients, make_recipe, make_user
+from recipes.models import Favorite, ShoppingCart, ShoppingListLine
+from users.models import Subscription
+
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+def find_seq_scans(node):
+    if node.get('Node Type') == 'Seq Scan':
+        yield node['Relation Name']
+    for child in node.get('Plans', ()):
+        yield from find_seq_scans(child)
+
+
+def get_seq_scans(sql):
+    # На PostgreSQL последовательное сканирование запрещается: если оно
+    # всё равно осталось в плане, подходящего индекса нет, сколько бы
+    # строк ни было в таблице. SQLite без ANALYZE считает таблицы большими
+    # и берёт индекс всегда, когда он есть; SCAN без индекса — полный
+    # просмотр (CTE и подзапросы отсеиваются по именам таблиц).
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+            cursor.execute('SET LOCAL enable_seqscan = on')
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return list(find_seq_scans(plan[0]['Plan']))
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        tables = set(connection.introspection.table_names(cursor))
+        return [
+            match[1] for match in (
+                SQLITE_SCAN.match(row[-1]) for row in cursor.fetchall()
+            )
+            if match and match[1] in tables
+        ]
+
+
+class HotQueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.authors = [make_user() for _ in range(3)]
+        cls.ingredients = make_ingredients(10)
+        cls.recipes = [
+            make_recipe(cls.authors[index % 3],
+                        cls.ingredients[index % 10:index % 10 + 3],
+                        cooking_time=5 + index)
+            for index in range(60)
+        ]
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[0])
+        Subscription.objects.create(user=cls.user, author=cls.authors[0])
+        ShoppingListLine.objects.create(user=cls.user,
+                                        ingredient=cls.ingredients[0],
+                                        total_amount=10)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def capture(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith(('SELECT', 'WITH'))
+        ]
+
+    def assertNoSeqScans(self, *urls):
+        for url in urls:
+            with self.subTest(url=url):
+                # Индексы в памяти (ингредиенты, инвертированный индекс)
+                # строятся полным чтением таблиц; проверяется повторный
+                # запрос, который их уже не перестраивает.
+                self.capture(url)
+                for sql in self.capture(url):
+                    self.assertEqual(get_seq_scans(sql), [], sql)
+
+    def test_recipe_list_filters(self):
+        author = self.authors[0].pk
+        first, second, third = (ingredient.pk
+                                for ingredient in self.ingredients[:3])
+        self.assertNoSeqScans(
+            '/api/recipes/',
+            '/api/recipes/?limit=20&page=2',
+            '/api/recipes/?cursor=',
+            f'/api/recipes/?author={author}',
+            f'/api/recipes/?author={author},{self.authors[1].pk}',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1',
+            '/api/recipes/?cooking_time_min=10&cooking_time_max=20',
+            f'/api/recipes/?ingredient={first}',
+            '/api/recipes/?search=рецепт',
+            '/api/recipes/?search=ре',
+            f'/api/recipes/?ingredients={first},{second}',
+            f'/api/recipes/?ingredients={first},{second}&match=any',
+            f'/api/recipes/?ingredients={first},{second}&match=best',
+            f'/api/recipes/?exclude_ingredients={third}',
+            # Фасеты без фильтров по определению считают все рецепты.
+            f'/api/recipes/?author={author}'
+            '&facets=cooking_time,author,ingredient',
+        )
+
+    def test_recipe_detail_and_feed(self):
+        self.assertNoSeqScans(
+            f'/api/recipes/{self.recipes[0].pk}/',
+            f'/api/recipes/{self.recipes[0].pk}/get-link/',
+            '/api/recipes/feed/',
+        )
+
+    def test_subscriptions_and_users(self):
+        self.assertNoSeqScans(
+            '/api/users/subscriptions/',
+            '/api/users/subscriptions/?recipes_limit=2',
+            f'/api/users/{self.authors[0].pk}/',
+            '/api/users/me/',
+        )
+
+    def test_shopping_list_and_ingredients(self):
+        self.assertNoSeqScans(
+            '/api/recipes/download_shopping_cart/',
+            '/api/recipes/download_shopping_cart/?format=csv',
+            '/api/ingredients/?name=ингр',
+            f'/api/ingredients/{self.ingredients[0].pk}/',
+        )
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import make_ingredients, make_recipe, make_user
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+# Валидаторы ETag, число рецептов, страница, авторы, ингредиенты.
+LIST_QUERIES = 5
+# Рецепт (валидаторы ETag берутся из него же), автор, ингредиенты.
+DETAIL_QUERIES = 3
+
+
+class RecipeQueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.authors = [make_user() for _ in range(5)]
+        ingredients = make_ingredients(5)
+        cls.recipes = [
+            make_recipe(cls.authors[index % len(cls.authors)], ingredients)
+            for index in range(120)
+        ]
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[-1])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[-2])
+        Subscription.objects.create(user=cls.user, author=cls.authors[0])
+
+    def setUp(self):
+        # Версии и кэш ответов не должны переходить из теста в тест.
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, queries, client=None):
+        with self.assertNumQueries(queries):
+            response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list_page(self):
+        self.get('/api/recipes/', LIST_QUERIES)
+
+    def test_large_page_costs_the_same(self):
+        data = self.get('/api/recipes/?limit=100', LIST_QUERIES)
+        self.assertEqual(len(data['results']), 100)
+
+    def test_anonymous_list_page(self):
+        self.get('/api/recipes/?limit=100', LIST_QUERIES, APIClient())
+
+    def test_detail_page(self):
+        self.get(f'/api/recipes/{self.recipes[0].pk}/', DETAIL_QUERIES)
+
+    def test_list_flags_come_from_annotations(self):
+        data = self.get('/api/recipes/?limit=100', LIST_QUERIES)
+        recipes = {recipe['id']: recipe for recipe in data['results']}
+        favorite = recipes[self.recipes[-1].pk]
+        in_cart = recipes[self.recipes[-2].pk]
+        self.assertTrue(favorite['is_favorited'])
+        self.assertFalse(favorite['is_in_shopping_cart'])
+        self.assertTrue(in_cart['is_in_shopping_cart'])
+        self.assertFalse(in_cart['is_favorited'])
+        for recipe in recipes.values():
+            self.assertEqual(
+                recipe['author']['is_subscribed'],
+                recipe['author']['id'] == self.authors[0].pk
+            )
+            self.assertEqual(len(recipe['ingredients']), 5)
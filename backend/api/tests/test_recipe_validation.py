@@ -0,0 +1,132 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.serializers import CreateIngredientInRecipeSerializer
+from api.tests.factories import make_ingredients, make_recipe, make_user
+from api.tests.test_parsers import make_data_uri, make_png
+from recipes.models import IngredientInRecipe
+
+MANY = 40
+
+
+@override_settings(IMAGE_WORKERS=0)
+class RecipeValidationQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user()
+        cls.ingredients = make_ingredients(MANY + 1)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def payload(self, ingredients):
+        return {
+            'name': 'плов',
+            'text': 'рис и морковь',
+            'cooking_time': 30,
+            'image': make_data_uri(make_png()),
+            'ingredients': [{'id': ingredient.pk, 'amount': 5}
+                            for ingredient in ingredients],
+        }
+
+    def count_queries(self, method, url, ingredients):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(
+                url, self.payload(ingredients), format='json'
+            )
+        self.assertLess(response.status_code, 300, response.content)
+        return len(context.captured_queries)
+
+    def test_ingredients_are_loaded_in_one_query(self):
+        for ingredients in (self.ingredients[:1], self.ingredients[:MANY]):
+            serializer = CreateIngredientInRecipeSerializer(
+                many=True, data=[{'id': ingredient.pk, 'amount': 5}
+                                 for ingredient in ingredients]
+            )
+            with self.assertNumQueries(1):
+                self.assertTrue(serializer.is_valid())
+            self.assertEqual(
+                [item['ingredient'] for item in serializer.validated_data],
+                list(ingredients)
+            )
+
+    @mock.patch('recipes.counters.random.randrange', return_value=0)
+    def test_create_queries_do_not_depend_on_ingredients(self, randrange):
+        # Шард счётчика закреплён: первая запись в шард создаёт его строку.
+        # Первый рецепт создаёт и её, и строку версии журнала.
+        self.count_queries('post', '/api/recipes/', self.ingredients[:1])
+        self.assertEqual(
+            self.count_queries('post', '/api/recipes/',
+                               self.ingredients[:1]),
+            self.count_queries('post', '/api/recipes/',
+                               self.ingredients[:MANY])
+        )
+
+    def test_update_queries_do_not_depend_on_ingredients(self):
+        # Первое изменение состава создаёт строку версии журнала.
+        warm_up = make_recipe(self.author, self.ingredients[MANY:])
+        self.count_queries('put', f'/api/recipes/{warm_up.pk}/',
+                           self.ingredients[:1])
+        for method in ('put', 'patch'):
+            with self.subTest(method=method):
+                # В обоих рецептах единственный ингредиент заменяется
+                # новым составом.
+                one, many = (make_recipe(self.author,
+                                         self.ingredients[MANY:])
+                             for _ in range(2))
+                self.assertEqual(
+                    self.count_queries(method, f'/api/recipes/{one.pk}/',
+                                       self.ingredients[:1]),
+                    self.count_queries(method, f'/api/recipes/{many.pk}/',
+                                       self.ingredients[:MANY])
+                )
+
+    def test_update_applies_only_difference(self):
+        kept, changed, removed, added = self.ingredients[:4]
+        recipe = make_recipe(self.author, [kept, changed, removed])
+        rows = dict(IngredientInRecipe.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', 'pk'))
+        response = self.client.patch(f'/api/recipes/{recipe.pk}/', {
+            'ingredients': [{'id': kept.pk, 'amount': 10},
+                            {'id': changed.pk, 'amount': 20},
+                            {'id': added.pk, 'amount': 5}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        current = {
+            ingredient_id: (pk, amount)
+            for pk, ingredient_id, amount in IngredientInRecipe.objects.filter(
+                recipe=recipe
+            ).values_list('pk', 'ingredient_id', 'amount')
+        }
+        self.assertEqual(set(current), {kept.pk, changed.pk, added.pk})
+        self.assertEqual(current[kept.pk], (rows[kept.pk], 10))
+        self.assertEqual(current[changed.pk], (rows[changed.pk], 20))
+        self.assertEqual(current[added.pk][1], 5)
+
+    def test_unknown_ids_are_reported_at_once(self):
+        payload = self.payload(self.ingredients[:2])
+        payload['ingredients'] += [{'id': 999998, 'amount': 5},
+                                   {'id': 999999, 'amount': 5}]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/recipes/', payload,
+                                        format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(context.captured_queries), 1)
+        errors = response.json()['ingredients']
+        self.assertEqual(errors[:2], [{}, {}])
+        for error, pk in zip(errors[2:], (999998, 999999)):
+            self.assertIn(str(pk), error['id'][0])
@@ -0,0 +1,92 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import make_ingredients, make_recipe, make_user
+
+
+class AnonymousResponseCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user()
+        cls.ingredient, = make_ingredients(1)
+        cls.recipe, cls.other = (make_recipe(cls.author, [cls.ingredient])
+                                 for _ in range(2))
+        cls.detail = f'/api/recipes/{cls.recipe.pk}/'
+        cls.other_detail = f'/api/recipes/{cls.other.pk}/'
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, cache_status):
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], cache_status)
+        return response.json()
+
+    def warm_up(self, *urls):
+        for url in urls:
+            self.get(url, 'MISS')
+            self.get(url, 'HIT')
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.warm_up(self.detail)
+        client = APIClient()
+        client.force_authenticate(self.author)
+        response = client.get(self.detail)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Cache'))
+
+    def test_recipe_change_invalidates_list_and_its_detail(self):
+        self.warm_up('/api/recipes/', self.detail, self.other_detail)
+        self.recipe.name = 'Новое название'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.save()
+        self.assertEqual(self.get(self.detail, 'MISS')['name'],
+                         'Новое название')
+        self.get('/api/recipes/', 'MISS')
+        # Карточки других рецептов остаются в кэше.
+        self.get(self.other_detail, 'HIT')
+
+    def test_recipe_delete_invalidates_list(self):
+        self.warm_up('/api/recipes/')
+        client = APIClient()
+        client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.delete(self.detail)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            [recipe['id'] for recipe in self.get('/api/recipes/',
+                                                 'MISS')['results']],
+            [self.other.pk]
+        )
+
+    def test_ingredient_rename_invalidates_details(self):
+        self.warm_up('/api/recipes/', self.detail, self.other_detail)
+        self.ingredient.name = 'соль'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredient.save()
+        for url in (self.detail, self.other_detail):
+            self.assertEqual(self.get(url, 'MISS')['ingredients'][0]['name'],
+                             'соль')
+        self.get('/api/recipes/', 'MISS')
+
+    def test_author_change_invalidates_details(self):
+        self.warm_up(self.detail)
+        self.author.first_name = 'Пётр'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        self.assertEqual(self.get(self.detail, 'MISS')['author'][
+            'first_name'], 'Пётр')
+
+    def test_rolled_back_change_keeps_cache(self):
+        self.warm_up(self.detail)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(ValueError), transaction.atomic():
+                self.recipe.name = 'Новое название'
+                self.recipe.save()
+                raise ValueError
+        self.assertEqual(callbacks, [])
+        self.get(self.detail, 'HIT')
@@ -0,0 +1,155 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import make_ingredients, make_recipe, make_user
+from recipes.models import ShoppingCart, ShoppingListLine
+from recipes.shopping_lists import (add_recipe_to_shopping_list,
+                                    apply_shopping_list_deltas)
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingListETagTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user()
+        cls.ingredients = make_ingredients(3)
+        ShoppingListLine.objects.bulk_create(
+            ShoppingListLine(user=cls.user, ingredient=ingredient,
+                             total_amount=10)
+            for ingredient in cls.ingredients
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, etag=None, list_format='txt'):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(URL, {'format': list_format}, **headers)
+
+    def assertChanged(self, etag):
+        response = self.download(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return b''.join(response.streaming_content).decode()
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.download()['ETag']
+        self.assertEqual(self.download(etag).status_code, 304)
+
+    def test_formats_have_different_etags(self):
+        self.assertNotEqual(self.download()['ETag'],
+                            self.download(list_format='csv')['ETag'])
+
+    def test_ingredient_rename_changes_etag(self):
+        etag = self.download()['ETag']
+        ingredient = self.ingredients[0]
+        ingredient.name = 'переименованный'
+        ingredient.save()
+        self.assertIn('переименованный', self.assertChanged(etag))
+
+    def test_measurement_unit_change_changes_etag(self):
+        etag = self.download()['ETag']
+        ingredient = self.ingredients[0]
+        ingredient.measurement_unit = 'кг'
+        ingredient.save()
+        self.assertIn('(кг)', self.assertChanged(etag))
+
+    def test_not_modified_without_reading_rows(self):
+        etag = self.download()['ETag']
+        # Версия списка и версия ингредиентов.
+        with self.assertNumQueries(2):
+            self.assertEqual(self.download(etag).status_code, 304)
+
+    def test_cancelling_amount_edits_change_etag(self):
+        # +1, -2, +1 не меняют ни число строк, ни сумму количеств.
+        etag = self.download()['ETag']
+        apply_shopping_list_deltas([self.user.pk], dict(
+            zip((ingredient.pk for ingredient in self.ingredients),
+                (1, -2, 1))
+        ))
+        self.assertIn('— 8', self.assertChanged(etag))
+
+    def test_rebuild_changes_etag(self):
+        etag = self.download()['ETag']
+        # Корзина пуста, поэтому восстановление удаляет все строки.
+        call_command('rebuild_shopping_lists', stdout=StringIO())
+        self.assertFalse(ShoppingListLine.objects.exists())
+        self.assertEqual(self.assertChanged(etag), 'Список покупок:\n\n')
+
+
+class ShoppingListAdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user(is_staff=True, is_superuser=True)
+        cls.salt, cls.rice = make_ingredients(2)
+        cls.recipe = make_recipe(cls.admin, [cls.salt], amount=5)
+
+    def setUp(self):
+        ShoppingCart.objects.create(user=self.admin, recipe=self.recipe)
+        add_recipe_to_shopping_list(self.admin, self.recipe)
+        self.client.force_login(self.admin)
+
+    def shopping_list(self):
+        return dict(ShoppingListLine.objects.filter(
+            user=self.admin
+        ).values_list('ingredient_id', 'total_amount'))
+
+    def test_inline_change_applies_deltas(self):
+        line = self.recipe.ingredient_list.get()
+        response = self.client.post(
+            f'/admin/recipes/recipe/{self.recipe.pk}/change/', {
+                'author': self.admin.pk,
+                'name': self.recipe.name,
+                'text': self.recipe.text,
+                'cooking_time': self.recipe.cooking_time,
+                'ingredient_list-TOTAL_FORMS': 2,
+                'ingredient_list-INITIAL_FORMS': 1,
+                'ingredient_list-MIN_NUM_FORMS': 1,
+                'ingredient_list-MAX_NUM_FORMS': 1000,
+                'ingredient_list-0-id': line.pk,
+                'ingredient_list-0-recipe': self.recipe.pk,
+                'ingredient_list-0-ingredient': self.salt.pk,
+                'ingredient_list-0-amount': 7,
+                'ingredient_list-1-recipe': self.recipe.pk,
+                'ingredient_list-1-ingredient': self.rice.pk,
+                'ingredient_list-1-amount': 3,
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.shopping_list(),
+                         {self.salt.pk: 7, self.rice.pk: 3})
+
+    def test_recipe_deletion_removes_lines(self):
+        response = self.client.post(
+            f'/admin/recipes/recipe/{self.recipe.pk}/delete/',
+            {'post': 'yes'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.shopping_list(), {})
+
+    def test_cart_admin_applies_deltas(self):
+        cart = ShoppingCart.objects.get(user=self.admin)
+        response = self.client.post('/admin/recipes/shoppingcart/', {
+            'action': 'delete_selected', '_selected_action': [cart.pk],
+            'post': 'yes'
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.shopping_list(), {})
+        self.client.post('/admin/recipes/shoppingcart/add/', {
+            'user': self.admin.pk, 'recipe': self.recipe.pk
+        })
+        self.assertEqual(self.shopping_list(), {self.salt.pk: 5})
+
+    def test_negative_total_is_not_clamped(self):
+        with self.assertRaises(IntegrityError):
+            apply_shopping_list_deltas([self.admin.pk], {self.salt.pk: -6})
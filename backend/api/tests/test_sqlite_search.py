@@ -0,0 +1,57 @@
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.factories import make_recipe, make_user
+from recipes.sqlite_search import SQLITE_TRIGGERS, restore_search_triggers
+
+
+def get_search_triggers():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'trigger' AND tbl_name = 'recipes_recipe'"
+        )
+        return {name for name, in cursor.fetchall()}
+
+
+@skipUnless(connection.vendor == 'sqlite', 'FTS5 только на SQLite')
+class SQLiteSearchTriggerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = make_user()
+
+    def search(self, query):
+        # Версии кэша ответов сбрасываются после фиксации, которой в
+        # TestCase нет.
+        cache.clear()
+        response = APIClient().get('/api/recipes/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def assertTriggersPresent(self):
+        self.assertEqual(get_search_triggers(),
+                         {name for name, sql in SQLITE_TRIGGERS})
+
+    def test_triggers_present_after_migrate(self):
+        self.assertTriggersPresent()
+
+    def test_missing_triggers_are_restored(self):
+        # Так выглядит база после миграции, пересоздавшей recipes_recipe.
+        with connection.cursor() as cursor:
+            for name, sql in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {name}')
+        recipe = make_recipe(self.author, name='плов с курицей')
+        self.assertEqual(self.search('плов'), [])
+        restore_search_triggers(sender=None)
+        self.assertTriggersPresent()
+        # Строка, добавленная без триггеров, попадает в индекс при
+        # перестроении, а изменения снова отслеживаются.
+        self.assertEqual(self.search('плов'), ['плов с курицей'])
+        recipe.name = 'плов с бараниной'
+        recipe.save()
+        self.assertEqual(self.search('баранин'), ['плов с бараниной'])
@@ -0,0 +1,115 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import local_tokens
+from api.tests.factories import make_user
+from api.tests.test_parsers import make_data_uri, make_png
+from users.models import User
+
+PASSWORD = 'password-123'
+
+
+class TokenCacheTests(TestCase):
+
+    def setUp(self):
+        local_tokens.clear()
+        cache.clear()
+        self.user = make_user()
+        self.client = APIClient()
+        response = self.client.post('/api/auth/token/login/', {
+            'email': self.user.email, 'password': PASSWORD
+        })
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.json()["auth_token"]}'
+        )
+
+    def me(self):
+        # Код ответа и был ли запрос к таблице токенов.
+        with CaptureQueriesContext(connection) as context:
+            status = self.client.get('/api/users/me/').status_code
+        return status, any(Token._meta.db_table in query['sql']
+                           for query in context.captured_queries)
+
+    def test_cached_token_skips_database(self):
+        self.assertEqual(self.me(), (200, True))
+        self.assertEqual(self.me(), (200, False))
+
+    def test_logout_forgets_token(self):
+        self.me()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.me(), (401, True))
+
+    def test_token_deletion_forgets_token(self):
+        self.me()
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.get(user=self.user).delete()
+        self.assertEqual(self.me()[0], 401)
+
+    def test_password_change_reloads_user(self):
+        self.me()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/users/set_password/', {
+                'current_password': PASSWORD, 'new_password': 'n3w-Passw0rd'
+            })
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.me(), (200, True))
+
+    def test_deactivation_forgets_token(self):
+        self.me()
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.me()[0], 401)
+
+    def test_forgotten_only_after_commit(self):
+        # До фиксации удаление токена ещё может откатиться.
+        self.me()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Token.objects.get(user=self.user).delete()
+            self.assertEqual(self.me(), (200, False))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.me()[0], 401)
+
+    @override_settings(AUTH_TOKEN_SHARED_CACHE=True)
+    def test_logout_clears_shared_cache(self):
+        self.me()
+        # Другой процесс: пусто в памяти, снимок только в общем кэше.
+        local_tokens.clear()
+        self.assertEqual(self.me(), (200, False))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/token/logout/')
+        local_tokens.clear()
+        self.assertEqual(self.me(), (401, True))
+
+    @override_settings(IMAGE_WORKERS=0)
+    def test_writes_do_not_restore_stale_snapshot(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.me()
+        # Изменение из другого процесса: снимок в памяти этого не видит.
+        User.objects.filter(pk=self.user.pk).update(first_name='Пётр')
+        with override_settings(MEDIA_ROOT=media_root):
+            response = self.client.put('/api/users/me/avatar/', {
+                'avatar': make_data_uri(make_png())
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(last_name='Петров')
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': PASSWORD, 'new_password': 'n3w-Passw0rd'
+        })
+        self.assertEqual(response.status_code, 204)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual((user.first_name, user.last_name), ('Пётр', 'Петров'))
+        self.assertTrue(user.avatar)
+        self.assertTrue(user.check_password('n3w-Passw0rd'))
@@ -1,14 +1,24 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import IngredientViewSet, RecipeViewSet, UserViewSet
+from api.async_views import AsyncIngredientViewSet, AsyncRecipeViewSet
+from api.views import (IngredientViewSet, MetricsView, RecipeViewSet,
+                       UserViewSet)
+
+# Под ASGI чтение рецептов и ингредиентов обслуживают корутины.
+ingredient_views, recipe_views = (
+    (AsyncIngredientViewSet, AsyncRecipeViewSet) if settings.ASYNC_VIEWS
+    else (IngredientViewSet, RecipeViewSet)
+)
 
 router = DefaultRouter()
 router.register('users', UserViewSet, basename='users')
-router.register('ingredients', IngredientViewSet, basename='ingredients')
-router.register('recipes', RecipeViewSet, basename='recipes')
+router.register('ingredients', ingredient_views, basename='ingredients')
+router.register('recipes', recipe_views, basename='recipes')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
@@ -1,31 +1,115 @@
-import io
-
-from django.db.models import Sum
-from django.http import FileResponse
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Value
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
-from rest_framework import permissions, status, viewsets
+from rest_framework import permissions, renderers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from api.conditional import (IngredientConditionalMixin,
+                             RecipeConditionalMixin, UserConditionalMixin)
 from api.filters import IngredientFilter, RecipeFilter
-from api.paginations import LimitPageNumberPagination
+from api.ingredient_index import get_ingredient_index
+from api.metrics import (SerializerTimingMixin, registry, render_prometheus,
+                         timed_serializer)
+from api.paginations import (FeedPagination, RecipePagination,
+                             UserPagination)
 from api.permissions import IsAuthorOrReadOnly
-from api.serializers import (AvatarSerializer, IngredientSerializer,
+from api.renderers import CSVRenderer, PlainTextRenderer
+from api.response_cache import (AnonymousResponseCacheMixin,
+                                get_response_cache_stats)
+from api.serializers import (AvatarSerializer, BulkRecipesSerializer,
+                             IngredientSerializer,
                              RecipeCreateSerializer, RecipeListSerializer,
                              RecipeMinifiedSerializer, SubscriptionSerializer,
                              UserSerializer)
+from api.shopping_list import get_shopping_list_etag, stream_shopping_list
+from recipes.catalog import stored_version
+from recipes.constants import INGREDIENTS_VERSION
+from recipes.counters import (RELATION_COUNTERS, annotate_recipe_counters,
+                              annotate_user_counters,
+                              increment_recipe_counter,
+                              increment_recipe_counters,
+                              increment_user_counter)
+from recipes.facets import get_recipe_facets
+from recipes.feed import backfill_timeline, trim_timeline
+from recipes.inverted_index import record_recipe_ingredients
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                             ShoppingCart)
+from recipes.relations import add_relation, add_relations, remove_relations
+from recipes.shopping_lists import (add_recipe_to_shopping_list,
+                                    add_recipes_to_shopping_list,
+                                    get_recipe_amounts,
+                                    remove_recipe_from_shopping_list,
+                                    remove_recipes_from_shopping_list,
+                                    update_recipe_in_shopping_lists)
 from users.models import Subscription, User
 
 
-class UserViewSet(DjoserUserViewSet):
+def parse_pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise Http404
+
+
+def annotate_is_subscribed(queryset, user):
+    if not user.is_authenticated:
+        return queryset
+    return queryset.annotate(
+        is_subscribed=Exists(
+            Subscription.objects.filter(user=user, author=OuterRef('pk'))
+        )
+    )
+
+
+class UserViewSet(SerializerTimingMixin, UserConditionalMixin,
+                  DjoserUserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    pagination_class = LimitPageNumberPagination
+    pagination_class = UserPagination
+    # Пользователь из CachedTokenAuthentication — снимок, который может
+    # отставать от базы. Эти действия сохраняют пользователя целиком и
+    # получают свежую копию, иначе save() записал бы устаревшие поля
+    # поверх изменений из других процессов.
+    fresh_user_actions = ('avatar', 'set_password', 'set_username')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.fresh_user_actions:
+            request.user = User.objects.get(pk=request.user.pk)
+
+    def get_queryset(self):
+        return annotate_user_counters(annotate_is_subscribed(
+            super().get_queryset(), self.request.user
+        ))
+
+    def get_instance(self):
+        # Пользователь из CachedTokenAuthentication приходит без счётчиков:
+        # для /me/ они загружаются вместе с ним одним запросом.
+        return self.get_queryset().get(pk=self.request.user.pk)
+
+    def get_subscriptions_queryset(self, request):
+        recipes = Recipe.objects.all()
+        limit = request.query_params.get('recipes_limit')
+        try:
+            limit = int(limit)
+        except (ValueError, TypeError):
+            limit = None
+        if limit is not None and limit >= 0:
+            recipes = recipes[:limit]
+        return annotate_user_counters(User.objects.filter(
+            subscribing__user=request.user
+        ).annotate(
+            is_subscribed=Value(True)
+        )).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        ).order_by('username')
 
     @action(detail=False, methods=['put', 'delete'],
             permission_classes=[permissions.IsAuthenticated],
@@ -33,7 +117,8 @@ class UserViewSet(DjoserUserViewSet):
     def avatar(self, request):
         user = request.user
         if request.method == 'PUT':
-            serializer = AvatarSerializer(user, data=request.data)
+            serializer = timed_serializer(
+                AvatarSerializer(user, data=request.data))
             serializer.is_valid(raise_exception=True)
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -44,36 +129,49 @@ class UserViewSet(DjoserUserViewSet):
 
     @action(detail=False, permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, request):
-        user = request.user
-        queryset = User.objects.filter(subscribing__user=user)
+        queryset = self.get_subscriptions_queryset(request)
         pages = self.paginate_queryset(queryset)
-        serializer = SubscriptionSerializer(
-            pages, many=True, context={'request': request})
+        serializer = timed_serializer(SubscriptionSerializer(
+            pages, many=True, context={'request': request}))
         return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post', 'delete'],
             permission_classes=[permissions.IsAuthenticated])
     def subscribe(self, request, id=None):
         user = request.user
-        author = get_object_or_404(User, pk=id)
+        author_id = parse_pk(id)
 
         if request.method == 'POST':
-            if user == author:
+            if user.pk == author_id:
                 return Response({'error': 'Cannot subscribe to yourself'},
                                 status=status.HTTP_400_BAD_REQUEST)
-            if Subscription.objects.filter(user=user, author=author).exists():
+            with transaction.atomic():
+                author, created = add_relation(
+                    Subscription, user.pk, 'author', author_id, ('id',)
+                )
+                if author is None:
+                    raise Http404
+                if created:
+                    increment_user_counter(author_id, 'subscribers_count')
+                    backfill_timeline(user.pk, author_id)
+            if not created:
                 return Response({'error': 'Already subscribed'},
                                 status=status.HTTP_400_BAD_REQUEST)
-
-            Subscription.objects.create(user=user, author=author)
-            serializer = SubscriptionSerializer(
-                author, context={'request': request})
+            serializer = timed_serializer(SubscriptionSerializer(
+                self.get_subscriptions_queryset(request).get(pk=author_id),
+                context={'request': request}))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        deleted_count, _ = Subscription.objects.filter(user=user,
-                                                       author=author).delete()
+        with transaction.atomic():
+            deleted_count, _ = Subscription.objects.filter(
+                user=user, author_id=author_id
+            ).delete()
+            if deleted_count:
+                increment_user_counter(author_id, 'subscribers_count', -1)
+                trim_timeline(user.pk, author_id)
 
         if deleted_count == 0:
+            get_object_or_404(User, pk=author_id)
             return Response(
                 {'error': 'Вы не были подписаны на этого пользователя'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -87,7 +185,8 @@ class UserViewSet(DjoserUserViewSet):
         return super().get_permissions()
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(SerializerTimingMixin, IngredientConditionalMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = IngredientSerializer
@@ -95,24 +194,86 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        index = get_ingredient_index()
+        return self.conditional_response(
+            request, self.get_list_validators(index), self.list_from_index,
+            index
+        )
+
+    def list_from_index(self, request, index):
+        return HttpResponse(index.render(request.query_params.get('name')),
+                            content_type='application/json')
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SerializerTimingMixin, AnonymousResponseCacheMixin,
+                    RecipeConditionalMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [permissions.IsAuthenticatedOrReadOnly,
                           IsAuthorOrReadOnly]
-    pagination_class = LimitPageNumberPagination
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
-    def _generate_shopping_list_text(self, ingredients):
-        shopping_list = "Список покупок:\n\n"
-        for item in ingredients:
-            shopping_list += (
-                f"• {item['ingredient__name']} "
-                f"({item['ingredient__measurement_unit']}) — "
-                f"{item['amount']}\n"
+    def get_queryset(self):
+        user = self.request.user
+        queryset = annotate_recipe_counters(
+            Recipe.objects.defer('search_vector')
+        )
+        queryset = queryset.prefetch_related(
+            Prefetch(
+                'author',
+                queryset=annotate_user_counters(
+                    annotate_is_subscribed(User.objects.all(), user)
+                )
+            ),
+            Prefetch(
+                'ingredient_list',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient')
+            )
+        )
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=Exists(
+                    Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+                ),
+                is_in_shopping_cart=Exists(
+                    ShoppingCart.objects.filter(user=user,
+                                                recipe=OuterRef('pk'))
+                )
             )
-        return shopping_list
+        if self.action == 'retrieve':
+            # Версия ингредиентов для ETag карточки (api.conditional).
+            queryset = queryset.annotate(
+                ingredients_version=stored_version(INGREDIENTS_VERSION)
+            )
+        return queryset
+
+    def get_facets(self, queryset):
+        # Параметр facets уже проверен RecipeFilter.
+        names = self.request.query_params.get('facets')
+        return names and get_recipe_facets(
+            queryset, list(dict.fromkeys(names.split(',')))
+        )
+
+    def paginate_queryset(self, queryset):
+        self.facets = self.get_facets(queryset)
+        return super().paginate_queryset(queryset)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.facets:
+            response.data['facets'] = self.facets
+        return response
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        amounts = get_recipe_amounts(instance)
+        update_recipe_in_shopping_lists(instance, amounts, {})
+        record_recipe_ingredients(instance.pk, amounts, ())
+        increment_user_counter(instance.author_id, 'recipes_count', -1)
+        instance.delete()
 
     def get_serializer_class(self):
         if self.request.method not in permissions.SAFE_METHODS:
@@ -120,27 +281,81 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return RecipeListSerializer
 
     def add_to(self, model, user, pk):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        if model.objects.filter(user=user, recipe=recipe).exists():
+        with transaction.atomic():
+            row, created = add_relation(
+                model, user.pk, 'recipe', parse_pk(pk),
+                ('id', 'name', 'image', 'image_variants', 'cooking_time')
+            )
+            if row is None:
+                raise Http404
+            recipe = Recipe(**row)
+            if created:
+                increment_recipe_counter(recipe.pk, RELATION_COUNTERS[model])
+            if created and model is ShoppingCart:
+                add_recipe_to_shopping_list(user, recipe)
+        if not created:
             return Response({'error': 'Recipe already added'},
                             status=status.HTTP_400_BAD_REQUEST)
-        model.objects.create(user=user, recipe=recipe)
-        serializer = RecipeMinifiedSerializer(recipe)
+        serializer = timed_serializer(RecipeMinifiedSerializer(recipe))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete_from(self, model, user, pk):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        deleted_count, _ = model.objects.filter(
-            user=user,
-            recipe=recipe
-        ).delete()
+        recipe = Recipe(pk=parse_pk(pk))
+        with transaction.atomic():
+            deleted_count, _ = model.objects.filter(
+                user=user,
+                recipe=recipe
+            ).delete()
+            if deleted_count:
+                increment_recipe_counter(recipe.pk, RELATION_COUNTERS[model],
+                                         -1)
+            if deleted_count and model is ShoppingCart:
+                remove_recipe_from_shopping_list(user, recipe)
         if deleted_count == 0:
+            get_object_or_404(Recipe, pk=recipe.pk)
             return Response(
                 {'error': 'Рецепт не найден в списке'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def bulk_add_to(self, model, user, ids):
+        with transaction.atomic():
+            found, added = add_relations(model, user.pk, 'recipe', ids)
+            if added:
+                # Счётчики и список покупок меняются только для связей,
+                # которые вставил этот запрос.
+                increment_recipe_counters(added, RELATION_COUNTERS[model])
+                if model is ShoppingCart:
+                    add_recipes_to_shopping_list(user, added)
+        return [
+            {'id': pk,
+             'status': ('added' if pk in added
+                        else 'exists' if pk in found else 'not_found')}
+            for pk in ids
+        ]
+
+    def bulk_delete_from(self, model, user, ids):
+        with transaction.atomic():
+            removed = remove_relations(model, user.pk, 'recipe', ids)
+            if removed:
+                increment_recipe_counters(removed, RELATION_COUNTERS[model],
+                                          -1)
+                if model is ShoppingCart:
+                    remove_recipes_from_shopping_list(user, removed)
+        return [
+            {'id': pk, 'status': 'removed' if pk in removed else 'not_found'}
+            for pk in ids
+        ]
+
+    def bulk(self, request, model):
+        serializer = BulkRecipesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            return Response(self.bulk_add_to(model, request.user, ids))
+        return Response(self.bulk_delete_from(model, request.user, ids))
+
     @action(detail=True, methods=['post', 'delete'],
             permission_classes=[permissions.IsAuthenticated])
     def favorite(self, request, pk=None):
@@ -155,32 +370,72 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return self.add_to(ShoppingCart, request.user, pk)
         return self.delete_from(ShoppingCart, request.user, pk)
 
-    @action(detail=False, permission_classes=[permissions.IsAuthenticated])
-    def download_shopping_cart(self, request):
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__shopping_carts__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(
-            amount=Sum('amount')
-        ).order_by('ingredient__name')
-
-        shopping_list_text = self._generate_shopping_list_text(ingredients)
+    @action(detail=False, methods=['post', 'delete'],
+            permission_classes=[permissions.IsAuthenticated],
+            url_path='favorite/bulk')
+    def favorite_bulk(self, request):
+        return self.bulk(request, Favorite)
 
-        file_object = io.BytesIO(shopping_list_text.encode('utf-8'))
+    @action(detail=False, methods=['post', 'delete'],
+            permission_classes=[permissions.IsAuthenticated],
+            url_path='shopping_cart/bulk')
+    def shopping_cart_bulk(self, request):
+        return self.bulk(request, ShoppingCart)
 
-        response = FileResponse(
-            file_object,
-            as_attachment=True,
-            filename='shopping_list.txt',
-            content_type='text/plain; charset=utf-8'
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated],
+            renderer_classes=[PlainTextRenderer, CSVRenderer,
+                              renderers.JSONRenderer])
+    def download_shopping_cart(self, request):
+        return self.shopping_list_response(
+            request,
+            get_shopping_list_etag(request.user,
+                                   request.accepted_renderer.format),
+            stream_shopping_list
         )
 
+    def shopping_list_response(self, request, etag, streamer):
+        renderer = request.accepted_renderer
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = StreamingHttpResponse(
+                streamer(request.user, renderer.format),
+                content_type=f'{renderer.media_type}; charset=utf-8'
+            )
+            response['Content-Disposition'] = (
+                f'attachment; filename="shopping_list.{renderer.format}"'
+            )
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept', 'Authorization'))
         return response
 
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated],
+            pagination_class=FeedPagination)
+    def feed(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['get'], url_path='get-link')
     def get_link(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
-        link = request.build_absolute_uri(f'/recipes/{recipe.id}')
+        return self.link_response(request, recipe.id)
+
+    def link_response(self, request, recipe_id):
+        link = request.build_absolute_uri(f'/recipes/{recipe_id}')
         return Response({'short-link': link}, status=status.HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        stats = get_response_cache_stats()
+        return HttpResponse(
+            render_prometheus(registry.collect(), {
+                'foodgram_response_cache_hits_total': (
+                    'Ответы из кэша анонимных ответов', stats['hits']),
+                'foodgram_response_cache_misses_total': (
+                    'Промахи кэша анонимных ответов', stats['misses']),
+            }),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
@@ -3,6 +3,22 @@ DEFAULT_PAGE_SIZE = 6
 PAGE_SIZE_QUERY_PARAM = 'limit'
 MIN_INGREDIENT_AMOUNT = 1
 MAX_INGREDIENT_AMOUNT = 32767
+RESPONSE_CACHE_TIMEOUT = 60
+MAX_BULK_RECIPES = 100
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Метрики
+METRICS_DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+METRICS_QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+METRICS_FLUSH_INTERVAL = 1
+
+# Кэш токенов: записей в процессе, срок жизни в процессе и в общем кэше
+AUTH_TOKEN_CACHE_KEY = 'auth:token:{}'
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TIMEOUT = 10
+AUTH_TOKEN_SHARED_CACHE_TIMEOUT = 300
 
 # Пользователи
 EMAIL_MAX_LENGTH = 254
@@ -16,3 +32,57 @@ UNIT_MAX_LENGTH = 64
 RECIPE_NAME_MAX_LENGTH = 256
 MIN_COOKING_TIME = 1
 MIN_AMOUNT = 1
+# Названия версий в таблице CatalogVersion
+VERSION_NAME_MAX_LENGTH = 64
+INGREDIENTS_VERSION = 'ingredients'
+# Инвертированный индекс ингредиент -> рецепты: версия полной
+# перестройки, номер последнего изменения в журнале и сколько
+# последних изменений журнал хранит.
+RECIPE_INGREDIENTS_VERSION = 'recipe_ingredients'
+RECIPE_INGREDIENTS_LOG_VERSION = 'recipe_ingredients_log'
+RECIPE_INGREDIENTS_LOG_SIZE = 10000
+RECIPES_VERSION_CACHE_KEY = 'recipes:version'
+RECIPE_VERSION_CACHE_KEY = 'recipes:version:{}'
+RECIPES_RELATED_VERSION_CACHE_KEY = 'recipes:version:related'
+INGREDIENT_MATCH_MODES = ('all', 'any', 'best')
+# Сколько id рецептов из индекса передаётся в запрос одним параметром;
+# при большем числе фильтр по ингредиентам строится соединением.
+INGREDIENT_INDEX_MAX_IDS = 20000
+
+# Поиск рецептов: конфигурация полнотекстового поиска PostgreSQL и
+# длина запроса, с которой он применяется вместо триграмм.
+SEARCH_CONFIG = 'russian'
+SEARCH_FULLTEXT_MIN_LENGTH = 3
+
+# Фасеты списка рецептов: корзины времени приготовления (границы
+# включительно, как у cooking_time_min/max) и число значений в фасетах
+# автора и ингредиента.
+RECIPE_FACETS = ('cooking_time', 'author', 'ingredient')
+COOKING_TIME_FACET_BUCKETS = ((1, 15), (16, 30), (31, 60), (61, None))
+FACET_SIZE = 10
+
+# Лента подписок: авторы с таким числом подписчиков не рассылают
+# рецепты по лентам, их рецепты подмешиваются при чтении; размер пачки
+# подписчиков при рассылке и число рецептов, добавляемых при подписке.
+FEED_FANOUT_MAX_SUBSCRIBERS = 10000
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 100
+
+# Счётчики
+COUNTER_SHARDS = 8
+
+# Изображения: вариант -> максимальный размер (ширина, высота)
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+IMAGE_FORMATS = ('webp', 'jpeg')
+IMAGE_QUALITY = 82
+
+# Нагрузочные замеры
+BENCHMARK_USERNAME_PREFIX = 'bench_'
+BENCHMARK_PASSWORD = 'benchmark-password'
+BENCHMARK_IMAGE_NAME = 'recipes/images/benchmark.jpg'
+# Уже нормализован: load_ingredients сохраняет его как есть.
+BENCHMARK_INGREDIENT_PREFIX = 'bench '
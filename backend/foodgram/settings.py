@@ -15,9 +15,18 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("DB_HOST", "db"),
         "PORT": os.getenv("DB_PORT", "5432"),
+        "CONN_MAX_AGE": int(os.getenv("CONN_MAX_AGE", "0")),
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -36,6 +45,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -97,15 +107,46 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Процессы для нарезки превью; 0 — нарезать в потоке запроса.
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', '2'))
+
+# Потоки для рассылки новых рецептов по лентам подписчиков; 0 —
+# рассылать в потоке запроса после фиксации транзакции.
+FEED_WORKERS = int(os.getenv('FEED_WORKERS', '2'))
+
+# Асинхронные представления для чтения рецептов и ингредиентов;
+# foodgram/asgi.py включает их по умолчанию, под WSGI они не нужны.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '0') in ('1', 'true', 'True')
+
+# Потоки со своими соединениями для параллельных запросов асинхронных
+# представлений; 0 — выполнять запросы по очереди в потоке запроса.
+ASYNC_DB_WORKERS = int(os.getenv('ASYNC_DB_WORKERS', '4'))
+
+# Каталог для файлов метрик воркеров gunicorn; пусто — только метрики
+# текущего процесса.
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+
+# Хранить пользователей по токенам ещё и в общем кэше (имеет смысл,
+# когда CACHE_BACKEND — Redis или Memcached, а не память процесса).
+AUTH_TOKEN_SHARED_CACHE = os.getenv(
+    'AUTH_TOKEN_SHARED_CACHE', '0'
+) in ('1', 'true', 'True')
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.StreamingJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
 }
 
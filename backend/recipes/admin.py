@@ -1,7 +1,43 @@
 from django.contrib import admin
+from django.db import transaction
 
+from .counters import (annotate_recipe_counters, get_counter,
+                       increment_recipe_counter, increment_user_counter)
+from .feed import publish_recipe
+from .inverted_index import record_recipe_ingredients
 from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                     ShoppingCart)
+                     ShoppingCart, ShoppingListLine)
+from .shopping_lists import (add_recipe_to_shopping_list,
+                             bump_shopping_list_versions, get_recipe_amounts,
+                             remove_recipe_from_shopping_list,
+                             update_recipe_in_shopping_lists)
+
+
+class RelationAdminMixin:
+    # Связи, созданные и удалённые в админке, обновляют счётчики (и
+    # список покупок) так же, как через API.
+
+    def relation_added(self, obj):
+        pass
+
+    def relation_removed(self, obj):
+        pass
+
+    def save_model(self, request, obj, form, change):
+        if change and form.changed_data:
+            self.relation_removed(self.model.objects.get(pk=obj.pk))
+        super().save_model(request, obj, form, change)
+        if not change or form.changed_data:
+            self.relation_added(obj)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.relation_removed(obj)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.delete_model(request, obj)
 
 
 class IngredientInline(admin.TabularInline):
@@ -11,17 +47,61 @@ class IngredientInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'id', 'author', 'added_in_favorites')
-    readonly_fields = ('added_in_favorites',)
+    list_display = ('name', 'id', 'author', 'added_in_favorites',
+                    'added_in_carts')
+    readonly_fields = ('added_in_favorites', 'added_in_carts')
+    exclude = ('favorites_count', 'in_carts_count')
 
     search_fields = ('name', 'author__username')
 
     list_filter = ('author',)
     inlines = (IngredientInline,)
 
-    @admin.display(description='В избранном')
+    def get_queryset(self, request):
+        return annotate_recipe_counters(
+            super().get_queryset(request).select_related('author')
+        )
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'author' in form.changed_data:
+            increment_user_counter(form.initial['author'], 'recipes_count',
+                                   -1)
+        if not change or 'author' in form.changed_data:
+            increment_user_counter(obj.author_id, 'recipes_count')
+
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        old_amounts = get_recipe_amounts(recipe)
+        super().save_related(request, form, formsets, change)
+        new_amounts = get_recipe_amounts(recipe)
+        record_recipe_ingredients(recipe.pk, old_amounts, new_amounts)
+        # Рецепт уже может лежать в корзинах: их списки покупок
+        # получают разницу количеств, как при изменении через API.
+        update_recipe_in_shopping_lists(recipe, old_amounts, new_amounts)
+        if not change:
+            publish_recipe(recipe)
+
+    def delete_model(self, request, obj):
+        amounts = get_recipe_amounts(obj)
+        update_recipe_in_shopping_lists(obj, amounts, {})
+        record_recipe_ingredients(obj.pk, amounts, ())
+        increment_user_counter(obj.author_id, 'recipes_count', -1)
+        super().delete_model(request, obj)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        for recipe in queryset:
+            self.delete_model(request, recipe)
+
+    @admin.display(description='В избранном',
+                   ordering='favorites_count')
     def added_in_favorites(self, obj):
-        return obj.favorites.count()
+        return get_counter(obj, 'favorites_count')
+
+    @admin.display(description='В корзинах', ordering='in_carts_count')
+    def added_in_carts(self, obj):
+        return get_counter(obj, 'in_carts_count')
 
 
 @admin.register(Ingredient)
@@ -34,14 +114,49 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(RelationAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
 
     search_fields = ('user__username', 'user__email', 'recipe__name')
 
+    def relation_added(self, obj):
+        increment_recipe_counter(obj.recipe_id, 'favorites_count')
+
+    def relation_removed(self, obj):
+        increment_recipe_counter(obj.recipe_id, 'favorites_count', -1)
+
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(RelationAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
 
     search_fields = ('user__username', 'user__email', 'recipe__name')
+
+    def relation_added(self, obj):
+        increment_recipe_counter(obj.recipe_id, 'in_carts_count')
+        add_recipe_to_shopping_list(obj.user, obj.recipe)
+
+    def relation_removed(self, obj):
+        increment_recipe_counter(obj.recipe_id, 'in_carts_count', -1)
+        remove_recipe_from_shopping_list(obj.user, obj.recipe)
+
+
+@admin.register(ShoppingListLine)
+class ShoppingListLineAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'ingredient', 'total_amount')
+    list_select_related = ('user', 'ingredient')
+
+    search_fields = ('user__username', 'user__email', 'ingredient__name')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        bump_shopping_list_versions([obj.user_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_shopping_list_versions([obj.user_id])
+
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        bump_shopping_list_versions(user_ids)
@@ -5,3 +5,10 @@ class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
     verbose_name = "Рецепты"
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import signals  # noqa: F401
+        from .sqlite_search import restore_search_triggers
+        post_migrate.connect(restore_search_triggers, sender=self)
@@ -0,0 +1,89 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Subquery
+
+from .constants import (INGREDIENTS_VERSION, RECIPE_INGREDIENTS_VERSION,
+                        RECIPE_VERSION_CACHE_KEY,
+                        RECIPES_RELATED_VERSION_CACHE_KEY,
+                        RECIPES_VERSION_CACHE_KEY)
+from .models import CatalogVersion
+
+
+def get_version(key):
+    return cache.get_or_set(key, uuid4().hex, timeout=None)
+
+
+def get_versions(*keys):
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_version(*keys):
+    # Новая версия публикуется только после фиксации транзакции, иначе
+    # параллельный запрос успеет закэшировать старые данные под ней.
+    transaction.on_commit(lambda: cache.set_many(
+        {key: uuid4().hex for key in keys}, timeout=None
+    ))
+
+
+def get_stored_versions(*names):
+    versions = dict(CatalogVersion.objects.filter(
+        name__in=names
+    ).values_list('name', 'version'))
+    return [versions.get(name, 0) for name in names]
+
+
+def stored_version(name):
+    # Та же версия подзапросом: читается одним запросом с данными.
+    return Subquery(
+        CatalogVersion.objects.filter(name=name).values('version')[:1]
+    )
+
+
+def bump_stored_version(name):
+    # UPDATE блокирует строку версии до конца транзакции, поэтому версии
+    # фиксируются в том же порядке, в каком выданы.
+    versions = CatalogVersion.objects.filter(name=name)
+    if not versions.update(version=F('version') + 1):
+        CatalogVersion.objects.bulk_create([CatalogVersion(name=name)],
+                                           ignore_conflicts=True)
+        versions.update(version=F('version') + 1)
+    return versions.values_list('version', flat=True).get()
+
+
+def get_ingredients_version():
+    return get_stored_versions(INGREDIENTS_VERSION)[0]
+
+
+def bump_ingredients_version():
+    return bump_stored_version(INGREDIENTS_VERSION)
+
+
+def get_recipe_version_keys(recipe_id=None):
+    # Список рецептов зависит от общей версии, отдельный рецепт — от своей
+    # версии и версии связанных данных (ингредиенты, авторы).
+    if recipe_id is None:
+        return (RECIPES_VERSION_CACHE_KEY,)
+    return (RECIPES_RELATED_VERSION_CACHE_KEY,
+            RECIPE_VERSION_CACHE_KEY.format(recipe_id))
+
+
+def bump_recipes_version(recipe_id=None):
+    if recipe_id is None:
+        bump_version(RECIPES_VERSION_CACHE_KEY,
+                     RECIPES_RELATED_VERSION_CACHE_KEY)
+    else:
+        bump_version(RECIPES_VERSION_CACHE_KEY,
+                     RECIPE_VERSION_CACHE_KEY.format(recipe_id))
+
+
+def bump_recipe_ingredients_version():
+    # Для массовых изменений ингредиентов рецептов в обход сериализатора:
+    # инвертированный индекс будет перестроен целиком.
+    return bump_stored_version(RECIPE_INGREDIENTS_VERSION)
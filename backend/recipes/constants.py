@@ -1,7 +1,27 @@
-from foodgram.constants import (INGREDIENT_NAME_MAX_LENGTH,
+from foodgram.constants import (BENCHMARK_IMAGE_NAME,
+                                BENCHMARK_INGREDIENT_PREFIX,
+                                BENCHMARK_PASSWORD, BENCHMARK_USERNAME_PREFIX,
+                                COOKING_TIME_FACET_BUCKETS, COUNTER_SHARDS,
+                                FACET_SIZE, FEED_BACKFILL_SIZE,
+                                FEED_FANOUT_BATCH_SIZE,
+                                FEED_FANOUT_MAX_SUBSCRIBERS, IMAGE_FORMATS,
+                                IMAGE_QUALITY, IMAGE_VARIANTS,
+                                INGREDIENT_INDEX_MAX_IDS,
+                                INGREDIENT_MATCH_MODES,
+                                INGREDIENT_NAME_MAX_LENGTH,
+                                INGREDIENTS_VERSION,
                                 MAX_INGREDIENT_AMOUNT, MIN_AMOUNT,
                                 MIN_COOKING_TIME, MIN_INGREDIENT_AMOUNT,
-                                RECIPE_NAME_MAX_LENGTH, UNIT_MAX_LENGTH)
+                                RECIPE_FACETS,
+                                RECIPE_INGREDIENTS_LOG_SIZE,
+                                RECIPE_INGREDIENTS_LOG_VERSION,
+                                RECIPE_INGREDIENTS_VERSION,
+                                RECIPE_NAME_MAX_LENGTH,
+                                RECIPE_VERSION_CACHE_KEY,
+                                RECIPES_RELATED_VERSION_CACHE_KEY,
+                                RECIPES_VERSION_CACHE_KEY, SEARCH_CONFIG,
+                                SEARCH_FULLTEXT_MIN_LENGTH, UNIT_MAX_LENGTH,
+                                VERSION_NAME_MAX_LENGTH)
 
 NAME_MAX_LENGTH = INGREDIENT_NAME_MAX_LENGTH
 
@@ -12,5 +32,31 @@ __all__ = [
     'MIN_COOKING_TIME',
     'MIN_AMOUNT',
     'MIN_INGREDIENT_AMOUNT',
-    'MAX_INGREDIENT_AMOUNT'
+    'MAX_INGREDIENT_AMOUNT',
+    'VERSION_NAME_MAX_LENGTH',
+    'INGREDIENTS_VERSION',
+    'RECIPES_VERSION_CACHE_KEY',
+    'RECIPE_VERSION_CACHE_KEY',
+    'RECIPES_RELATED_VERSION_CACHE_KEY',
+    'COUNTER_SHARDS',
+    'IMAGE_VARIANTS',
+    'IMAGE_FORMATS',
+    'IMAGE_QUALITY',
+    'BENCHMARK_USERNAME_PREFIX',
+    'BENCHMARK_PASSWORD',
+    'BENCHMARK_IMAGE_NAME',
+    'BENCHMARK_INGREDIENT_PREFIX',
+    'SEARCH_CONFIG',
+    'SEARCH_FULLTEXT_MIN_LENGTH',
+    'RECIPE_INGREDIENTS_VERSION',
+    'RECIPE_INGREDIENTS_LOG_VERSION',
+    'RECIPE_INGREDIENTS_LOG_SIZE',
+    'INGREDIENT_MATCH_MODES',
+    'INGREDIENT_INDEX_MAX_IDS',
+    'RECIPE_FACETS',
+    'COOKING_TIME_FACET_BUCKETS',
+    'FACET_SIZE',
+    'FEED_FANOUT_MAX_SUBSCRIBERS',
+    'FEED_FANOUT_BATCH_SIZE',
+    'FEED_BACKFILL_SIZE',
 ]
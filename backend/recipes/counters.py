@@ -0,0 +1,168 @@
+import random
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest, Now
+
+from users.models import Subscription, User, UserCounterShard
+
+from .catalog import bump_recipes_version
+from .constants import COUNTER_SHARDS
+from .models import Favorite, Recipe, RecipeCounterShard, ShoppingCart
+
+RECIPE_COUNTERS = ('favorites_count', 'in_carts_count')
+RELATION_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+USER_COUNTERS = ('recipes_count', 'subscribers_count')
+
+# Счётчик: (модель, модель шардов, поле-владелец в шарде) -> источник
+# истины (модель, внешний ключ на владельца) для каждого поля.
+COUNTERS = (
+    (Recipe, RecipeCounterShard, 'recipe', {
+        'favorites_count': (Favorite, 'recipe'),
+        'in_carts_count': (ShoppingCart, 'recipe'),
+    }),
+    (User, UserCounterShard, 'user', {
+        'recipes_count': (Recipe, 'author'),
+        'subscribers_count': (Subscription, 'author'),
+    }),
+)
+
+# Изменения счётчиков пишутся в случайный из COUNTER_SHARDS шардов, а не
+# в строку рецепта/пользователя, поэтому параллельные лайки популярного
+# рецепта не выстраиваются в очередь за одной блокировкой. Итоговое
+# значение — поле модели плюс сумма шардов; reconcile_counters
+# периодически переносит шарды в поле модели.
+# Счётчики входят в закэшированные ответы анонимам, поэтому каждое
+# изменение итогового значения меняет версию рецептов: счётчики рецепта —
+# его версию, счётчики пользователя — версию всех рецептов, в которых он
+# может быть автором.
+
+
+def _increment(shard_model, owner_field, owner_id, field, delta):
+    lookup = {owner_field: owner_id,
+              'shard': random.randrange(COUNTER_SHARDS)}
+    changes = {field: F(field) + delta, 'updated_at': Now()}
+    if shard_model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            shard_model.objects.create(**lookup, **{field: delta})
+    except IntegrityError:
+        shard_model.objects.filter(**lookup).update(**changes)
+
+
+def _increment_many(shard_model, owner_field, owner_ids, field, delta):
+    # Один шард на всю пачку: недостающие строки создаются одним
+    # INSERT ... ON CONFLICT DO NOTHING, затем все меняются одним UPDATE.
+    shard = random.randrange(COUNTER_SHARDS)
+    shard_model.objects.bulk_create(
+        (shard_model(**{owner_field: owner_id, 'shard': shard})
+         for owner_id in owner_ids),
+        ignore_conflicts=True
+    )
+    shard_model.objects.filter(
+        **{f'{owner_field}__in': owner_ids, 'shard': shard}
+    ).update(**{field: F(field) + delta, 'updated_at': Now()})
+
+
+def increment_recipe_counter(recipe_id, field, delta=1):
+    _increment(RecipeCounterShard, 'recipe_id', recipe_id, field, delta)
+    bump_recipes_version(recipe_id)
+
+
+def increment_recipe_counters(recipe_ids, field, delta=1):
+    _increment_many(RecipeCounterShard, 'recipe_id', recipe_ids, field,
+                    delta)
+    bump_recipes_version()
+
+
+def increment_user_counter(user_id, field, delta=1):
+    _increment(UserCounterShard, 'user_id', user_id, field, delta)
+    bump_recipes_version()
+
+
+def _pending(shard_model, owner_field, field):
+    return Coalesce(
+        Subquery(
+            shard_model.objects.filter(
+                **{owner_field: OuterRef('pk')}
+            ).values(owner_field).annotate(total=Sum(field)).values('total')
+        ),
+        0
+    )
+
+
+def _count(model, owner_field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{owner_field: OuterRef('pk')}
+            ).values(owner_field).annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+def annotate_recipe_counters(queryset):
+    return queryset.annotate(**{
+        f'pending_{field}': _pending(RecipeCounterShard, 'recipe', field)
+        for field in RECIPE_COUNTERS
+    })
+
+
+def annotate_user_counters(queryset):
+    return queryset.annotate(**{
+        f'pending_{field}': _pending(UserCounterShard, 'user', field)
+        for field in USER_COUNTERS
+    })
+
+
+def get_counter(obj, field):
+    pending = getattr(obj, f'pending_{field}', None)
+    if pending is None:
+        pending = obj.counter_shards.aggregate(total=Sum(field))['total']
+    return max(getattr(obj, field) + (pending or 0), 0)
+
+
+def fold_counters(model, shard_model, owner_field, sources, owner_ids):
+    fields = tuple(sources)
+    with transaction.atomic():
+        shards = list(
+            shard_model.objects.select_for_update().filter(
+                **{f'{owner_field}__in': owner_ids}
+            )
+        )
+        totals = {}
+        for shard in shards:
+            owner_totals = totals.setdefault(
+                getattr(shard, f'{owner_field}_id'), dict.fromkeys(fields, 0)
+            )
+            for field in fields:
+                owner_totals[field] += getattr(shard, field)
+        for owner_id, owner_totals in totals.items():
+            model.objects.filter(pk=owner_id).update(**{
+                field: Greatest(F(field) + owner_totals[field], 0)
+                for field in fields
+            })
+        shard_model.objects.filter(pk__in=[shard.pk for shard in shards]
+                                   ).delete()
+    return len(shards)
+
+
+def reconcile_counters(model, shard_model, owner_field, sources, owner_ids):
+    fixed = 0
+    for field, (source_model, source_field) in sources.items():
+        expected = Greatest(
+            _count(source_model, source_field)
+            - _pending(shard_model, owner_field, field),
+            0
+        )
+        fixed += model.objects.filter(pk__in=owner_ids).alias(
+            expected=expected
+        ).filter(~Q(**{field: F('expected')})).update(**{field: expected})
+    if fixed:
+        bump_recipes_version()
+    return fixed
@@ -0,0 +1,86 @@
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+
+from .constants import COOKING_TIME_FACET_BUCKETS, FACET_SIZE
+from .models import Ingredient, IngredientInRecipe, User
+
+
+def get_cooking_time_bucket():
+    cases = ' '.join(
+        f'WHEN cooking_time <= {high} THEN {number}'
+        for number, (low, high) in enumerate(COOKING_TIME_FACET_BUCKETS)
+        if high is not None
+    )
+    return f'CASE {cases} ELSE {len(COOKING_TIME_FACET_BUCKETS) - 1} END'
+
+
+def get_facet_queries(quote):
+    users = quote(User._meta.db_table)
+    ingredients = quote(Ingredient._meta.db_table)
+    amounts = quote(IngredientInRecipe._meta.db_table)
+    return {
+        'cooking_time': (
+            f"SELECT 'cooking_time', {get_cooking_time_bucket()}, NULL, "
+            'COUNT(*) FROM facet_recipes GROUP BY 2'
+        ),
+        # Группировка идёт по id, и в каждой ветке UNION ALL остаются
+        # только первые FACET_SIZE значений: названия подтягиваются уже
+        # к ним.
+        'author': (
+            "SELECT 'author', u.id, u.username, c.total FROM ("
+            'SELECT author_id, COUNT(*) AS total FROM facet_recipes '
+            'GROUP BY author_id '
+            f'ORDER BY total DESC, author_id LIMIT {FACET_SIZE}) c '
+            f'JOIN {users} u ON u.id = c.author_id'
+        ),
+        'ingredient': (
+            "SELECT 'ingredient', i.id, i.name, c.total FROM ("
+            f'SELECT ingredient_id, COUNT(*) AS total FROM {amounts} '
+            'WHERE recipe_id IN (SELECT id FROM facet_recipes) '
+            'GROUP BY ingredient_id '
+            f'ORDER BY total DESC, ingredient_id LIMIT {FACET_SIZE}) c '
+            f'JOIN {ingredients} i ON i.id = c.ingredient_id'
+        ),
+    }
+
+
+def get_empty_facets(names):
+    facets = {name: [] for name in names}
+    if 'cooking_time' in facets:
+        facets['cooking_time'] = [
+            {'min': low, 'max': high, 'count': 0}
+            for low, high in COOKING_TIME_FACET_BUCKETS
+        ]
+    return facets
+
+
+def get_recipe_facets(queryset, names):
+    # Все фасеты считаются одним запросом по уже отфильтрованному
+    # queryset: он материализуется в CTE, а группировки по каждому фасету
+    # объединяются через UNION ALL.
+    facets = get_empty_facets(names)
+    if not names:
+        return facets
+    try:
+        sql, params = queryset.order_by().values_list(
+            'pk', 'author_id', 'cooking_time'
+        ).query.sql_with_params()
+    except EmptyResultSet:
+        return facets
+    connection = connections[queryset.db]
+    queries = get_facet_queries(connection.ops.quote_name)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH facet_recipes (id, author_id, cooking_time) AS ({sql}) '
+            + ' UNION ALL '.join(queries[name] for name in facets),
+            params
+        )
+        rows = cursor.fetchall()
+    for name, value, label, count in sorted(
+        rows, key=lambda row: (-row[3], row[1])
+    ):
+        if name == 'cooking_time':
+            facets[name][value]['count'] = count
+        else:
+            facets[name].append({'id': value, 'name': label, 'count': count})
+    return facets
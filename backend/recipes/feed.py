@@ -0,0 +1,123 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef
+
+from users.models import Subscription
+
+from .constants import (FEED_BACKFILL_SIZE, FEED_FANOUT_BATCH_SIZE,
+                        FEED_FANOUT_MAX_SUBSCRIBERS)
+from .counters import get_counter
+from .models import Recipe, TimelineEntry, User
+
+logger = logging.getLogger(__name__)
+
+# Лента подписок — гибрид: рецепт обычного автора при публикации
+# раскладывается в TimelineEntry всех подписчиков, а рецепты авторов с
+# feed_pulled читаются напрямую из recipes_recipe и подмешиваются к
+# ленте (см. FeedPagination).
+
+_executor = None
+_executor_pid = None
+
+
+def is_pulled(author):
+    if author.feed_pulled:
+        return True
+    if get_counter(author, 'subscribers_count') < FEED_FANOUT_MAX_SUBSCRIBERS:
+        return False
+    User.objects.filter(pk=author.pk).update(feed_pulled=True)
+    return True
+
+
+def fan_out(recipe_id):
+    recipe = Recipe.objects.select_related('author').filter(
+        pk=recipe_id
+    ).first()
+    if recipe is None or is_pulled(recipe.author):
+        return
+    subscribers = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).order_by('user_id').values_list('user_id', flat=True)
+    last_id = 0
+    while True:
+        user_ids = list(
+            subscribers.filter(user_id__gt=last_id)[:FEED_FANOUT_BATCH_SIZE]
+        )
+        if not user_ids:
+            break
+        last_id = user_ids[-1]
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(user_id=user_id, recipe_id=recipe.pk,
+                           author_id=recipe.author_id,
+                           pub_date=recipe.pub_date)
+             for user_id in user_ids),
+            ignore_conflicts=True
+        )
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(settings.FEED_WORKERS)
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def _fan_out_in_thread(recipe_id):
+    try:
+        fan_out(recipe_id)
+    except Exception:
+        logger.exception('Не удалось разослать рецепт #%s по лентам',
+                         recipe_id)
+    finally:
+        connections.close_all()
+
+
+def _submit(recipe_id):
+    if not settings.FEED_WORKERS:
+        fan_out(recipe_id)
+        return
+    _get_executor().submit(_fan_out_in_thread, recipe_id)
+
+
+def publish_recipe(recipe):
+    transaction.on_commit(lambda: _submit(recipe.pk))
+
+
+def backfill_timeline(user_id, author_id):
+    recipes = Recipe.objects.filter(
+        author_id=author_id, author__feed_pulled=False
+    ).order_by('-pub_date', '-id').values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, recipe_id=pk, author_id=author_id,
+                       pub_date=pub_date)
+         for pk, pub_date in recipes[:FEED_BACKFILL_SIZE]),
+        ignore_conflicts=True
+    )
+
+
+def trim_timeline(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 author_id=author_id).delete()
+
+
+def get_feed_sources(user):
+    # Подписка проверяется и для записей ленты: рассылка могла
+    # завершиться уже после отписки. Рецепты авторов без рассылки
+    # читаются по одному запросу на автора — индекс (author, -pub_date)
+    # вместо просмотра всех рецептов по дате.
+    subscriptions = Subscription.objects.filter(user=user)
+    timeline = TimelineEntry.objects.filter(user=user).filter(Exists(
+        subscriptions.filter(author=OuterRef('author'))
+    ))
+    pulled = [
+        Recipe.objects.filter(author_id=author_id)
+        for author_id in subscriptions.filter(
+            author__feed_pulled=True
+        ).values_list('author_id', flat=True)
+    ]
+    return timeline, pulled
@@ -0,0 +1,226 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import connection, transaction
+
+from .models import Ingredient
+
+FORMATS = ('csv', 'json', 'jsonl')
+CSV_HEADER = ['name', 'measurement_unit']
+JSON_CHUNK_SIZE = 64 * 1024
+# normalize() на стороне PostgreSQL.
+NORMALIZE_SQL = "lower(regexp_replace(btrim({}), '\\s+', ' ', 'g'))"
+
+
+def normalize(value):
+    # Регистр и пробелы: '  Соль   морская ' -> 'соль морская'.
+    return ' '.join(str(value).split()).lower()
+
+
+def read_csv(file):
+    reader = csv.reader(file)
+    for row in reader:
+        if reader.line_num == 1 and [
+            cell.strip().lower() for cell in row
+        ] == CSV_HEADER:
+            continue
+        if len(row) >= 2:
+            yield row[0], row[1]
+        elif row:
+            yield row[0], ''
+
+
+def read_json(file):
+    # Потоковый разбор массива объектов: в памяти только текущий кусок
+    # файла, а не весь документ.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    for chunk in iter(lambda: file.read(JSON_CHUNK_SIZE), ''):
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and buffer[position:position + 1] == '[':
+                started = True
+                position += 1
+                continue
+            if buffer[position:position + 1] in ('', ']'):
+                break
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item.get('name', ''), item.get('measurement_unit', '')
+        buffer = buffer[position:]
+    if buffer.strip() not in ('', ']'):
+        raise ValueError(f'Некорректный JSON: {buffer[:50]!r}')
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip():
+            item = json.loads(line)
+            yield item.get('name', ''), item.get('measurement_unit', '')
+
+
+READERS = {'csv': read_csv, 'json': read_json, 'jsonl': read_jsonl}
+
+
+def clean_rows(rows, stats):
+    name_length = Ingredient._meta.get_field('name').max_length
+    unit_length = Ingredient._meta.get_field('measurement_unit').max_length
+    for name, unit in rows:
+        stats['read'] += 1
+        name, unit = normalize(name), normalize(unit)
+        if (not name or not unit or len(name) > name_length
+                or len(unit) > unit_length):
+            stats['skipped'] += 1
+            continue
+        yield name, unit
+
+
+def _batches(rows, batch_size):
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        yield batch
+
+
+def get_unnormalized():
+    # Строки, записанные не в нормализованном виде (например, через
+    # админку): нормализованное имя -> [(id, нормализованная единица)].
+    # Остальные строки пачка находит точным поиском по имени в индексе.
+    # Одного прохода по таблице достаточно, а в памяти остаются только
+    # такие строки.
+    unnormalized = {}
+    for pk, name, unit in Ingredient.objects.values_list(
+        'pk', 'name', 'measurement_unit'
+    ).order_by().iterator(chunk_size=10000):
+        if normalize(name) != name or normalize(unit) != unit:
+            unnormalized.setdefault(normalize(name), []).append(
+                (pk, normalize(unit))
+            )
+    return unnormalized
+
+
+def _load_batch(batch, upsert, stats, unnormalized):
+    batch = dict.fromkeys(batch)
+    names = {name for name, _ in batch}
+    existing = {}
+    for pk, name, unit in Ingredient.objects.filter(
+        name__in=names
+    ).values_list('pk', 'name', 'measurement_unit').order_by('pk'):
+        existing.setdefault(name, []).append((pk, normalize(unit)))
+    for name in names & unnormalized.keys():
+        existing.setdefault(name, []).extend(unnormalized[name])
+    changed = []
+    created = []
+    for name, unit in batch:
+        rows = existing.get(name, [])
+        if any(row_unit == unit for _, row_unit in rows):
+            stats['unchanged'] += 1
+        elif rows and upsert:
+            # Ингредиент уже есть, поменялась только единица измерения.
+            pk = min(pk for pk, _ in rows)
+            changed.append(Ingredient(pk=pk, measurement_unit=unit))
+        else:
+            created.append(Ingredient(name=name, measurement_unit=unit))
+    Ingredient.objects.bulk_update(changed, ('measurement_unit',))
+    stats['updated'] += len(changed)
+    Ingredient.objects.bulk_create(created, ignore_conflicts=True)
+    stats['inserted'] += len(created)
+
+
+class _CSVStream(io.RawIOBase):
+    # Файлоподобная обёртка над генератором строк для COPY FROM STDIN.
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while len(self.buffer) < len(target):
+            lines = io.StringIO()
+            writer = csv.writer(lines)
+            writer.writerows(islice(self.rows, 1000))
+            data = lines.getvalue().encode()
+            if not data:
+                break
+            self.buffer += data
+        size = min(len(target), len(self.buffer))
+        target[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+
+def _load_copy(rows, upsert, stats):
+    table = connection.ops.quote_name(Ingredient._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE ingredient_staging '
+            '(name text, measurement_unit text) ON COMMIT DROP'
+        )
+        cursor.cursor.copy_expert(
+            'COPY ingredient_staging FROM STDIN WITH (FORMAT csv)',
+            _CSVStream(rows)
+        )
+        # Имена и единицы в таблице нормализуются так же, как строки файла
+        # в clean_rows. По одной строке на строку файла: есть ли уже
+        # такая единица и какой ингредиент с тем же именем обновить.
+        cursor.execute(
+            'CREATE TEMP TABLE ingredient_diff ON COMMIT DROP AS '
+            'SELECT s.name, s.measurement_unit, '
+            f'coalesce(bool_or({NORMALIZE_SQL.format("i.measurement_unit")} '
+            '= s.measurement_unit), false) AS same, '
+            'min(i.id) AS ingredient_id '
+            'FROM (SELECT DISTINCT name, measurement_unit '
+            'FROM ingredient_staging) s '
+            f'LEFT JOIN {table} i ON {NORMALIZE_SQL.format("i.name")} '
+            '= s.name '
+            'GROUP BY s.name, s.measurement_unit'
+        )
+        cursor.execute(
+            'SELECT count(*) FILTER (WHERE same) FROM ingredient_diff'
+        )
+        stats['unchanged'] += cursor.fetchone()[0]
+        if upsert:
+            cursor.execute(
+                f'UPDATE {table} i SET measurement_unit = d.measurement_unit '
+                'FROM ingredient_diff d '
+                'WHERE i.id = d.ingredient_id AND NOT d.same'
+            )
+            stats['updated'] += cursor.rowcount
+        # Без --upsert новая единица добавляется отдельным ингредиентом.
+        missing = 'ingredient_id IS NULL' if upsert else 'NOT same'
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            'SELECT name, measurement_unit FROM ingredient_diff '
+            f'WHERE {missing} ON CONFLICT DO NOTHING'
+        )
+        stats['inserted'] += cursor.rowcount
+
+
+def load_ingredients(rows, batch_size=1000, upsert=False, dry_run=False,
+                     use_copy=None):
+    stats = dict.fromkeys(
+        ('read', 'skipped', 'inserted', 'updated', 'unchanged'), 0
+    )
+    if use_copy is None:
+        use_copy = connection.vendor == 'postgresql'
+    rows = clean_rows(rows, stats)
+    with transaction.atomic():
+        if use_copy:
+            _load_copy(rows, upsert, stats)
+        else:
+            unnormalized = get_unnormalized()
+            for batch in _batches(rows, batch_size):
+                _load_batch(batch, upsert, stats, unnormalized)
+        if dry_run:
+            transaction.set_rollback(True)
+    return stats
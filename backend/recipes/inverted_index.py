@@ -0,0 +1,245 @@
+import copy
+import json
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import (Case, Count, Exists, F, Lookup, OuterRef,
+                              Subquery, Value, When)
+
+from .catalog import bump_stored_version, get_stored_versions
+from .constants import (INGREDIENT_INDEX_MAX_IDS, INGREDIENTS_VERSION,
+                        RECIPE_INGREDIENTS_LOG_SIZE,
+                        RECIPE_INGREDIENTS_LOG_VERSION,
+                        RECIPE_INGREDIENTS_VERSION)
+from .models import IngredientInRecipe, RecipeIngredientChange
+
+
+class IdsIn(Lookup):
+    # Длинный список id одним параметром: массив в PostgreSQL, JSON в
+    # SQLite. Обычный IN (%s, %s, ...) упирается в лимит параметров.
+    lookup_name = 'ids_in'
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        lhs, params = compiler.compile(self.lhs)
+        placeholders = ', '.join(['%s'] * len(self.rhs)) or 'NULL'
+        return f'{lhs} IN ({placeholders})', (*params, *self.rhs)
+
+    def as_postgresql(self, compiler, connection):
+        lhs, params = compiler.compile(self.lhs)
+        return f'{lhs} = ANY(%s)', (*params, list(self.rhs))
+
+    def as_sqlite(self, compiler, connection):
+        lhs, params = compiler.compile(self.lhs)
+        return (f'{lhs} IN (SELECT value FROM json_each(%s))',
+                (*params, json.dumps(list(self.rhs))))
+
+
+def contains(posting, recipe_id):
+    position = bisect_left(posting, recipe_id)
+    return position < len(posting) and posting[position] == recipe_id
+
+
+class RecipeIngredientIndex:
+    # Для каждого ингредиента — отсортированный array('I') id рецептов.
+    # Строится один раз из IngredientInRecipe и дальше догоняет журнал
+    # изменений в базе (см. record_recipe_ingredients). Запросы читают
+    # индекс без блокировки, поэтому изменения применяются к копии
+    # (with_changes), а не к опубликованному объекту.
+
+    def __init__(self, rows, version, sequence):
+        self.version = version
+        self.sequence = sequence
+        self.postings = {}
+        for recipe_id, ingredient_id in rows:
+            self.postings.setdefault(ingredient_id, array('I')).append(
+                recipe_id
+            )
+
+    def get(self, ingredient_id):
+        return self.postings.get(ingredient_id, array('I'))
+
+    def add(self, ingredient_id, recipe_id):
+        posting = self.postings.setdefault(ingredient_id, array('I'))
+        position = bisect_left(posting, recipe_id)
+        if position == len(posting) or posting[position] != recipe_id:
+            posting.insert(position, recipe_id)
+
+    def remove(self, ingredient_id, recipe_id):
+        posting = self.get(ingredient_id)
+        position = bisect_left(posting, recipe_id)
+        if position < len(posting) and posting[position] == recipe_id:
+            del posting[position]
+
+    def apply(self, recipe_id, added, removed):
+        for ingredient_id in added:
+            self.add(ingredient_id, recipe_id)
+        for ingredient_id in removed:
+            self.remove(ingredient_id, recipe_id)
+
+    def with_changes(self, changes, sequence):
+        # Копируются словарь и только затронутые списки, остальные
+        # списки общие со старым индексом и не меняются.
+        index = copy.copy(self)
+        index.postings = dict(self.postings)
+        index.sequence = sequence
+        copied = set()
+        for recipe_id, added, removed in changes:
+            for ingredient_id in {*added, *removed} - copied:
+                index.postings[ingredient_id] = array(
+                    'I', self.get(ingredient_id)
+                )
+                copied.add(ingredient_id)
+            index.apply(recipe_id, added, removed)
+        return index
+
+    def match_all(self, ingredient_ids):
+        # Пересечение начинается с самого короткого списка, остальные
+        # проверяются двоичным поиском.
+        postings = sorted(map(self.get, ingredient_ids), key=len)
+        return [
+            recipe_id for recipe_id in postings[0]
+            if all(contains(posting, recipe_id) for posting in postings[1:])
+        ]
+
+    def match_any(self, ingredient_ids):
+        return sorted(set().union(*map(self.get, ingredient_ids)))
+
+    def coverage(self, ingredient_ids):
+        counts = Counter()
+        for ingredient_id in ingredient_ids:
+            counts.update(self.get(ingredient_id))
+        return counts
+
+    def exclude(self, recipe_ids, ingredient_ids):
+        postings = [self.get(ingredient_id)
+                    for ingredient_id in ingredient_ids]
+        return [
+            recipe_id for recipe_id in recipe_ids
+            if not any(contains(posting, recipe_id) for posting in postings)
+        ]
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def build_index(versions, sequence):
+    return RecipeIngredientIndex(
+        IngredientInRecipe.objects.order_by('recipe_id').values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator(chunk_size=10000),
+        version=versions,
+        sequence=sequence
+    )
+
+
+def get_recipe_ingredient_index():
+    # Версии и номер журнала читаются из базы при каждом вызове, поэтому
+    # изменения из других процессов и management-команд видны сразу.
+    global _index
+    rebuild_version, ingredients_version, sequence = get_stored_versions(
+        RECIPE_INGREDIENTS_VERSION, INGREDIENTS_VERSION,
+        RECIPE_INGREDIENTS_LOG_VERSION
+    )
+    versions = (rebuild_version, ingredients_version)
+    with _lock:
+        index = _index
+        if (index is None or index.version != versions
+                or index.sequence > sequence):
+            _index = build_index(versions, sequence)
+        elif index.sequence < sequence:
+            changes = list(RecipeIngredientChange.objects.filter(
+                number__gt=index.sequence, number__lte=sequence
+            ).order_by('number').values_list('recipe_id', 'added',
+                                             'removed'))
+            if len(changes) < sequence - index.sequence:
+                # Нужная часть журнала уже удалена: проще перестроить.
+                _index = build_index(versions, sequence)
+            else:
+                _index = index.with_changes(changes, sequence)
+        return _index
+
+
+def record_recipe_ingredients(recipe_id, old_ids, new_ids):
+    # Запись в журнал — в транзакции изменения рецепта: номер держит
+    # блокировку строки версии до фиксации, так что параллельные
+    # изменения состава рецептов записываются по очереди.
+    added = sorted(set(new_ids) - set(old_ids))
+    removed = sorted(set(old_ids) - set(new_ids))
+    if not added and not removed:
+        return
+    with transaction.atomic():
+        number = bump_stored_version(RECIPE_INGREDIENTS_LOG_VERSION)
+        RecipeIngredientChange.objects.create(
+            number=number, recipe_id=recipe_id, added=added, removed=removed
+        )
+        RecipeIngredientChange.objects.filter(
+            number__lte=number - RECIPE_INGREDIENTS_LOG_SIZE
+        ).delete()
+
+
+def filter_in_database(queryset, ingredient_ids, exclude_ids, match):
+    # Тот же фильтр соединением с IngredientInRecipe: для выборок, которые
+    # дороже передать в запрос списком id.
+    rows = IngredientInRecipe.objects.filter(recipe=OuterRef('pk'))
+    if exclude_ids:
+        queryset = queryset.exclude(
+            Exists(rows.filter(ingredient_id__in=exclude_ids))
+        )
+    if match == 'all':
+        for ingredient_id in ingredient_ids:
+            queryset = queryset.filter(
+                Exists(rows.filter(ingredient_id=ingredient_id))
+            )
+        return queryset
+    matched = rows.filter(ingredient_id__in=ingredient_ids)
+    queryset = queryset.filter(Exists(matched))
+    if match == 'any':
+        return queryset
+    return queryset.annotate(ingredients_coverage=Subquery(
+        matched.order_by().values('recipe').annotate(
+            count=Count('pk')
+        ).values('count')
+    )).order_by('-ingredients_coverage', '-pub_date', '-id')
+
+
+def filter_by_ingredients(queryset, ingredient_ids, exclude_ids, match):
+    # Повтор id в запросе не должен засчитываться дважды.
+    ingredient_ids = sorted(set(ingredient_ids or ()))
+    exclude_ids = sorted(set(exclude_ids or ()))
+    if not ingredient_ids:
+        if exclude_ids:
+            return queryset.exclude(
+                ingredient_list__ingredient_id__in=exclude_ids
+            )
+        return queryset
+    index = get_recipe_ingredient_index()
+    if match == 'best':
+        coverage = index.coverage(ingredient_ids)
+        recipe_ids = index.exclude(sorted(coverage), exclude_ids)
+        if len(recipe_ids) > INGREDIENT_INDEX_MAX_IDS:
+            return filter_in_database(queryset, ingredient_ids,
+                                      exclude_ids, match)
+        levels = {}
+        for recipe_id in recipe_ids:
+            levels.setdefault(coverage[recipe_id], []).append(recipe_id)
+        return queryset.filter(IdsIn(F('pk'), recipe_ids)).annotate(
+            ingredients_coverage=Case(
+                *(When(IdsIn(F('pk'), ids), then=Value(level))
+                  for level, ids in levels.items()),
+                default=Value(0)
+            )
+        ).order_by('-ingredients_coverage', '-pub_date', '-id')
+    if match == 'any':
+        recipe_ids = index.match_any(ingredient_ids)
+    else:
+        recipe_ids = index.match_all(ingredient_ids)
+    recipe_ids = index.exclude(recipe_ids, exclude_ids)
+    if len(recipe_ids) > INGREDIENT_INDEX_MAX_IDS:
+        return filter_in_database(queryset, ingredient_ids, exclude_ids,
+                                  match)
+    return queryset.filter(IdsIn(F('pk'), recipe_ids))
@@ -0,0 +1,110 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.catalog import bump_ingredients_version
+from recipes.constants import BENCHMARK_INGREDIENT_PREFIX
+from recipes.models import Ingredient
+
+UNITS = ('г', 'кг', 'мл', 'шт')
+
+
+class Command(BaseCommand):
+    help = (
+        'Загрузка синтетического каталога ингредиентов командой '
+        'load_ingredients: вставка из CSV, повтор из JSON без изменений и '
+        '--upsert со сменой части единиц. Каждый прогон идёт в отдельном '
+        'процессе; выводятся время и максимальный RSS. Загруженные строки '
+        'удаляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--changed', type=int, default=10,
+                            help='Для --upsert меняется единица у каждой '
+                                 'N-й строки')
+
+    def write_files(self, directory, rows, changed):
+        # Файлы пишутся потоково: пик памяти этого процесса попадает и в
+        # ru_maxrss дочерних (Linux сохраняет его при fork и exec), поэтому
+        # он должен оставаться на уровне пустого процесса Django.
+        paths = {
+            name: os.path.join(directory, name)
+            for name in ('catalog.csv', 'catalog.json', 'changed.csv')
+        }
+        with open(paths['catalog.csv'], 'w', newline='') as catalog, \
+                open(paths['catalog.json'], 'w') as catalog_json, \
+                open(paths['changed.csv'], 'w', newline='') as changed_csv:
+            catalog_writer = csv.writer(catalog)
+            changed_writer = csv.writer(changed_csv)
+            catalog_json.write('[')
+            for number in range(rows):
+                name = f'{BENCHMARK_INGREDIENT_PREFIX}{number}'
+                unit = UNITS[number % len(UNITS)]
+                catalog_writer.writerow((name, unit))
+                if number:
+                    catalog_json.write(',\n')
+                json.dump({'name': name, 'measurement_unit': unit},
+                          catalog_json, ensure_ascii=False)
+                if number % changed == 0:
+                    unit = UNITS[(number + 1) % len(UNITS)]
+                changed_writer.writerow((name, unit))
+            catalog_json.write(']\n')
+        return paths
+
+    def run_loader(self, *args):
+        # wait4 отдаёт ресурсы именно этого процесса, а не максимум по
+        # всем дочерним, как getrusage(RUSAGE_CHILDREN).
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'),
+             'load_ingredients', *args],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        output = process.stdout.read()
+        _, status, usage = os.wait4(process.pid, 0)
+        process.stdout.close()
+        if os.waitstatus_to_exitcode(status):
+            raise CommandError(output)
+        return (time.perf_counter() - started, usage.ru_maxrss / 1024,
+                output.strip().splitlines()[-1])
+
+    def cleanup(self):
+        # Удаление через QuerySet отправило бы сигнал на каждую строку.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM '
+                f'{connection.ops.quote_name(Ingredient._meta.db_table)} '
+                f'WHERE name LIKE %s',
+                [f'{BENCHMARK_INGREDIENT_PREFIX}%']
+            )
+        bump_ingredients_version()
+
+    def handle(self, *args, **options):
+        batch_size = ['--batch-size', str(options['batch_size'])]
+        self.cleanup()
+        with tempfile.TemporaryDirectory() as directory:
+            paths = self.write_files(directory, options['rows'],
+                                     options['changed'])
+            runs = (
+                ('вставка из CSV', paths['catalog.csv']),
+                ('повтор из JSON', paths['catalog.json']),
+                ('--upsert из CSV', paths['changed.csv'], '--upsert'),
+            )
+            try:
+                for label, *arguments in runs:
+                    elapsed, rss, stats = self.run_loader(*arguments,
+                                                          *batch_size)
+                    self.stdout.write(f'{label}: {elapsed:.1f} с, '
+                                      f'max RSS {rss:.0f} МБ. {stats}')
+            finally:
+                self.cleanup()
@@ -1,42 +1,68 @@
-import json
 import os
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from recipes.models import Ingredient
+from recipes.catalog import bump_ingredients_version
+from recipes.ingredient_loader import FORMATS, READERS, load_ingredients
 
 
 class Command(BaseCommand):
-    help = 'Загрузка ингредиентов из JSON файла'
+    help = (
+        'Загрузка ингредиентов из CSV, JSON или JSONL. Файл читается '
+        'потоково; на PostgreSQL строки загружаются через COPY во '
+        'временную таблицу.'
+    )
 
-    def handle(self, *args, **options):
-        # ingredients.json лежит в корне backend
-        file_path = os.path.join(settings.BASE_DIR, 'ingredients.json')
-
-        if not os.path.exists(file_path):
-            self.stdout.write(self.style.ERROR(f'Файл не найден: {file_path}'))
-            return
-
-        self.stdout.write(f'Загрузка ингредиентов из {file_path}...')
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'ingredients.csv'),
+            help='Путь к файлу (по умолчанию ingredients.csv в backend)'
+        )
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Формат файла (по умолчанию по расширению)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Количество строк в одной пачке')
+        parser.add_argument('--upsert', action='store_true',
+                            help='Обновлять единицу измерения уже '
+                                 'загруженных ингредиентов')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что изменится')
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Не использовать COPY на PostgreSQL')
 
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(
+            path
+        )[1].lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        if not os.path.exists(path):
+            raise CommandError(f'Файл не найден: {path}')
 
-            ingredients_to_create = []
-            for item in data:
-                ingredient = Ingredient(
-                    name=item['name'],
-                    measurement_unit=item['measurement_unit']
+        self.stdout.write(f'Загрузка ингредиентов из {path}...')
+        with open(path, encoding='utf-8', newline='') as file:
+            try:
+                stats = load_ingredients(
+                    READERS[file_format](file),
+                    batch_size=options['batch_size'],
+                    upsert=options['upsert'],
+                    dry_run=options['dry_run'],
+                    use_copy=False if options['no_copy'] else None
                 )
-                ingredients_to_create.append(ingredient)
-
-            Ingredient.objects.bulk_create(
-                ingredients_to_create, ignore_conflicts=True)
-
-            self.stdout.write(self.style.SUCCESS(
-                f'Загружено {len(ingredients_to_create)} ингредиентов'))
+            except ValueError as error:
+                raise CommandError(f'Ошибка при загрузке: {error}')
+        if not options['dry_run'] and (stats['inserted'] or stats['updated']):
+            bump_ingredients_version()
 
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Ошибка при загрузке: {e}'))
+        message = (
+            f"Прочитано: {stats['read']}, пропущено: {stats['skipped']}, "
+            f"добавлено: {stats['inserted']}, "
+            f"обновлено: {stats['updated']}, "
+            f"без изменений: {stats['unchanged']}"
+        )
+        if options['dry_run']:
+            message = f'Без изменений в базе. {message}'
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingListLine, User
+from recipes.shopping_lists import (bump_shopping_list_versions,
+                                    get_expected_shopping_lists)
+
+
+class Command(BaseCommand):
+    help = 'Проверка и восстановление материализованных списков покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Количество пользователей в одной пачке')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать расхождения')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        totals = {'created': 0, 'updated': 0, 'deleted': 0}
+        last_pk = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            last_pk = user_ids[-1]
+            with transaction.atomic():
+                if not dry_run:
+                    list(User.objects.select_for_update().filter(
+                        pk__in=user_ids
+                    ).order_by('pk').values_list('pk', flat=True))
+                for key, value in self.repair_batch(user_ids,
+                                                    dry_run).items():
+                    totals[key] += value
+
+        message = (
+            f"Создано: {totals['created']}, "
+            f"исправлено: {totals['updated']}, "
+            f"удалено: {totals['deleted']}"
+        )
+        if dry_run:
+            message = f'Расхождения (без изменений). {message}'
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def repair_batch(self, user_ids, dry_run):
+        expected = get_expected_shopping_lists(user_ids)
+        to_update = []
+        to_delete = []
+        changed = set()
+        for line in ShoppingListLine.objects.filter(user_id__in=user_ids):
+            total = expected.pop((line.user_id, line.ingredient_id), None)
+            if total is None:
+                to_delete.append(line.pk)
+                changed.add(line.user_id)
+            elif total != line.total_amount:
+                line.total_amount = total
+                to_update.append(line)
+                changed.add(line.user_id)
+        to_create = [
+            ShoppingListLine(user_id=user_id, ingredient_id=ingredient_id,
+                             total_amount=total)
+            for (user_id, ingredient_id), total in expected.items()
+        ]
+        if not dry_run:
+            ShoppingListLine.objects.filter(pk__in=to_delete).delete()
+            ShoppingListLine.objects.bulk_update(to_update,
+                                                 ['total_amount'])
+            ShoppingListLine.objects.bulk_create(to_create)
+            bump_shopping_list_versions(
+                changed | {line.user_id for line in to_create}
+            )
+        return {
+            'created': len(to_create),
+            'updated': len(to_update),
+            'deleted': len(to_delete),
+        }
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+from recipes.constants import FEED_FANOUT_MAX_SUBSCRIBERS
+from recipes.counters import annotate_user_counters
+from recipes.feed import backfill_timeline
+from recipes.models import TimelineEntry, User
+from users.models import Subscription
+
+
+class Command(BaseCommand):
+    help = ('Пересчёт авторов без рассылки и заполнение лент подписок '
+            'последними рецептами')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Количество пользователей в одной пачке')
+
+    def handle(self, *args, **options):
+        pulled = list(annotate_user_counters(User.objects.all()).annotate(
+            subscribers=F('subscribers_count')
+            + Coalesce('pending_subscribers_count', 0)
+        ).filter(
+            subscribers__gte=FEED_FANOUT_MAX_SUBSCRIBERS
+        ).values_list('pk', flat=True))
+        User.objects.exclude(pk__in=pulled).filter(
+            feed_pulled=True
+        ).update(feed_pulled=False)
+        User.objects.filter(pk__in=pulled).update(feed_pulled=True)
+
+        entries = 0
+        last_pk = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not user_ids:
+                break
+            last_pk = user_ids[-1]
+            with transaction.atomic():
+                TimelineEntry.objects.filter(user_id__in=user_ids).delete()
+                for user_id, author_id in Subscription.objects.filter(
+                    user_id__in=user_ids
+                ).values_list('user_id', 'author_id'):
+                    backfill_timeline(user_id, author_id)
+            entries += TimelineEntry.objects.filter(
+                user_id__in=user_ids
+            ).count()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Авторов без рассылки: {len(pulled)}, '
+            f'записей в лентах: {entries}'
+        ))
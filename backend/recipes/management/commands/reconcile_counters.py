@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import COUNTERS, fold_counters, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Перенос шардов счётчиков в модели и исправление расхождений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Количество объектов в одной пачке')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, shard_model, owner_field, sources in COUNTERS:
+            folded = fixed = 0
+            last_pk = 0
+            while True:
+                owner_ids = list(
+                    model.objects.filter(pk__gt=last_pk).order_by('pk')
+                    .values_list('pk', flat=True)[:batch_size]
+                )
+                if not owner_ids:
+                    break
+                last_pk = owner_ids[-1]
+                folded += fold_counters(model, shard_model, owner_field,
+                                        sources, owner_ids)
+                fixed += reconcile_counters(model, shard_model, owner_field,
+                                            sources, owner_ids)
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: '
+                f'перенесено шардов {folded}, исправлено значений {fixed}'
+            ))
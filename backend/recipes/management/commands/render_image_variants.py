@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.thumbnails import (IMAGE_FIELDS, needs_variants,
+                                render_variants, save_variants)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нарезка превью для изображений без готовых вариантов '
+        '(например, после перезапуска, потерявшего очередь пула)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Пересоздать варианты для всех изображений')
+
+    def handle(self, *args, **options):
+        for model, field in IMAGE_FIELDS.items():
+            rendered = failed = 0
+            queryset = model.objects.exclude(**{field: ''}).exclude(
+                **{f'{field}__isnull': True}
+            ).only('pk', field, f'{field}_variants')
+            for instance in queryset.iterator():
+                if not options['force'] and not needs_variants(instance):
+                    continue
+                name = getattr(instance, field).name
+                try:
+                    variants = render_variants(settings.MEDIA_ROOT, name)
+                except OSError as error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                save_variants(model, instance.pk, variants)
+                rendered += 1
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: нарезано {rendered}, '
+                f'ошибок {failed}'
+            ))
@@ -0,0 +1,192 @@
+import io
+import random
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from recipes.catalog import (bump_recipe_ingredients_version,
+                             bump_recipes_version)
+from recipes.constants import (BENCHMARK_IMAGE_NAME, BENCHMARK_PASSWORD,
+                               BENCHMARK_USERNAME_PREFIX)
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart)
+from recipes.thumbnails import render_variants
+from users.models import Subscription, User
+
+# Словарь названий и описаний: слова идут по убыванию частоты, так что
+# поиск по ним находит от сотен тысяч рецептов до единиц процентов.
+WORDS = (
+    'добавить минут смешать вкусно просто подавать посолить масло лук '
+    'домашний быстро соус сковороде обжарить морковь чеснок яйцо мука '
+    'сметана картофель курица суп салат нарезать сыр сахар варить молоко '
+    'духовке рис помидор капуста запечённый говядина свинина пирог '
+    'каша тушить огурец грибы сытно творог котлета жареный кастрюле '
+    'гречка рыба блины свекла рагу плов праздничный лосось омлет '
+    'запеканка постный острый щи борщ сладкий тушёный варёный поперчить'
+).split()
+
+
+def zipf_weights(size, exponent):
+    # Накопленные веса степенного распределения: элемент ранга r
+    # выбирается с вероятностью, пропорциональной 1 / r ** exponent.
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Детерминированная генерация пользователей, рецептов, избранного, '
+        'корзин и подписок со степенным распределением популярности'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Среднее число избранных на пользователя')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='Среднее число рецептов в корзине')
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Среднее число подписок на пользователя')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--clear', action='store_true',
+                            help='Удалить ранее сгенерированные данные')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.word_weights = zipf_weights(len(WORDS), 1.0)
+        users = User.objects.filter(
+            username__startswith=BENCHMARK_USERNAME_PREFIX
+        )
+        if options['clear']:
+            users.delete()
+        elif users.exists():
+            raise CommandError('Данные уже сгенерированы: используйте '
+                               '--clear, чтобы пересоздать их.')
+        ingredient_ids = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        if not ingredient_ids:
+            raise CommandError('Сначала загрузите ингредиенты: '
+                               'python manage.py load_ingredients')
+
+        user_ids = self.create_users(options['users'])
+        recipe_ids = self.create_recipes(user_ids, options['recipes'])
+        self.create_ingredients(recipe_ids, ingredient_ids)
+        self.create_relations(Favorite, 'recipe', user_ids, recipe_ids,
+                              options['favorites'])
+        self.create_relations(ShoppingCart, 'recipe', user_ids, recipe_ids,
+                              options['carts'])
+        self.create_relations(Subscription, 'author', user_ids, user_ids,
+                              options['subscriptions'])
+
+        call_command('reconcile_counters', batch_size=self.batch_size,
+                     stdout=self.stdout)
+        call_command('rebuild_shopping_lists', batch_size=self.batch_size,
+                     stdout=self.stdout)
+        call_command('rebuild_timelines', batch_size=self.batch_size,
+                     stdout=self.stdout)
+        bump_recipes_version()
+        bump_recipe_ingredients_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}. '
+            f'Пароль пользователей: {BENCHMARK_PASSWORD}'
+        ))
+
+    def bulk_create(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def create_users(self, count):
+        password = make_password(BENCHMARK_PASSWORD)
+        self.bulk_create(User, (
+            User(
+                username=f'{BENCHMARK_USERNAME_PREFIX}{number}',
+                email=f'{BENCHMARK_USERNAME_PREFIX}{number}@example.com',
+                first_name='Пользователь',
+                last_name=str(number),
+                password=password
+            )
+            for number in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=BENCHMARK_USERNAME_PREFIX
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def get_image(self):
+        if not default_storage.exists(BENCHMARK_IMAGE_NAME):
+            buffer = io.BytesIO()
+            Image.new('RGB', (640, 480), (200, 120, 60)).save(buffer, 'JPEG')
+            default_storage.save(BENCHMARK_IMAGE_NAME,
+                                 ContentFile(buffer.getvalue()))
+        return render_variants(settings.MEDIA_ROOT, BENCHMARK_IMAGE_NAME)
+
+    def create_recipes(self, user_ids, count):
+        variants = self.get_image()
+        # Немногие авторы пишут большую часть рецептов.
+        authors = self.rng.choices(user_ids, cum_weights=zipf_weights(
+            len(user_ids), 1.1
+        ), k=count)
+        self.bulk_create(Recipe, (
+            Recipe(
+                author_id=author_id,
+                name=f'{self.words(1, 3).capitalize()} {number}',
+                text=self.words(10, 40),
+                image=BENCHMARK_IMAGE_NAME,
+                image_variants=variants,
+                cooking_time=self.rng.randint(5, 180)
+            )
+            for number, author_id in enumerate(authors)
+        ))
+        return list(Recipe.objects.filter(
+            author_id__in=user_ids
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def words(self, low, high):
+        count = self.rng.randint(low, high)
+        return ' '.join(self.rng.choices(WORDS, cum_weights=self.word_weights,
+                                         k=count))
+
+    def sample(self, population, weights, count, exclude=None):
+        chosen = set()
+        count = min(count, len(population) - (exclude is not None))
+        while len(chosen) < count:
+            for item in self.rng.choices(population, cum_weights=weights,
+                                         k=count - len(chosen)):
+                if item != exclude:
+                    chosen.add(item)
+        return sorted(chosen)[:count]
+
+    def create_ingredients(self, recipe_ids, ingredient_ids):
+        weights = zipf_weights(len(ingredient_ids), 0.8)
+        self.bulk_create(IngredientInRecipe, (
+            IngredientInRecipe(recipe_id=recipe_id, ingredient_id=pk,
+                               amount=self.rng.randint(1, 500))
+            for recipe_id in recipe_ids
+            for pk in self.sample(ingredient_ids, weights,
+                                  self.rng.randint(3, 12))
+        ))
+
+    def create_relations(self, model, target_field, user_ids, target_ids,
+                         average):
+        # Число связей на пользователя — распределение Парето со средним
+        # average, популярность целей — степенная.
+        targets = self.rng.sample(target_ids, len(target_ids))
+        weights = zipf_weights(len(targets), 1.0)
+        self.bulk_create(model, (
+            model(user_id=user_id, **{f'{target_field}_id': target_id})
+            for user_id in user_ids
+            for target_id in self.sample(
+                targets, weights,
+                int(self.rng.paretovariate(1.5) * average / 3),
+                exclude=user_id if model is Subscription else None
+            )
+        ))
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+class PostgresOnlyMixin:
+    # Классы операторов, GIN-индексы и т.п. есть только в PostgreSQL; на
+    # других СУБД операция меняет лишь состояние модели. Такой индекс не
+    # должен оставаться ни в Meta, ни в состоянии (см. миграцию 0020):
+    # SQLite при пересоздании таблицы строит все индексы из состояния.
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state,
+                                      to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor,
+                                       from_state, to_state)
+
+
+class AddPostgresIndex(PostgresOnlyMixin, migrations.AddIndex):
+    pass
+
+
+class RemovePostgresIndex(PostgresOnlyMixin, migrations.RemoveIndex):
+    pass
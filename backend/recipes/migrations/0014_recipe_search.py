@@ -0,0 +1,110 @@
+# Generated by Django 4.2.14 on 2026-10-18 18:08
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+from recipes.migration_operations import AddPostgresIndex
+from recipes.sqlite_search import REBUILD_FTS, SQLITE_TRIGGERS
+
+POSTGRESQL_FORWARDS = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE FUNCTION recipes_recipe_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER recipes_recipe_search_vector_update
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector();
+
+UPDATE recipes_recipe SET name = name;
+"""
+
+POSTGRESQL_BACKWARDS = """
+DROP TRIGGER IF EXISTS recipes_recipe_search_vector_update ON recipes_recipe;
+DROP FUNCTION IF EXISTS recipes_recipe_search_vector();
+"""
+
+# Для разработки и тестов на SQLite вместо tsvector — внешняя таблица
+# FTS5 над recipes_recipe (см. recipes.sqlite_search).
+SQLITE_FORWARDS = (
+    """
+    CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5(
+        name, text, content='recipes_recipe', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    *(sql for name, sql in SQLITE_TRIGGERS),
+    REBUILD_FTS,
+    # Скрытый столбец rank: название весит больше описания, как веса A
+    # и B в tsvector.
+    """
+    INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rank)
+    VALUES ('rank', 'bm25(10.0, 1.0)')
+    """,
+)
+
+SQLITE_BACKWARDS = (
+    *(f'DROP TRIGGER IF EXISTS {name}' for name, sql in SQLITE_TRIGGERS),
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+)
+
+
+def run_statements(schema_editor, postgresql, sqlite):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(postgresql)
+    elif vendor == 'sqlite':
+        for statement in sqlite:
+            schema_editor.execute(statement)
+
+
+def create_search_backend(apps, schema_editor):
+    run_statements(schema_editor, POSTGRESQL_FORWARDS, SQLITE_FORWARDS)
+
+
+def drop_search_backend(apps, schema_editor):
+    run_statements(schema_editor, POSTGRESQL_BACKWARDS, SQLITE_BACKWARDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_ingredient_name_lower_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+        migrations.CreateModel(
+            name='RecipeSearchIndex',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='recipes.recipe')),
+                ('document', models.TextField(db_column='recipes_recipe_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'recipes_recipe_fts',
+                'managed': False,
+            },
+        ),
+        AddPostgresIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+        AddPostgresIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass('name', name='gin_trgm_ops'), name='recipe_name_trgm_idx'),
+        ),
+    ]
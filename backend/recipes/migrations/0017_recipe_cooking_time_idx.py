@@ -0,0 +1,23 @@
+# Generated by Django 4.2.14 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+from recipes.migration_operations import RemovePostgresIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_catalog_version'),
+    ]
+
+    operations = [
+        RemovePostgresIndex(
+            model_name='ingredient',
+            name='ingredient_name_upper_like_idx',
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['cooking_time'], name='recipe_cooking_time_idx'),
+        ),
+    ]
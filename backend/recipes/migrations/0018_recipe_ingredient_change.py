@@ -0,0 +1,26 @@
+# Generated by Django 4.2.14 on 2026-10-18 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipe_cooking_time_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeIngredientChange',
+            fields=[
+                ('number', models.PositiveBigIntegerField(primary_key=True, serialize=False, verbose_name='Номер')),
+                ('recipe_id', models.PositiveBigIntegerField(verbose_name='Рецепт')),
+                ('added', models.JSONField(default=list, verbose_name='Добавлены')),
+                ('removed', models.JSONField(default=list, verbose_name='Удалены')),
+            ],
+            options={
+                'verbose_name': 'Изменение состава рецепта',
+                'verbose_name_plural': 'Изменения состава рецептов',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:29
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_recipe_ingredient_change'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_name_lower_idx',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:41
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Индексы остаются в базе PostgreSQL, из состояния миграций они
+    # убираются, чтобы пересоздание таблицы на SQLite их не строило.
+
+    dependencies = [
+        ('recipes', '0019_remove_ingredient_name_lower_idx'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name='recipe',
+                    name='recipe_search_vector_idx',
+                ),
+                migrations.RemoveIndex(
+                    model_name='recipe',
+                    name='recipe_name_trgm_idx',
+                ),
+            ],
+        ),
+    ]
@@ -1,9 +1,11 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 from .constants import (MIN_AMOUNT, MIN_COOKING_TIME, NAME_MAX_LENGTH,
-                        RECIPE_NAME_MAX_LENGTH, UNIT_MAX_LENGTH)
+                        RECIPE_NAME_MAX_LENGTH, UNIT_MAX_LENGTH,
+                        VERSION_NAME_MAX_LENGTH)
 
 User = get_user_model()
 
@@ -50,6 +52,12 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         verbose_name='Изображение'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения'
+    )
     text = models.TextField(verbose_name='Описание')
 
     ingredients = models.ManyToManyField(
@@ -66,9 +74,39 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='В корзинах'
+    )
+    # Заполняется триггером PostgreSQL из name и text (миграция 0014).
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=['cooking_time'],
+                         name='recipe_cooking_time_idx'),
+        ]
+        # GIN-индексы по search_vector и name (gin_trgm_ops) есть только
+        # на PostgreSQL и описаны лишь в миграции 0014: в состоянии модели
+        # SQLite попыталась бы построить их при пересоздании таблицы.
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -76,6 +114,97 @@ class Recipe(models.Model):
         return self.name
 
 
+class RecipeSearchIndex(models.Model):
+    # Таблица FTS5 для поиска на SQLite (миграция 0014); на PostgreSQL
+    # её нет, там поиск идёт по Recipe.search_vector.
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_index'
+    )
+    # Скрытые столбцы FTS5: сама таблица (левая часть MATCH) и rank.
+    document = models.TextField(db_column='recipes_recipe_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'recipes_recipe_fts'
+
+
+class CatalogVersion(models.Model):
+    # Версии данных, по которым процессы перестраивают индексы в памяти.
+    # Хранятся в базе, а не в кэше процесса: их видят все воркеры и
+    # management-команды, а меняются они в той же транзакции, что и данные.
+
+    name = models.CharField(
+        max_length=VERSION_NAME_MAX_LENGTH,
+        primary_key=True,
+        verbose_name='Название'
+    )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Версия'
+    )
+
+    class Meta:
+        verbose_name = 'Версия данных'
+        verbose_name_plural = 'Версии данных'
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
+
+
+class RecipeIngredientChange(models.Model):
+    # Журнал изменений состава рецептов для инвертированного индекса в
+    # памяти процессов. Номер выдаётся версией в CatalogVersion в той же
+    # транзакции, поэтому записи становятся видны строго по порядку.
+
+    number = models.PositiveBigIntegerField(
+        primary_key=True,
+        verbose_name='Номер'
+    )
+    recipe_id = models.PositiveBigIntegerField(verbose_name='Рецепт')
+    added = models.JSONField(default=list, verbose_name='Добавлены')
+    removed = models.JSONField(default=list, verbose_name='Удалены')
+
+    class Meta:
+        verbose_name = 'Изменение состава рецепта'
+        verbose_name_plural = 'Изменения состава рецептов'
+
+    def __str__(self):
+        return f'{self.number}: {self.recipe_id}'
+
+
+class RecipeCounterShard(models.Model):
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='counter_shards',
+        verbose_name='Рецепт'
+    )
+    shard = models.PositiveSmallIntegerField(verbose_name='Шард')
+    favorites_count = models.IntegerField(default=0)
+    in_carts_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'shard'],
+                name='unique_recipe_counter_shard'
+            )
+        ]
+        verbose_name = 'Шард счётчиков рецепта'
+        verbose_name_plural = 'Шарды счётчиков рецептов'
+
+    def __str__(self):
+        return f'{self.recipe} #{self.shard}'
+
+
 class IngredientInRecipe(models.Model):
 
     recipe = models.ForeignKey(
@@ -161,3 +290,78 @@ class ShoppingCart(UserRecipeRelation):
 
     def __str__(self):
         return f'"{self.recipe}" в корзине у {self.user}'
+
+
+class ShoppingListLine(models.Model):
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_lines',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        ordering = ['ingredient__name']
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Список покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_line'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} ({self.total_amount}) у {self.user}'
+
+
+class TimelineEntry(models.Model):
+    # Лента подписок, заполняемая при публикации рецепта (recipes.feed).
+    # Автор и дата публикации продублированы из рецепта: по ним лента
+    # читается и чистится без соединения с recipes_recipe.
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-recipe'],
+                         name='timeline_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'"{self.recipe}" в ленте у {self.user}'
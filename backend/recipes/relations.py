@@ -0,0 +1,150 @@
+from django.db import IntegrityError, connection, transaction
+
+
+def _insert_returning(model, user_id, target_field, target_id, fields):
+    target_model = model._meta.get_field(target_field).related_model
+    opts = target_model._meta
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(opts.get_field(name).column) for name in fields)
+    pk = qn(opts.pk.column)
+    sql = (
+        f'WITH target AS ('
+        f'SELECT {columns} FROM {qn(opts.db_table)} WHERE {pk} = %s), '
+        f'inserted AS ('
+        f'INSERT INTO {qn(model._meta.db_table)} '
+        f'({qn(model._meta.get_field("user").column)}, '
+        f'{qn(model._meta.get_field(target_field).column)}) '
+        f'SELECT %s, {pk} FROM target '
+        f'ON CONFLICT DO NOTHING RETURNING 1) '
+        f'SELECT {columns}, EXISTS(SELECT 1 FROM inserted) FROM target'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [target_id, user_id])
+        row = cursor.fetchone()
+    if row is None:
+        return None, False
+    values = {}
+    for name, value in zip(fields, row):
+        field = opts.get_field(name)
+        if hasattr(field, 'from_db_value'):
+            value = field.from_db_value(value, None, connection)
+        values[name] = value
+    return values, row[-1]
+
+
+def _insert_fallback(model, user_id, target_field, target_id, fields):
+    target_model = model._meta.get_field(target_field).related_model
+    row = target_model.objects.filter(pk=target_id).values(*fields).first()
+    if row is None:
+        return None, False
+    try:
+        with transaction.atomic():
+            model.objects.create(
+                user_id=user_id, **{f'{target_field}_id': target_id}
+            )
+    except IntegrityError:
+        return row, False
+    return row, True
+
+
+def add_relation(model, user_id, target_field, target_id, fields):
+    # Возвращает (поля цели, создана ли связь). Если цели нет — (None,
+    # False). На PostgreSQL это один запрос: INSERT ... ON CONFLICT DO
+    # NOTHING внутри CTE, поэтому двойной клик не приводит к
+    # IntegrityError, а повтор отличается от отсутствующей цели.
+    if connection.vendor == 'postgresql':
+        return _insert_returning(model, user_id, target_field, target_id,
+                                 fields)
+    return _insert_fallback(model, user_id, target_field, target_id, fields)
+
+
+def _insert_many_returning(model, user_id, target_field, target_ids):
+    opts = model._meta.get_field(target_field).related_model._meta
+    qn = connection.ops.quote_name
+    pk = qn(opts.pk.column)
+    target_column = qn(model._meta.get_field(target_field).column)
+    sql = (
+        f'WITH target AS ('
+        f'SELECT {pk} FROM {qn(opts.db_table)} WHERE {pk} = ANY(%s)), '
+        f'inserted AS ('
+        f'INSERT INTO {qn(model._meta.db_table)} '
+        f'({qn(model._meta.get_field("user").column)}, {target_column}) '
+        f'SELECT %s, {pk} FROM target '
+        f'ON CONFLICT DO NOTHING RETURNING {target_column}) '
+        f'SELECT target.{pk}, inserted.{target_column} IS NOT NULL '
+        f'FROM target LEFT JOIN inserted '
+        f'ON inserted.{target_column} = target.{pk}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [list(target_ids), user_id])
+        rows = cursor.fetchall()
+    return ({pk for pk, _ in rows},
+            {pk for pk, created in rows if created})
+
+
+def _lock_user(model, user_id):
+    # Без RETURNING добавленные связи вычисляются по прочитанным, и до
+    # конца транзакции их защищает блокировка строки пользователя.
+    model._meta.get_field('user').related_model.objects.select_for_update(
+    ).filter(pk=user_id).exists()
+
+
+def _insert_many_fallback(model, user_id, target_field, target_ids):
+    _lock_user(model, user_id)
+    target_model = model._meta.get_field(target_field).related_model
+    found = set(target_model.objects.filter(
+        pk__in=target_ids
+    ).values_list('pk', flat=True))
+    present = set(model.objects.filter(
+        user_id=user_id, **{f'{target_field}_id__in': found}
+    ).values_list(f'{target_field}_id', flat=True))
+    added = found - present
+    model.objects.bulk_create(
+        (model(user_id=user_id, **{f'{target_field}_id': pk})
+         for pk in added),
+        ignore_conflicts=True
+    )
+    return found, added
+
+
+def add_relations(model, user_id, target_field, target_ids):
+    # Вызывается в транзакции. Возвращает (найденные цели, цели, связь с
+    # которыми создал этот вызов). На PostgreSQL это один запрос, как в
+    # add_relation: по RETURNING видно, какие строки вставил именно он,
+    # даже если те же связи параллельно добавляет другой запрос.
+    if connection.vendor == 'postgresql':
+        return _insert_many_returning(model, user_id, target_field,
+                                      target_ids)
+    return _insert_many_fallback(model, user_id, target_field, target_ids)
+
+
+def _delete_many_returning(model, user_id, target_field, target_ids):
+    qn = connection.ops.quote_name
+    target_column = qn(model._meta.get_field(target_field).column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {qn(model._meta.db_table)} '
+            f'WHERE {qn(model._meta.get_field("user").column)} = %s '
+            f'AND {target_column} = ANY(%s) RETURNING {target_column}',
+            [user_id, list(target_ids)]
+        )
+        return {pk for pk, in cursor.fetchall()}
+
+
+def _delete_many_fallback(model, user_id, target_field, target_ids):
+    _lock_user(model, user_id)
+    relations = model.objects.filter(
+        user_id=user_id, **{f'{target_field}_id__in': target_ids}
+    )
+    removed = set(relations.values_list(f'{target_field}_id', flat=True))
+    relations.delete()
+    return removed
+
+
+def remove_relations(model, user_id, target_field, target_ids):
+    # Вызывается в транзакции. Возвращает цели, связи с которыми удалил
+    # этот вызов.
+    if connection.vendor == 'postgresql':
+        return _delete_many_returning(model, user_id, target_field,
+                                      target_ids)
+    return _delete_many_fallback(model, user_id, target_field, target_ids)
@@ -0,0 +1,66 @@
+import re
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramWordSimilarity)
+from django.db import connections
+from django.db.models import F, Lookup, Q, Value
+
+from .constants import SEARCH_CONFIG, SEARCH_FULLTEXT_MIN_LENGTH
+from .models import RecipeSearchIndex
+
+
+class FTS5Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', (*lhs_params, *rhs_params)
+
+
+RecipeSearchIndex._meta.get_field('document').register_lookup(FTS5Match)
+
+
+def search_postgresql(queryset, query):
+    if len(query) < SEARCH_FULLTEXT_MIN_LENGTH:
+        # Короткие запросы не дают осмысленных лексем: ищем триграммами
+        # по названию (индекс recipe_name_trgm_idx).
+        return queryset.filter(
+            TrigramWordSimilar(F('name'), Value(query))
+        ).annotate(search_rank=TrigramWordSimilarity(query, 'name'))
+    search = SearchQuery(query, config=SEARCH_CONFIG,
+                         search_type='websearch')
+    return queryset.filter(search_vector=search).annotate(
+        search_rank=SearchRank(F('search_vector'), search)
+    )
+
+
+def search_sqlite(queryset, query):
+    # Стемминга в FTS5 для русского нет: каждое слово ищется по префиксу.
+    match = ' '.join(f'"{term}"*' for term in re.findall(r'\w+', query))
+    return queryset.filter(search_index__document__match=match).annotate(
+        search_rank=-F('search_index__rank')
+    )
+
+
+SEARCH_BACKENDS = {
+    'postgresql': search_postgresql,
+    'sqlite': search_sqlite,
+}
+
+
+def search_recipes(queryset, query):
+    query = ' '.join(query.split())
+    if not query:
+        return queryset
+    if not re.search(r'\w', query):
+        return queryset.none()
+    backend = SEARCH_BACKENDS.get(connections[queryset.db].vendor)
+    if backend is None:
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        ).order_by('-pub_date', '-id')
+    return backend(queryset, query).order_by(
+        '-search_rank', '-pub_date', '-id'
+    )
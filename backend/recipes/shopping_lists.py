@@ -0,0 +1,109 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from .models import IngredientInRecipe, ShoppingCart, ShoppingListLine, User
+
+
+def get_recipe_amounts(recipe):
+    return dict(
+        IngredientInRecipe.objects.filter(recipe=recipe).values_list(
+            'ingredient_id', 'amount'
+        )
+    )
+
+
+def get_recipes_amounts(recipe_ids):
+    return dict(
+        IngredientInRecipe.objects.filter(recipe_id__in=recipe_ids).values(
+            'ingredient_id'
+        ).annotate(total=Sum('amount')).order_by().values_list(
+            'ingredient_id', 'total'
+        )
+    )
+
+
+def bump_shopping_list_versions(user_ids):
+    User.objects.filter(pk__in=user_ids).update(
+        shopping_list_version=F('shopping_list_version') + 1
+    )
+
+
+def apply_shopping_list_deltas(user_ids, deltas):
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    user_ids = sorted(set(user_ids))
+    if not deltas or not user_ids:
+        return
+    with transaction.atomic():
+        # Блокируем пользователей, чтобы параллельные изменения корзины
+        # одного пользователя не создавали одну и ту же строку дважды.
+        list(User.objects.select_for_update().filter(
+            pk__in=user_ids
+        ).order_by('pk').values_list('pk', flat=True))
+        lines = ShoppingListLine.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas
+        )
+        # Отрицательный остаток означает рассинхронизацию со списком
+        # корзины: его не обрезают до нуля, а отклоняет ограничение
+        # PositiveIntegerField (rebuild_shopping_lists восстановит списки).
+        lines.update(total_amount=F('total_amount') + Case(
+            *(When(ingredient_id=pk, then=Value(delta))
+              for pk, delta in deltas.items()),
+            default=Value(0)
+        ))
+        existing = set(lines.values_list('user_id', 'ingredient_id'))
+        ShoppingListLine.objects.bulk_create(
+            ShoppingListLine(user_id=user_id, ingredient_id=pk,
+                             total_amount=delta)
+            for user_id in user_ids
+            for pk, delta in deltas.items()
+            if delta > 0 and (user_id, pk) not in existing
+        )
+        lines.filter(total_amount=0).delete()
+        bump_shopping_list_versions(user_ids)
+
+
+def add_recipe_to_shopping_list(user, recipe):
+    apply_shopping_list_deltas([user.pk], get_recipe_amounts(recipe))
+
+
+def remove_recipe_from_shopping_list(user, recipe):
+    apply_shopping_list_deltas(
+        [user.pk],
+        {pk: -amount for pk, amount in get_recipe_amounts(recipe).items()}
+    )
+
+
+def add_recipes_to_shopping_list(user, recipe_ids):
+    apply_shopping_list_deltas([user.pk], get_recipes_amounts(recipe_ids))
+
+
+def remove_recipes_from_shopping_list(user, recipe_ids):
+    apply_shopping_list_deltas(
+        [user.pk],
+        {pk: -amount
+         for pk, amount in get_recipes_amounts(recipe_ids).items()}
+    )
+
+
+def update_recipe_in_shopping_lists(recipe, old_amounts, new_amounts):
+    deltas = Counter(new_amounts)
+    deltas.subtract(old_amounts)
+    apply_shopping_list_deltas(
+        ShoppingCart.objects.filter(recipe=recipe).values_list(
+            'user_id', flat=True
+        ),
+        deltas
+    )
+
+
+def get_expected_shopping_lists(user_ids):
+    return {
+        (row['recipe__shopping_carts__user'], row['ingredient']): row['total']
+        for row in IngredientInRecipe.objects.filter(
+            recipe__shopping_carts__user__in=user_ids
+        ).values(
+            'recipe__shopping_carts__user', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by()
+    }
@@ -0,0 +1,35 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import bump_ingredients_version, bump_recipes_version
+from .models import Ingredient, IngredientInRecipe, Recipe, User
+from .thumbnails import schedule_variants
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    bump_ingredients_version()
+    bump_recipes_version()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    bump_recipes_version(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    bump_recipes_version(instance.recipe_id)
+
+
+@receiver((post_save, post_delete), sender=User)
+def author_changed(sender, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_recipes_version()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def image_saved(sender, instance, **kwargs):
+    schedule_variants(instance)
@@ -0,0 +1,62 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Для разработки и тестов на SQLite вместо tsvector — внешняя таблица
+# FTS5 над recipes_recipe, которую поддерживают триггеры. Когда миграция
+# пересоздаёт recipes_recipe (так SQLite меняет столбцы), триггеры
+# удаляются вместе со старой таблицей; после каждого migrate их
+# восстанавливает restore_search_triggers.
+FTS_TABLE = 'recipes_recipe_fts'
+
+SQLITE_TRIGGERS = (
+    ('recipes_recipe_fts_insert', """
+    CREATE TRIGGER recipes_recipe_fts_insert AFTER INSERT ON recipes_recipe
+    BEGIN
+        INSERT INTO recipes_recipe_fts(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """),
+    ('recipes_recipe_fts_delete', """
+    CREATE TRIGGER recipes_recipe_fts_delete AFTER DELETE ON recipes_recipe
+    BEGIN
+        INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """),
+    ('recipes_recipe_fts_update', """
+    CREATE TRIGGER recipes_recipe_fts_update
+    AFTER UPDATE OF name, text ON recipes_recipe
+    BEGIN
+        INSERT INTO recipes_recipe_fts(recipes_recipe_fts, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO recipes_recipe_fts(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """),
+)
+
+REBUILD_FTS = (
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts) VALUES ('rebuild')"
+)
+
+
+def restore_search_triggers(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if FTS_TABLE not in connection.introspection.table_names(cursor):
+            # База откачена до миграции с поиском.
+            return
+        cursor.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'trigger' AND tbl_name = 'recipes_recipe'"
+        )
+        existing = {name for name, in cursor.fetchall()}
+        missing = [sql for name, sql in SQLITE_TRIGGERS
+                   if name not in existing]
+        if not missing:
+            return
+        for sql in missing:
+            cursor.execute(sql)
+        # Пока триггеров не было, индекс мог разойтись с таблицей.
+        cursor.execute(REBUILD_FTS)
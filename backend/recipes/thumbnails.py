@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models.functions import Now
+from PIL import Image, ImageOps
+
+from .catalog import bump_recipes_version
+from .constants import IMAGE_FORMATS, IMAGE_QUALITY, IMAGE_VARIANTS
+from .models import Recipe, User
+
+logger = logging.getLogger(__name__)
+
+# Модель -> поле с изображением; варианты хранятся в поле
+# '<поле>_variants' как {'source': имя оригинала, 'size': его размер,
+# 'sha256': хеш его содержимого, '<вариант>': {'<формат>': имя файла}}.
+IMAGE_FIELDS = {
+    Recipe: 'image',
+    User: 'avatar',
+}
+
+_executor = None
+_executor_pid = None
+
+
+def get_sha256(chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_variants(variants):
+    # Пары (вариант, {формат: имя файла}) без сведений об оригинале.
+    return ((variant, names) for variant, names in variants.items()
+            if variant in IMAGE_VARIANTS)
+
+
+def render_variants(root, name):
+    # Выполняется в отдельном процессе: только файлы, без базы данных.
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    path = os.path.join(root, name)
+    with open(path, 'rb') as file:
+        variants = {
+            'source': name,
+            'size': os.fstat(file.fileno()).st_size,
+            'sha256': get_sha256(iter(partial(file.read, 2 ** 20), b'')),
+        }
+    with Image.open(path) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode != 'RGB':
+            background = Image.new('RGB', image.size, 'white')
+            image = image.convert('RGBA')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        os.makedirs(os.path.join(root, directory, 'variants'), exist_ok=True)
+        for variant, size in IMAGE_VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+            variants[variant] = {}
+            for image_format in IMAGE_FORMATS:
+                variant_name = os.path.join(
+                    directory, 'variants',
+                    f'{stem}_{variant}.{image_format}'
+                )
+                resized.save(os.path.join(root, variant_name),
+                             image_format.upper(), quality=IMAGE_QUALITY)
+                variants[variant][image_format] = variant_name
+    return variants
+
+
+def save_variants(model, pk, variants):
+    field = IMAGE_FIELDS[model]
+    updated = model.objects.filter(
+        pk=pk, **{field: variants['source']}
+    ).update(**{f'{field}_variants': variants, 'updated_at': Now()})
+    if updated:
+        bump_recipes_version(pk if model is Recipe else None)
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    # Пул не переживает fork (например, воркеров gunicorn).
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ProcessPoolExecutor(settings.IMAGE_WORKERS)
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def _variants_done(model, pk, future):
+    close_old_connections()
+    try:
+        save_variants(model, pk, future.result())
+    except FileNotFoundError:
+        # Изображение заменили или удалили раньше, чем его нарезали.
+        pass
+    except Exception:
+        logger.exception('Не удалось нарезать изображение %s #%s',
+                         model.__name__, pk)
+
+
+def _submit(model, pk, name):
+    if not settings.IMAGE_WORKERS:
+        try:
+            variants = render_variants(settings.MEDIA_ROOT, name)
+        except FileNotFoundError:
+            return
+        save_variants(model, pk, variants)
+        return
+    future = _get_executor().submit(render_variants, settings.MEDIA_ROOT,
+                                    name)
+    future.add_done_callback(partial(_variants_done, model, pk))
+
+
+def needs_variants(instance):
+    field = IMAGE_FIELDS[type(instance)]
+    image = getattr(instance, field)
+    variants = getattr(instance, f'{field}_variants')
+    return bool(image) and variants.get('source') != image.name
+
+
+def schedule_variants(instance):
+    if needs_variants(instance):
+        name = getattr(instance, IMAGE_FIELDS[type(instance)]).name
+        transaction.on_commit(
+            partial(_submit, type(instance), instance.pk, name)
+        )
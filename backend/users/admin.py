@@ -1,11 +1,15 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
+from recipes.admin import RelationAdminMixin
+from recipes.counters import (annotate_user_counters, get_counter,
+                              increment_user_counter)
+
 from .models import Subscription, User
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(RelationAdminMixin, admin.ModelAdmin):
     list_display = (
         'id',
         'user',
@@ -14,6 +18,12 @@ class SubscriptionAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'author__username')
     list_filter = ('author',)
 
+    def relation_added(self, obj):
+        increment_user_counter(obj.author_id, 'subscribers_count')
+
+    def relation_removed(self, obj):
+        increment_user_counter(obj.author_id, 'subscribers_count', -1)
+
 
 ADDITIONAL_USER_FIELDS = (
     (None, {'fields': ('avatar',)}),
@@ -28,9 +38,22 @@ class UserAdmin(BaseUserAdmin):
         'email',
         'first_name',
         'last_name',
+        'user_recipes_count',
+        'user_subscribers_count',
     )
     search_fields = ('username', 'email')
     list_filter = ('username', 'email')
 
     add_fieldsets = BaseUserAdmin.add_fieldsets + ADDITIONAL_USER_FIELDS
     fieldsets = BaseUserAdmin.fieldsets + ADDITIONAL_USER_FIELDS
+
+    def get_queryset(self, request):
+        return annotate_user_counters(super().get_queryset(request))
+
+    @admin.display(description='Рецептов', ordering='recipes_count')
+    def user_recipes_count(self, obj):
+        return get_counter(obj, 'recipes_count')
+
+    @admin.display(description='Подписчиков', ordering='subscribers_count')
+    def user_subscribers_count(self, obj):
+        return get_counter(obj, 'subscribers_count')
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.14 on 2026-10-18 17:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce
+
+
+def fill_subscribers_count(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Subscription = apps.get_model('users', 'Subscription')
+    User.objects.update(subscribers_count=Coalesce(
+        models.Subquery(
+            Subscription.objects.filter(
+                author=models.OuterRef('pk')
+            ).values('author').annotate(
+                total=models.Count('pk')
+            ).values('total')
+        ),
+        0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_subscription_options_alter_user_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Рецептов'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Подписчиков'),
+        ),
+        migrations.CreateModel(
+            name='UserCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='Шард')),
+                ('recipes_count', models.IntegerField(default=0)),
+                ('subscribers_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Шард счётчиков пользователя',
+                'verbose_name_plural': 'Шарды счётчиков пользователей',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='usercountershard',
+            constraint=models.UniqueConstraint(fields=('user', 'shard'), name='unique_user_counter_shard'),
+        ),
+        migrations.RunPython(fill_subscribers_count,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.14 on 2026-10-18 17:25
+
+from django.db import migrations, models
+
+
+def fill_updated_at(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    User.objects.update(updated_at=models.F('date_joined'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='usercountershard',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.14 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_user_feed_pulled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='shopping_list_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Версия списка покупок'),
+        ),
+    ]
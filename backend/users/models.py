@@ -35,6 +35,39 @@ class User(AbstractUser):
         blank=True,
         verbose_name='Аватар'
     )
+    avatar_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты аватара'
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Рецептов'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков'
+    )
+    # Рецепты автора не рассылаются по лентам, а подмешиваются при чтении.
+    # Флаг не снимается сам: его пересчитывает rebuild_timelines.
+    feed_pulled = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Лента без рассылки'
+    )
+    # Растёт при каждом изменении материализованного списка покупок;
+    # из неё и версии ингредиентов строится ETag скачивания списка.
+    shopping_list_version = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Версия списка покупок'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Дата изменения'
+    )
 
     class Meta:
         ordering = ['username']
@@ -66,8 +99,38 @@ class Subscription(models.Model):
                 name='unique_subscription'
             )
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='subscription_author_user_idx'),
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class UserCounterShard(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='counter_shards',
+        verbose_name='Пользователь'
+    )
+    shard = models.PositiveSmallIntegerField(verbose_name='Шард')
+    recipes_count = models.IntegerField(default=0)
+    subscribers_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'shard'],
+                name='unique_user_counter_shard'
+            )
+        ]
+        verbose_name = 'Шард счётчиков пользователя'
+        verbose_name_plural = 'Шарды счётчиков пользователей'
+
+    def __str__(self):
+        return f'{self.user} #{self.shard}'